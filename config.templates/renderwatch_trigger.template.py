@@ -0,0 +1,36 @@
+"""
+renderwatch trigger script - tells renderwatch_daemon the moment a render starts, completes or fails,
+so it doesn't have to wait for its next poll.
+
+renderwatch_daemon writes this file into its config folder, with SOCKET_FILEPATH filled in.
+1. Copy it into Resolve's Deliver scripts folder:
+    macOS:   ~/Library/Application Support/Blackmagic Design/DaVinci Resolve/Fusion/Scripts/Deliver/
+    Linux:   ~/.local/share/DaVinciResolve/Fusion/Scripts/Deliver/
+2. In the Deliver page: Render Settings > Advanced Settings > Trigger script at: Start and End, and choose renderwatch_trigger.
+
+Resolve runs it with `job`, `status` and `error` already defined.
+Only uses the standard library, and gives up after a second if renderwatch_daemon isn't listening.
+"""
+import json
+import os
+import socket
+
+SOCKET_FILEPATH = None
+
+def send(payload: dict):
+    filepath = os.environ.get('RENDERWATCH_SOCKET') or SOCKET_FILEPATH
+    if not filepath:
+        print('renderwatch_trigger: no socket path set')
+        return
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(1)
+            s.connect(filepath)
+            s.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+    except OSError as e:
+        print(f'renderwatch_trigger: renderwatch_daemon is not listening at {filepath} - {e}')
+
+try:
+    send({ 'job': job, 'status': status, 'error': error })
+except NameError:
+    print('renderwatch_trigger: job, status and error are not defined - this runs as a Resolve render trigger script')
@@ -1,8 +1,10 @@
-from .exceptions import UserInvalidAction
+from .exceptions import UserInvalidAction, UserInvalidTemplate
 from .step import Step
 from .steps import Steps
-from copy import deepcopy
+from copy import copy
 from functools import partial
+import asyncio
+import inspect
 import itertools
 import logging
 
@@ -23,6 +25,10 @@ class UserAction(object):
         self.name = name
         self.enabled = enabled
         self.steps = {}
+        # (trigger, callback) for every handler this action attached, so they can be detached again
+        self.handlers = []
+        # The last step started for each trigger, which the next step in this action waits for
+        self._running = {}
         if self.enabled:
             logger.debug(f"Action {self.index} ({self.name}): evaluating user's input..")
             count_valid_steps = self._init(steps, triggers)
@@ -64,10 +70,14 @@ class UserAction(object):
             # Initialise a Step for it
             step_class = Steps[user_step_type].value
             # Check if we have saved a validated instance, or create one if not
+            if user_step_type in self.renderwatch._invalid_user_steps:
+                logger.warning(f"Action {self.index} ({self.name}), Step {user_step_index} ({user_step_type}) - skipping, it didn't validate properly. Check you have all the correct config params for this kind of Step in config.yml.")
+                continue
             if user_step_type in self.renderwatch._validated_user_steps.keys():
-                step_instance = deepcopy(self.renderwatch._validated_user_steps[user_step_type])
+                step_instance = copy(self.renderwatch._validated_user_steps[user_step_type])
             else:
                 step_instance = step_class()
+                step_instance.renderwatch = self.renderwatch
                 # Validate with the Step's own validation before proceeding
                 if step_instance.__validate__(**user_config):
                     self.renderwatch._validated_user_steps[user_step_type] = step_instance
@@ -82,7 +92,6 @@ class UserAction(object):
             if not user_settings['action'] in step_instance.methods:
                 logger.warning(f"Action {self.index} ({self.name}), Step {user_step_index}: '{user_settings['action']}' is not a recognised action for this Step ({user_step_type}). Check spelling or help for list of steps.")
                 continue
-            count_valid_steps += 1
             # Get that corresponding method
             step_action_keyword = user_settings.pop('action')
             step_method = step_instance.get_method_from_keyword(step_action_keyword)
@@ -93,6 +102,16 @@ class UserAction(object):
                     logger.warning(f"Action {self.index} ({self.name}), Step {user_step_index}: the setting '{param}' was not found specified on this step. Check spelling or help for list of steps.")
                     continue
                 required_params[param] = user_settings.pop(param)
+            # Anything else the user set on this step is passed along as an optional setting
+            optional_params = dict(user_settings)
+            # Parse any message templates now, so a mistake in one shows up straight away
+            try:
+                step_instance.compile_templates(step_action_keyword, required_params)
+                step_instance.compile_templates(step_action_keyword, optional_params)
+            except UserInvalidTemplate as e:
+                logger.warning(f"Action {self.index} ({self.name}), Step {user_step_index} ({user_step_type}) - skipping, a message template was invalid: {e}. Check your actions.yml, or help for list of fields.")
+                continue
+            count_valid_steps += 1
             # Add pointers
             step_instance.action = self
             step_instance.index = user_step_index
@@ -105,16 +124,21 @@ class UserAction(object):
                 executable = partial(
                     step_method,
                     step_instance, # `context`
+                    **optional_params,
                     **required_params,
                 )
-                handler_callback = partial(
+                run_step = partial(
                     step_instance.run,
                     executable,
                     callback_pre = self._create_sub_handler(step_instance.signature + '.pre', step_instance),
-                    callback_post = self._create_sub_handler(step_instance.signature + '.post', step_instance)
+                    callback_post = self._create_sub_handler(step_instance.signature + '.post', step_instance),
+                    callback_failed = self._create_sub_handler(step_instance.signature + '.failed', step_instance),
                 )
+                first = not any( t == trigger for t, _ in self.handlers )
+                handler_callback = partial(self._run_in_order, trigger, first, run_step)
                 handler = getattr(self.renderwatch.event_resolve, trigger)
                 handler += handler_callback
+                self.handlers.append( (trigger, handler_callback) )
                 # Save it to the action
                 if trigger in self.steps[step_instance.step_type]:
                     self.steps[step_instance.step_type][trigger].append(step_instance)
@@ -123,6 +147,25 @@ class UserAction(object):
             logger.info(f"Action {self.index} ({self.name}), Step {user_step_index} ({user_step_type}): added successfully.")
         return count_valid_steps
     
+    def _run_in_order(self, trigger: str, first: bool, run_step, *args, **kwargs):
+        """
+        Run a step once the steps before it in this action, for the same event, have finished.
+        So a step can use what an earlier one made, e.g. a checksum manifest.
+        """
+        previous = None if first else self._running.get(trigger)
+        if previous is None or previous.done():
+            result = run_step(*args, **kwargs)
+        else:
+            async def _after_previous():
+                await asyncio.wait([ previous ])
+                result = run_step(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    return await result
+                return result
+            result = Step.spawn(_after_previous())
+        self._running[trigger] = result if isinstance(result, asyncio.Future) else None
+        return result
+
     def _create_sub_handler(
         self,
         signature: str,
@@ -130,16 +173,25 @@ class UserAction(object):
     ):
         """
         Given a signature, return a callback which when executed will fire an event under that signature's name
-        The idea is that a Pre-run and Post-run event can be fired, when a user's step is fired
+        The idea is that a Pre-run and Post-run event can be fired, when a user's step is fired,
+        and a Failed event instead of the Post-run one if the step fails
         - signature: e.g. on_render_job_started.telegram.send_message.1.pre
         """
         self.renderwatch.event_user.__events__.add(signature)
         method = getattr(self.renderwatch.event_user, signature)
+        signature_logger = logging.getLogger(f'renderwatch.user.{signature}')
         def callback():
             method(step=instance)
-            logging.getLogger(f'renderwatch.user.{signature}').debug('fired')
+            signature_logger.debug('fired')
         return callback
 
+    def detach(self):
+        """Remove every handler this action attached, so it no longer runs"""
+        for trigger, handler_callback in self.handlers:
+            handler = getattr(self.renderwatch.event_resolve, trigger)
+            handler -= handler_callback
+        self.handlers = []
+
     def __str__(self):
         return self.name
 
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class ValidationCache:
+    """
+    Remembers on disk which step credentials validated OK, so startup doesn't have to check them over the network again.
+    Credentials are never written - only a hash of them, with the time they were last validated.
+    """
+    def __init__(
+        self,
+        filepath: str,
+        ttl: float = 86400,
+    ):
+        self.filepath = filepath
+        self.ttl = ttl
+        self.entries = {}
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f'Validation cache was unreadable, starting a new one: {self.filepath} - {e}')
+
+    @staticmethod
+    def key(step_type: str, credential: str) -> str:
+        return hashlib.sha256(f'{step_type}:{credential}'.encode('utf-8')).hexdigest()
+
+    def is_valid(self, key: str) -> bool:
+        validated_at = self.entries.get(key)
+        if validated_at is None:
+            return False
+        return time.time() - validated_at < self.ttl
+
+    def store(self, key: str):
+        self.entries[key] = time.time()
+        self.save()
+
+    def discard(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self.save()
+
+    def save(self):
+        # Write to a temporary file first, so a crash can't leave a half-written cache
+        filepath_tmp = self.filepath + '.tmp'
+        try:
+            with open(filepath_tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(filepath_tmp, self.filepath)
+        except Exception as e:
+            logger.warning(f'Unable to save validation cache: {self.filepath} - {e}')
+
+class ActionsCache:
+    """
+    Validated, normalised action definitions from actions.yml, stored on disk with a hash of every file they depend on.
+    While none of those files change, startup can skip schema validation and parsing entirely.
+    """
+    # Bump when the layout of cached definitions changes
+    version = 1
+
+    def __init__(
+        self,
+        filepath: str,
+        source_filepaths: list,
+    ):
+        self.filepath = filepath
+        self.source_filepaths = source_filepaths
+
+    def source_hash(self) -> str:
+        digest = hashlib.sha256(f'v{self.version}'.encode('utf-8'))
+        for source_filepath in self.source_filepaths:
+            with open(source_filepath, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        return digest.hexdigest()
+
+    def load(self, source_hash: str):
+        """Return the cached definitions if they were made from these exact files, otherwise None"""
+        try:
+            with open(self.filepath, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f'Actions cache was unreadable, ignoring it: {self.filepath} - {e}')
+            return None
+        if cached.get('source_hash') != source_hash:
+            return None
+        return cached.get('actions')
+
+    def save(self, source_hash: str, actions: list):
+        filepath_tmp = self.filepath + '.tmp'
+        try:
+            with open(filepath_tmp, 'w', encoding='utf-8') as f:
+                json.dump({ 'source_hash': source_hash, 'actions': actions }, f)
+            os.replace(filepath_tmp, self.filepath)
+        except Exception as e:
+            logger.warning(f'Unable to save actions cache: {self.filepath} - {e}')
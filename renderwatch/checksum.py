@@ -0,0 +1,134 @@
+from renderwatch.exceptions import StepFailed
+from renderwatch.step import Step
+from renderwatch.template import MessageTemplate
+from renderwatch.verify import job_output_files
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+def hash_file(filepath: str, algorithm: str = 'md5', buffer_size: int = 8 * 1024 * 1024) -> tuple:
+    """
+    Return (hex digest, bytes read) of a file.
+    Reads into one reused buffer, so a large render is hashed in constant memory.
+    hashlib lets go of the GIL while it hashes a buffer, so files hashed on separate threads run in parallel.
+    """
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    size = 0
+    with open(filepath, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+            size += count
+    return digest.hexdigest(), size
+
+def save_manifest(manifest_filepath: str, digests: dict):
+    """
+    Write `<digest>  <path>` lines, paths relative to the manifest - the format md5sum -c and shasum -c check.
+    Written to a temporary file first, so a manifest is never left half written.
+    """
+    directory = os.path.dirname(os.path.abspath(manifest_filepath))
+    lines = []
+    for filepath, digest in sorted(digests.items()):
+        relative_path = os.path.relpath(filepath, directory).replace(os.sep, '/')
+        lines.append(f'{digest}  {relative_path}\n')
+    temp_filepath = manifest_filepath + '.tmp'
+    with open(temp_filepath, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(temp_filepath, manifest_filepath)
+
+class Checksum(Step):
+    """Write a checksum manifest of a render's output files"""
+    # Shared by every checksum step, so the limit on files hashed at once applies across all actions
+    _executor = None
+    algorithm = 'md5'
+    buffer_size = 8 * 1024 * 1024
+
+    def __init__(self):
+        super(Checksum, self).__init__()
+
+    def __validate__(
+        self,
+        algorithm: str = 'md5',
+        max_concurrent: int = 4,
+        buffer_size_mb: int = 8,
+        force: bool = False,
+    ):
+        algorithm = (algorithm or 'md5').lower()
+        if algorithm not in hashlib.algorithms_available:
+            logger.error(f'checksum: unknown algorithm: {algorithm}. Choose one of: {", ".join(sorted(hashlib.algorithms_guaranteed))}')
+            return False
+        Checksum.algorithm = algorithm
+        Checksum.buffer_size = max(int(buffer_size_mb or 1), 1) * 1024 * 1024
+        if Checksum._executor is None or force:
+            Checksum._executor = ThreadPoolExecutor(
+                max_workers = max(int(max_concurrent or 1), 1),
+                thread_name_prefix = 'renderwatch-checksum',
+            )
+        return True
+
+    @Step.action('write_manifest', templates=['manifest_filepath'])
+    def write_manifest(
+        self,
+        context,
+        *args,
+        manifest_filepath = None,
+        algorithm: str = None,
+        **kwargs,
+    ):
+        job = kwargs.get('job')
+        if job is None:
+            logger.error('write_manifest(): this step needs a render job - use it with a render_job_* trigger')
+            return
+        algorithm = (algorithm or Checksum.algorithm).lower()
+        if algorithm not in hashlib.algorithms_available:
+            raise StepFailed(f'Unknown checksum algorithm: {algorithm}')
+        if manifest_filepath is not None:
+            if isinstance(manifest_filepath, MessageTemplate):
+                manifest_filepath = manifest_filepath.render(job)
+            manifest_filepath = os.path.expanduser(str(manifest_filepath))
+        return Checksum._write_manifest(context, job, manifest_filepath, algorithm)
+
+    @staticmethod
+    async def _write_manifest(context, job, manifest_filepath: str, algorithm: str):
+        # Finding the files walks the target directory, so that is kept off the event loop too
+        loop = asyncio.get_running_loop()
+        filepaths = await loop.run_in_executor(Checksum._executor, job_output_files, job)
+        if not filepaths:
+            raise StepFailed(f'No output files were found to checksum for {job.name}')
+        if manifest_filepath is None:
+            # Beside the output: 'Job 1.mov' -> 'Job 1.md5'
+            stem = os.path.splitext(os.path.basename(filepaths[0]))[0] if len(filepaths) == 1 else job.name
+            manifest_filepath = os.path.join(job.target_directory, f'{stem}.{algorithm}')
+        time_started = time.monotonic()
+        try:
+            hashed = await asyncio.gather(*[
+                loop.run_in_executor(Checksum._executor, hash_file, filepath, algorithm, Checksum.buffer_size)
+                for filepath in filepaths
+            ])
+            digests = { filepath: digest for filepath, (digest, _) in zip(filepaths, hashed) }
+            await loop.run_in_executor(Checksum._executor, save_manifest, manifest_filepath, digests)
+        except OSError as e:
+            raise StepFailed(f'Unable to write the checksum manifest for {job.name} - {e}')
+        duration = time.monotonic() - time_started
+        size = sum( count for _, count in hashed )
+        rate = size / duration / 1024 / 1024 if duration else 0
+        job.manifest_filepath = manifest_filepath
+        logger.info(f'checksum: {job.id[:8]} | {len(filepaths)} files, {size / 1024 / 1024:.1f} MB hashed in {duration:.2f}s ({rate:.1f} MB/s): {manifest_filepath}')
+        context.renderwatch.event_internal.action_step_checksum_manifest_written(job=job, data={
+            'manifest_filepath': manifest_filepath,
+            'algorithm': algorithm,
+            'files': filepaths,
+            'bytes': size,
+            'duration': duration,
+        })
+        return manifest_filepath
@@ -0,0 +1,85 @@
+import logging
+import threading
+
+from . import metrics
+from .exceptions import ResolveConnectionLost
+
+logger = logging.getLogger(__name__)
+
+class ResolveConnection:
+    """
+    The Resolve handle, kept across polls instead of being rebuilt each time.
+    At the start of each poll, refresh() reads the current project, its name and the database once each.
+    Every other API call should go through call(), so it is counted and timed.
+    A failed call drops the handle, and the next refresh() connects again.
+    """
+    def __init__(self, connect):
+        # Coroutine function that returns a new Resolve handle, or False if Resolve isn't available
+        self._connect = connect
+        self.resolve = None
+        self.project_manager = None
+        self.project = None
+        self.project_name = None
+        self.db = None
+        # API calls made this poll, by call
+        self.calls = {}
+        self._calls_lock = threading.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self.resolve is not None
+
+    @property
+    def call_count(self) -> int:
+        return sum(self.calls.values())
+
+    def call(self, name: str, func, *args):
+        """Make one API call. Safe to use from worker threads. Raises ResolveConnectionLost if it fails."""
+        with self._calls_lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        try:
+            with metrics.api_call_duration.time(call=name):
+                return func(*args)
+        except Exception as e:
+            self.invalidate(f'{name}: {e.__class__.__name__}: {e}')
+            raise ResolveConnectionLost(f'Resolve API call failed - {name}') from e
+
+    async def refresh(self) -> bool:
+        """Connect if there is no handle yet, then read the current project and database. Returns False if Resolve is unavailable."""
+        self.calls = {}
+        had_handle = self.connected
+        if await self._refresh():
+            return True
+        if had_handle:
+            # The kept handle went stale - try once more with a new one
+            return await self._refresh()
+        return False
+
+    async def _refresh(self) -> bool:
+        if self.resolve is None:
+            with self._calls_lock:
+                self.calls['connect'] = self.calls.get('connect', 0) + 1
+            resolve = await self._connect()
+            if not resolve:
+                return False
+            self.resolve = resolve
+            try:
+                self.project_manager = self.call('project_manager', lambda: resolve.project_manager)
+            except ResolveConnectionLost:
+                return False
+        try:
+            self.project = self.call('project', lambda: self.resolve.project)
+            self.project_name = self.call('project.name', lambda: self.project.name)
+            self.db = self.call('project_manager.db', lambda: self.project_manager.db)
+        except ResolveConnectionLost:
+            return False
+        return True
+
+    def invalidate(self, reason: str = None):
+        with self._calls_lock:
+            was_connected = self.resolve is not None
+            self.resolve = None
+            self.project_manager = None
+            self.project = None
+        if was_connected:
+            logger.warning(f'Dropped the Resolve connection, a call failed: {reason}')
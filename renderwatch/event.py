@@ -1,34 +1,84 @@
 import logging
 from events import Events
-from functools import partial
+from events.events import _EventSlot
+from time import perf_counter
 
 logger = logging.getLogger(__name__)
 
+class EventSlot(_EventSlot):
+    """
+    One event and its handlers.
+    Handlers are compiled into a tuple the first time the event fires after they change, so firing is one lookup and a loop.
+    Logging only happens if its level is enabled, and each event counts how often it fired and the time spent in its handlers.
+    """
+    def __init__(self, name):
+        super(EventSlot, self).__init__(name)
+        self.group = None
+        self.handlers = ()
+        self.fire_count = 0
+        self.handler_time = 0.0
+
+    def __iadd__(self, f):
+        super(EventSlot, self).__iadd__(f)
+        self.handlers = None
+        return self
+
+    def __isub__(self, f):
+        super(EventSlot, self).__isub__(f)
+        self.handlers = None
+        return self
+
+    def __call__(self, *args, **kwargs):
+        self.fire_count += 1
+        group = self.group
+        if group is not None and group.log_fires and group.logger.isEnabledFor(logging.INFO):
+            group.log(self.__name__, *args, **kwargs)
+        handlers = self.handlers
+        if handlers is None:
+            handlers = self.handlers = tuple(self.targets)
+        if not handlers:
+            return
+        time_start = perf_counter()
+        for handler in handlers:
+            handler(*args, **kwargs)
+        self.handler_time += perf_counter() - time_start
+
 class BaseEventGroup(Events):
     group_name = None
     events = ()
+    # Whether to log each time an event in this group fires
+    log_fires = True
 
     def __init__(self):
-        super(BaseEventGroup, self).__init__()
+        super(BaseEventGroup, self).__init__(event_slot_cls=EventSlot)
         # Name should evaluate to: renderwatch.event.group_name
         self.logger = logging.getLogger(__name__ + '.' + self.group_name)
         for event_name in self.__events__:
-            # Get a handler per this event name
-            handler = getattr(self, event_name)
-            # Attach some log wrappers
-            handler += partial(self.log, event_name)
-            handler += partial(self.debug_data, event_name)
+            # Create each declared event up front
+            getattr(self, event_name)
+
+    def __getattr__(self, name):
+        slot = super(BaseEventGroup, self).__getattr__(name)
+        slot.group = self
+        return slot
 
     def log(self, event_name, *args, **kwargs):
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
         if kwargs.get('job'):
-            self.logger.info(f"{kwargs['job'].id[:8]} | {event_name}")
+            self.logger.info('%s | %s', kwargs['job'].id[:8], event_name)
         else:
-            self.logger.info(f"{event_name}")
-            
-    
-    def debug_data(self, event_name, *args, **kwargs):
-        if 'data' in kwargs:
-            self.logger.debug(f"{event_name} - Data: {kwargs['data']}")
+            self.logger.info('%s', event_name)
+        if 'data' in kwargs and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s - Data: %s', event_name, kwargs['data'])
+
+    def dispatch_table(self) -> dict:
+        """Each event that has handlers, and its handlers in the order they run"""
+        return { slot.__name__: tuple(slot.targets) for slot in self if slot.targets }
+
+    def stats(self) -> dict:
+        """Each event that has fired: how many times, and the seconds spent in its handlers"""
+        return { slot.__name__: (slot.fire_count, slot.handler_time) for slot in self if slot.fire_count }
 
 # Events
 class ResolveEvents(BaseEventGroup):
@@ -36,6 +86,7 @@ class ResolveEvents(BaseEventGroup):
     __events__ = (
         'api_conn_initial_success',
         'api_conn_lost',
+        'api_conn_restored',
         'project_onload',
         'project_change',
         'db_onload',
@@ -58,9 +109,16 @@ class InternalEvents(BaseEventGroup):
     __events__ = (
         'action_step_fired',
         'action_step_telegram_message_sent',
+        'action_step_shell_cmd_finished',
+        'action_step_output_verified',
+        'action_step_checksum_manifest_written',
+        'action_step_transfer_progress',
+        'action_step_transfer_finished',
     )
 
 class UserEvents(BaseEventGroup):
     group_name = 'user'
+    # Each user step logs its own pre/post events
+    log_fires = False
     # no events to define - they are dynamically defined
-    __events__ = set()
\ No newline at end of file
+    __events__ = set()
@@ -1,3 +1,6 @@
 class UserInvalidAction(Exception): pass
 class UserInvalidConfig(Exception): pass
-class UserInvalidStep(Exception): pass
\ No newline at end of file
+class UserInvalidStep(Exception): pass
+class UserInvalidTemplate(Exception): pass
+class StepFailed(Exception): pass
+class ResolveConnectionLost(Exception): pass
\ No newline at end of file
@@ -1,46 +1,109 @@
+from .exceptions import StepFailed
 from .step import Step
-from pprint import pprint
+from .template import MessageTemplate, compile_template
+from .verify import OutputVerifier
 from typing import Union
+import asyncio
 import logging
-import subprocess
+import re
+import shutil
+import time
 
 logger = logging.getLogger(__name__)
 
 class VerifyOutput(Step):
+    """Check a render's output files are complete, by their frame count"""
+    # Shared by every verify_output step, so the ffprobe limit and the probe cache apply across all actions
+    verifier = None
+
     def __init__(self):
         super(VerifyOutput, self).__init__()
-        self.token = None
 
     def __validate__(
         self,
+        ffprobe_path: str = 'ffprobe',
+        max_concurrent: int = 4,
+        timeout: float = 60,
         force: bool = False,
     ):
+        ffprobe_path = ffprobe_path or 'ffprobe'
+        if not shutil.which(ffprobe_path):
+            logger.error(f'verify_output: ffprobe was not found at: {ffprobe_path}. Install ffmpeg, or set ffprobe_path in config.yml.')
+            return False
+        verifier = VerifyOutput.verifier
+        # Made again when its settings change on a reload
+        if verifier is None or force or (verifier.ffprobe_path, verifier.max_concurrent, verifier.timeout) != (ffprobe_path, max(int(max_concurrent or 1), 1), timeout):
+            VerifyOutput.verifier = OutputVerifier(ffprobe_path, max_concurrent=max_concurrent, timeout=timeout)
+            if verifier is not None and verifier.ffprobe_path == ffprobe_path:
+                # Same ffprobe, so its results still stand
+                VerifyOutput.verifier.cache = verifier.cache
         return True
-    
+
     @Step.action('check_file_has_complete_duration')
     def check_file_has_complete_duration(
+        self,
         context,
         *args,
         **kwargs,
     ):
-        rw = context.renderwatch
-        job = kwargs['job']
-
-        pprint(job.__dict__)
+        job = kwargs.get('job')
+        if job is None:
+            logger.error('check_file_has_complete_duration(): this step needs a render job - use it with a render_job_* trigger')
+            return
+        return VerifyOutput._verify(context, job)
 
-        look_inside = job['target_directory']
+    @staticmethod
+    async def _verify(context, job):
+        time_started = time.monotonic()
+        result = await VerifyOutput.verifier.verify(job)
+        duration = time.monotonic() - time_started
+        for probe in result.results:
+            logger.debug(f'verify_output: {job.id[:8]} | {probe.filepath}: {probe.frames} frames {probe.error or ""}')
+        context.renderwatch.event_internal.action_step_output_verified(job=job, data={
+            'files': [ probe.filepath for probe in result.results ],
+            'expected_frames': result.expected_frames,
+            'problems': result.problems,
+            'duration': duration,
+        })
+        if not result.ok:
+            raise StepFailed(f'Output of {job.name} did not verify - ' + '; '.join(result.problems))
+        logger.info(f'verify_output: {job.id[:8]} | {len(result.results)} output files verified OK in {duration:.2f}s')
+        return result
 
 class Shell(Step):
     """Send commands to shell"""
+    # Shared by every shell step, so the limit applies across all actions
+    _semaphore = None
+    _max_concurrent = None
+    # Bytes of output read at a time, and the longest line logged in one piece
+    read_size = 64 * 1024
+
     def __init__(self):
         super(Shell, self).__init__()
+        self.timeout = None
 
     def __validate__(
         self,
+        max_concurrent: int = 2,
+        timeout: float = None,
         force: bool = False,
     ):
-        # So far nothing to validate here
+        max_concurrent = max(int(max_concurrent or 1), 1)
+        # Made again when the limit changes on a reload. Commands already running finish under the old one.
+        if Shell._semaphore is None or force or max_concurrent != Shell._max_concurrent:
+            Shell._semaphore = asyncio.Semaphore(max_concurrent)
+            Shell._max_concurrent = max_concurrent
+        self.timeout = timeout
         return True
+
+    def compile_templates(self, action_keyword: str, params: dict):
+        # Job tokens are filled in per argument, so split a string cmd the same way run_cmd does
+        if action_keyword == 'run_cmd' and params.get('format_job_tokens', True) and params.get('cmd') is not None:
+            cmd = params['cmd']
+            if isinstance(cmd, str):
+                cmd = cmd.split(' ')
+            params['cmd'] = compile_template(cmd)
+        return params
     
     @Step.action('run_cmd', params=['cmd', 'format_job_tokens'])
     def run_cmd(
@@ -50,6 +113,7 @@ class Shell(Step):
         cmd: Union[str, list] = None,
         format_job_tokens: bool = True,
         subfolder: str = None,
+        timeout: float = None,
         **kwargs,
     ):
         logger.debug(f'User cmd - {type(cmd)}: {cmd}')
@@ -65,13 +129,15 @@ class Shell(Step):
             new_user_args = []
             for arg in user_args:
                 try:
-                    output = arg.format(**kwargs['job'].__dict__)
+                    template = arg if isinstance(arg, MessageTemplate) else MessageTemplate(str(arg))
+                    output = template.render(kwargs['job'])
                     new_user_args.append(output)
                 except Exception as e:
                     logger.error(f'Unable to fill in render job keyvalues - Arg: {arg} - Exception: {e.__class__}')
                     logger.debug(e, exc_info=1)
                     return
             user_args = new_user_args
+        user_args = [ str(arg) for arg in user_args ]
         if kwargs.get('on_exit_close_window', True):
             # Open a shell after the cmd is run, to keep the window open
             user_args[-1] += ';'
@@ -91,19 +157,86 @@ class Shell(Step):
         else:
             cmd_args = user_args
             shell = False
-        try:
+        # Run in the background
+        return Shell._run_process(
+            context,
+            cmd_args,
+            shell = shell,
+            timeout = timeout if timeout is not None else context.timeout,
+        )
+
+    @staticmethod
+    async def _run_process(context, cmd_args, shell: bool = False, timeout: float = None):
+        """Run the process without blocking, streaming its output into the log line by line"""
+        if Shell._semaphore is None:
+            Shell._semaphore = asyncio.Semaphore(2)
+        async with Shell._semaphore:
             logger.debug(f'run_cmd(): args (type {type(cmd_args)}): {cmd_args}')
-            proc = subprocess.Popen(
-                cmd_args,
-                shell = shell,
-                stderr = subprocess.STDOUT,
-                stdout = subprocess.PIPE,
-            )
-            proc.wait()
-            stdout, stderr = proc.communicate()
-            logger.debug(f'Process stdout: {stdout}')
-            logger.debug(f'Process stderr: {stderr}')
-            return
-        except Exception as e:
-            logger.error(f'Unable to run this cmd, hit exception. Command: {cmd_args} | Exception: {e}')
-            logger.debug(e, exc_info=1)
+            time_started = time.monotonic()
+            try:
+                if shell:
+                    proc = await asyncio.create_subprocess_shell(
+                        cmd_args,
+                        stdout = asyncio.subprocess.PIPE,
+                        stderr = asyncio.subprocess.PIPE,
+                    )
+                else:
+                    proc = await asyncio.create_subprocess_exec(
+                        *cmd_args,
+                        stdout = asyncio.subprocess.PIPE,
+                        stderr = asyncio.subprocess.PIPE,
+                    )
+            except Exception as e:
+                logger.debug(e, exc_info=1)
+                raise StepFailed(f'Unable to run this cmd, hit exception. Command: {cmd_args} | Exception: {e}')
+            async def _stream(stream, log):
+                # Read in chunks rather than lines: StreamReader gives up on a line longer than its limit,
+                # and progress output is often one long line, redrawn with carriage returns
+                def _log(line):
+                    line = line.decode(errors='replace').rstrip()
+                    if line:
+                        log(f'[{proc.pid}] {line}')
+                buffer = b''
+                while True:
+                    chunk = await stream.read(Shell.read_size)
+                    if not chunk:
+                        break
+                    lines = re.split(rb'\r\n|\r|\n', buffer + chunk)
+                    buffer = lines.pop()
+                    for line in lines:
+                        _log(line)
+                    if len(buffer) >= Shell.read_size:
+                        _log(buffer)
+                        buffer = b''
+                _log(buffer)
+            async def _communicate():
+                await asyncio.gather(
+                    _stream(proc.stdout, logger.info),
+                    _stream(proc.stderr, logger.warning),
+                )
+                return await proc.wait()
+            timed_out = False
+            try:
+                await asyncio.wait_for(_communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                logger.error(f'run_cmd(): command did not finish within {timeout}s, stopping it. Command: {cmd_args}')
+            finally:
+                # Also when cancelled, or reading its output failed - don't leave it running
+                if proc.returncode is None:
+                    try:
+                        proc.kill()
+                    except ProcessLookupError:
+                        pass
+                    await proc.wait()
+            duration = time.monotonic() - time_started
+            logger.debug(f'run_cmd(): [{proc.pid}] exited with code {proc.returncode} after {duration:.2f}s')
+            context.renderwatch.event_internal.action_step_shell_cmd_finished(data={
+                'cmd': cmd_args,
+                'returncode': proc.returncode,
+                'duration': duration,
+                'timed_out': timed_out,
+            })
+            if proc.returncode != 0:
+                raise StepFailed(f'Command exited with code {proc.returncode}: {cmd_args}')
+            return proc.returncode
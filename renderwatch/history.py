@@ -0,0 +1,115 @@
+from collections import deque
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+class JobHistory:
+    """
+    Compact record of a render job's state over time.
+    Keeps one full snapshot (the base), then for each change after it, only the keys that changed.
+    Entries beyond `max_entries`, or older than `max_age` seconds, are folded into the base.
+    """
+    def __init__(
+        self,
+        max_entries: int = 100,
+        max_age: int = None,
+    ):
+        self.max_entries = max(max_entries, 1)
+        self.max_age = max_age
+        self.base = None
+        self.base_timestamp = None
+        # Each delta: (timestamp, changed keys and their new values, removed keys)
+        self.deltas = deque()
+        self.latest = None
+        self.latest_timestamp = None
+
+    def append(self, timestamp: int, state: dict):
+        """Record a new state. Returns a dict of the keys that changed, or None for the first entry."""
+        if self.base is None:
+            self.base = dict(state)
+            self.base_timestamp = timestamp
+            self.latest = dict(state)
+            self.latest_timestamp = timestamp
+            return None
+        changed = { k: v for k, v in state.items() if k not in self.latest or self.latest[k] != v }
+        removed = tuple( k for k in self.latest if k not in state )
+        self.deltas.append( (timestamp, changed, removed) )
+        self.latest = dict(state)
+        self.latest_timestamp = timestamp
+        self.trim(now=timestamp)
+        return changed
+
+    def trim(self, now: int = None):
+        """Fold the oldest deltas into the base, until within the retention limits"""
+        while len(self.deltas) + 1 > self.max_entries:
+            self._fold_oldest()
+        if self.max_age is not None and now is not None:
+            while self.deltas and now - self.deltas[0][0] > self.max_age:
+                self._fold_oldest()
+
+    def _fold_oldest(self):
+        timestamp, changed, removed = self.deltas.popleft()
+        self.base.update(changed)
+        for k in removed:
+            self.base.pop(k, None)
+        self.base_timestamp = timestamp
+
+    def __iter__(self):
+        """Yield (timestamp, state) for each retained entry, oldest first"""
+        if self.base is None:
+            return
+        state = dict(self.base)
+        yield self.base_timestamp, dict(state)
+        for timestamp, changed, removed in self.deltas:
+            state.update(changed)
+            for k in removed:
+                state.pop(k, None)
+            yield timestamp, dict(state)
+
+    def __len__(self):
+        if self.base is None:
+            return 0
+        return len(self.deltas) + 1
+
+    def memory_size(self) -> int:
+        """Approximate bytes held by this history, including the latest state"""
+        def _sizeof(obj):
+            size = sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                size += sum(_sizeof(k) + _sizeof(v) for k, v in obj.items())
+            elif isinstance(obj, (list, tuple, deque)):
+                size += sum(_sizeof(i) for i in obj)
+            return size
+        return _sizeof(self.base) + _sizeof(self.deltas) + _sizeof(self.latest)
+
+    def to_dict(self) -> dict:
+        return {
+            'max_entries': self.max_entries,
+            'max_age': self.max_age,
+            'base': self.base,
+            'base_timestamp': self.base_timestamp,
+            'deltas': [ [ timestamp, changed, list(removed) ] for timestamp, changed, removed in self.deltas ],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, max_entries: int = None, max_age: int = None):
+        """Rebuild a history saved with to_dict(). Current retention settings win over the saved ones."""
+        history = cls(
+            max_entries = max_entries or data.get('max_entries', 100),
+            max_age = max_age if max_age is not None else data.get('max_age'),
+        )
+        if data.get('base') is None:
+            return history
+        history.base = data['base']
+        history.base_timestamp = data['base_timestamp']
+        history.latest = dict(history.base)
+        history.latest_timestamp = history.base_timestamp
+        for timestamp, changed, removed in data.get('deltas', []):
+            history.deltas.append( (timestamp, changed, tuple(removed)) )
+            history.latest.update(changed)
+            for k in removed:
+                history.latest.pop(k, None)
+            history.latest_timestamp = timestamp
+        history.trim()
+        return history
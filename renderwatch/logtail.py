@@ -0,0 +1,106 @@
+import logging
+import os
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Lines in Resolve's log that mean a render has failed. Matched case-insensitively.
+# Only Resolve's own render failure messages - general I/O errors are logged for other reasons too, e.g. a missing
+# clip or a cache write, and would fail a render that then completes. Add more with log_watch_patterns.
+DEFAULT_FAILURE_PATTERNS = (
+    r'render(?:ing)?\s+(?:job\s+)?(?:has\s+)?failed',
+    r'failed\s+to\s+render\b',
+)
+
+def default_resolve_log_filepath() -> str:
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Application Support/Blackmagic Design/DaVinci Resolve/logs/davinci_resolve.log')
+    if sys.platform == 'win32':
+        return os.path.join(os.environ.get('APPDATA', ''), 'Blackmagic Design', 'DaVinci Resolve', 'Support', 'logs', 'davinci_resolve.log')
+    return os.path.expanduser('~/.local/share/DaVinciResolve/logs/davinci_resolve.log')
+
+class LogTailer:
+    """
+    Follows a log file as it grows, like `tail -F`: each read_lines() returns only the complete lines added since the last call.
+    Starts at the end of the file, so old entries are never read.
+    Keeps its place by byte offset, and notices the file being rotated (replaced by a new file) or truncated.
+    """
+    def __init__(self, filepath: str, read_size: int = 65536):
+        self.filepath = filepath
+        self.read_size = read_size
+        self._file = None
+        self._inode = None
+        self._partial = b''
+        self._open(from_start=False)
+
+    @property
+    def offset(self) -> int:
+        return self._file.tell() if self._file else 0
+
+    def _open(self, from_start: bool) -> bool:
+        try:
+            f = open(self.filepath, 'rb')
+        except OSError:
+            return False
+        self._file = f
+        self._inode = os.fstat(f.fileno()).st_ino
+        self._partial = b''
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        return True
+
+    def _close(self):
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._inode = None
+
+    def _read_available(self) -> list:
+        lines = []
+        while True:
+            chunk = self._file.read(self.read_size)
+            if not chunk:
+                break
+            chunk = self._partial + chunk
+            *complete, self._partial = chunk.split(b'\n')
+            lines.extend(complete)
+        return [ line.decode('utf-8', errors='replace').rstrip('\r') for line in lines ]
+
+    def read_lines(self) -> list:
+        """Complete lines written since the last call"""
+        if self._file is None:
+            # The log didn't exist yet - anything in it now is new
+            if not self._open(from_start=True):
+                return []
+        lines = self._read_available()
+        try:
+            stat = os.stat(self.filepath)
+        except OSError:
+            # Mid-rotation, or removed - keep the old file until a new one appears
+            return lines
+        if stat.st_ino != self._inode:
+            # Rotated: the old file is finished (read above), carry on from the start of the new one
+            logger.debug(f'Log was rotated, following the new file: {self.filepath}')
+            self._close()
+            if self._open(from_start=True):
+                lines.extend(self._read_available())
+        elif stat.st_size < self._file.tell():
+            # Truncated in place
+            logger.debug(f'Log was truncated, reading from the start: {self.filepath}')
+            self._file.seek(0)
+            self._partial = b''
+            lines.extend(self._read_available())
+        return lines
+
+    def close(self):
+        self._close()
+
+class LogFailureWatcher:
+    """Picks out the lines of a log that report a failed render, using one precompiled pattern"""
+    def __init__(self, tailer: LogTailer, patterns: list = DEFAULT_FAILURE_PATTERNS):
+        self.tailer = tailer
+        self.pattern = re.compile('|'.join( f'(?:{pattern})' for pattern in patterns ), re.IGNORECASE)
+
+    def failures(self) -> list:
+        return [ line for line in self.tailer.read_lines() if self.pattern.search(line) ]
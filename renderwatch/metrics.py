@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import math
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ''
+    escaped = ( f'{k}="' + str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"' for k, v in labels.items() )
+    return '{' + ','.join(escaped) + '}'
+
+class Metric:
+    type = None
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        # Some metrics are recorded from worker threads
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict):
+        return tuple( str(labels.get(labelname, '')) for labelname in self.labelnames )
+
+    def _labels(self, key: tuple, **extra):
+        labels = dict(zip(self.labelnames, key))
+        labels.update(extra)
+        return labels
+
+    def clear(self):
+        self._values = {}
+
+    def samples(self):
+        """Yield (sample name, labels, value)"""
+        for key, value in sorted(list(self._values.items())):
+            yield self.name, self._labels(key), value
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """For counts that are kept elsewhere and copied in when metrics are collected"""
+        self._values[self._key(labels)] = value
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = { 'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0 }
+            entry = self._values[key]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['buckets'][i] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        time_start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - time_start, **labels)
+
+    def samples(self):
+        for key, entry in sorted(list(self._values.items())):
+            for bound, count in zip(self.buckets, entry['buckets']):
+                yield self.name + '_bucket', self._labels(key, le=_format_value(bound)), count
+            yield self.name + '_sum', self._labels(key), entry['sum']
+            yield self.name + '_count', self._labels(key), entry['count']
+
+class Registry:
+    """A set of metrics, rendered in the Prometheus text exposition format"""
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, func):
+        """Add a function that updates metrics from current state, just before they are rendered"""
+        self.collectors.append(func)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f'Metrics collector failed: {e}')
+                logger.debug(e, exc_info=1)
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+# Default registry, and the metrics renderwatch records into it
+REGISTRY = Registry()
+
+poll_duration = REGISTRY.register(Histogram(
+    'renderwatch_poll_duration_seconds',
+    'Time taken by each poll of the Resolve render queue',
+))
+api_call_duration = REGISTRY.register(Histogram(
+    'renderwatch_resolve_api_call_duration_seconds',
+    'Latency of calls to the Resolve scripting API',
+    labelnames = ('call',),
+))
+events_fired = REGISTRY.register(Counter(
+    'renderwatch_events_total',
+    'Number of times each Resolve event fired',
+    labelnames = ('event',),
+))
+step_runs = REGISTRY.register(Counter(
+    'renderwatch_step_runs_total',
+    'Number of user steps run, by result',
+    labelnames = ('step', 'result'),
+))
+jobs_by_status = REGISTRY.register(Gauge(
+    'renderwatch_render_jobs',
+    'Number of render jobs in the queue, by JobStatus',
+    labelnames = ('status',),
+))
+render_fps = REGISTRY.register(Gauge(
+    'renderwatch_render_fps',
+    'Current render speed in frames per second, for each job that is rendering',
+    labelnames = ('job_id', 'job_name'),
+))
+transfer_bytes = REGISTRY.register(Counter(
+    'renderwatch_transfer_bytes_total',
+    'Bytes copied by transfer steps',
+))
+
+class MetricsServer:
+    """Serves a registry over HTTP at /metrics, for Prometheus or anything that reads its format"""
+    def __init__(self, registry: Registry = REGISTRY, host: str = '127.0.0.1', port: int = 9464):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f'Serving metrics at http://{self.host}:{self.port}/metrics')
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Read and ignore the headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status = '200 OK'
+                body = self.registry.render().encode('utf-8')
+            else:
+                status = '404 Not Found'
+                body = b'Not found. Metrics are at /metrics\n'
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
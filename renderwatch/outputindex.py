@@ -0,0 +1,194 @@
+from renderwatch.verify import MULTIPLE_CLIPS_SUFFIX
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Files renderwatch writes itself beside a render (transfer part files, checksum manifests), and their temporary files
+IGNORED_SUFFIXES = ('.renderwatch-part', '.tmp', '.md5', '.sha1', '.sha256', '.sha512')
+
+# Allowance (seconds) for filesystems that keep mtimes to the second, or two (FAT, SMB)
+MTIME_SLACK = 2
+
+def _ignored(name: str) -> bool:
+    return name.startswith('.') or name.lower().endswith(IGNORED_SUFFIXES)
+
+class _Directory:
+    __slots__ = ('mtime_ns', 'scanned_ns', 'files', 'subdirs', 'stems')
+
+    def __init__(self):
+        self.mtime_ns = None
+        self.scanned_ns = None
+        self.files = set()
+        self.subdirs = set()
+        # Name without extension -> file names, to find a render's files without going through the whole folder
+        self.stems = {}
+
+class OutputIndex:
+    """
+    Works out which files each render job wrote, by watching the target directories of the jobs that are rendering.
+    Each directory's listing is kept, and only listed again with os.scandir when its mtime changes -
+    so a poll costs one stat per folder, however many files are in it.
+    A file that appears while jobs are rendering is given to the job that was rendering into that folder:
+    a single-file render claims the files named after its OutputFilename, individual clips claim the rest.
+    """
+    def __init__(self):
+        # dirpath -> _Directory
+        self.directories = {}
+        # JobId -> set of filepaths it wrote
+        self.job_files = {}
+        # Jobs that were rendering at the last update
+        self._rendering = set()
+        # Jobs seen before they started rendering, so every file they wrote since can be told apart from older ones
+        self._seen_idle = set()
+        self._last_update = None
+
+    def files(self, jid: str) -> list:
+        return sorted(self.job_files.get(jid, ()))
+
+    def update(self, targets: dict, rendering: set) -> set:
+        """
+        Look for files written since the last update.
+        - targets: JobId -> (TargetDir, OutputFilename), for every job in the queue
+        - rendering: JobIds that are rendering now
+        Returns the JobIds whose files changed.
+        """
+        now = time.time()
+        # A job that finished since the last update wrote its last files in between
+        candidates = { jid for jid in rendering | self._rendering if jid in targets and targets[jid][0] }
+        window_start = self._last_update - MTIME_SLACK if self._last_update else None
+        changed = set()
+        # Jobs no longer in the queue
+        for jid in set(self.job_files) - set(targets):
+            del self.job_files[jid]
+        # Started rendering again - the files of its last render may not be written again
+        for jid in rendering - self._rendering:
+            if self.job_files.pop(jid, None):
+                changed.add(jid)
+        roots = {}
+        for jid in candidates:
+            target_directory, output_filename = targets[jid]
+            roots.setdefault(os.path.normpath(target_directory), []).append( (jid, output_filename or '') )
+        for root, jobs in roots.items():
+            new_files = []
+            removed_files = []
+            self._scan(root, new_files, removed_files, window_start)
+            for filepath in removed_files:
+                for jid, filepaths in self.job_files.items():
+                    if filepath in filepaths:
+                        filepaths.discard(filepath)
+                        changed.add(jid)
+            changed |= self._attribute(root, jobs, new_files, window_start)
+        # Forget folders that no job renders into any more
+        watched = { os.path.normpath(target_directory) for target_directory, _ in targets.values() if target_directory }
+        for dirpath in list(self.directories):
+            if not any( dirpath == root or dirpath.startswith(root + os.sep) for root in watched ):
+                del self.directories[dirpath]
+        self._seen_idle = { jid for jid in targets if jid not in rendering or jid in self._seen_idle }
+        self._rendering = set(rendering)
+        self._last_update = now
+        return changed
+
+    def _scan(self, dirpath: str, new_files: list, removed_files: list, window_start: float = None):
+        """List a folder again if it changed, then its subfolders. Adds the paths of files that appeared or went."""
+        try:
+            stat = os.stat(dirpath)
+        except OSError:
+            self._forget(dirpath, removed_files)
+            return
+        directory = self.directories.get(dirpath)
+        first_listing = directory is None
+        if first_listing:
+            directory = self.directories[dirpath] = _Directory()
+        # Also list it again if it changed within mtime resolution of the last listing - it may have changed again since
+        if stat.st_mtime_ns != directory.mtime_ns or stat.st_mtime_ns + MTIME_SLACK * 1e9 >= directory.scanned_ns:
+            files = set()
+            subdirs = set()
+            scanned_ns = time.time_ns()
+            try:
+                with os.scandir(dirpath) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                subdirs.add(entry.name)
+                            elif entry.is_file() and not _ignored(entry.name):
+                                files.add(entry.name)
+                        except OSError:
+                            continue
+            except OSError as e:
+                logger.debug(f'Output index: unable to list {dirpath} - {e}')
+                return
+            added = files - directory.files
+            removed = directory.files - files
+            # Nothing was added to a folder not modified since the window began, so none of its files are new
+            if not (first_listing and window_start is not None and stat.st_mtime < window_start):
+                new_files.extend( os.path.join(dirpath, name) for name in added )
+            removed_files.extend( os.path.join(dirpath, name) for name in removed )
+            for name in directory.subdirs - subdirs:
+                self._forget(os.path.join(dirpath, name), removed_files)
+            for name in removed:
+                stem = os.path.splitext(name)[0]
+                directory.stems[stem].discard(name)
+                if not directory.stems[stem]:
+                    del directory.stems[stem]
+            for name in added:
+                directory.stems.setdefault(os.path.splitext(name)[0], set()).add(name)
+            directory.files = files
+            directory.subdirs = subdirs
+            directory.mtime_ns = stat.st_mtime_ns
+            directory.scanned_ns = scanned_ns
+        for name in directory.subdirs:
+            self._scan(os.path.join(dirpath, name), new_files, removed_files, window_start)
+
+    def _forget(self, dirpath: str, removed_files: list):
+        directory = self.directories.pop(dirpath, None)
+        if directory is None:
+            return
+        removed_files.extend( os.path.join(dirpath, name) for name in directory.files )
+        for name in directory.subdirs:
+            self._forget(os.path.join(dirpath, name), removed_files)
+
+    def _attribute(self, root: str, jobs: list, new_files: list, window_start: float) -> set:
+        changed = set()
+        directory = self.directories.get(root)
+        if directory is None:
+            return changed
+        claimed = set()
+        clip_jobs = []
+        for jid, output_filename in jobs:
+            if not output_filename or output_filename.endswith(MULTIPLE_CLIPS_SUFFIX):
+                # Without having seen it start, older clips can't be told apart from the ones it wrote
+                if jid in self._seen_idle:
+                    clip_jobs.append(jid)
+                continue
+            # A single-file render, and any additional outputs beside it: same name, any extension.
+            # Checked by name rather than as new files, as a render can overwrite an earlier one in place.
+            for name in directory.stems.get(os.path.splitext(output_filename)[0], ()):
+                filepath = os.path.join(root, name)
+                claimed.add(filepath)
+                if filepath not in self.job_files.get(jid, ()) and self._written_since(filepath, window_start):
+                    self.job_files.setdefault(jid, set()).add(filepath)
+                    changed.add(jid)
+        if not clip_jobs:
+            return changed
+        for filepath in new_files:
+            if filepath in claimed or not self._written_since(filepath, window_start):
+                continue
+            if len(clip_jobs) != 1:
+                # One job finished and the next started since the last update, both rendering clips into this folder
+                logger.info(f'Output index: more than one job could have written {filepath}, leaving it out')
+                continue
+            self.job_files.setdefault(clip_jobs[0], set()).add(filepath)
+            changed.add(clip_jobs[0])
+        return changed
+
+    @staticmethod
+    def _written_since(filepath: str, window_start: float) -> bool:
+        if window_start is None:
+            return True
+        try:
+            return os.stat(filepath).st_mtime >= window_start
+        except OSError:
+            return False
@@ -0,0 +1,74 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Values of `status` that Resolve gives a render trigger script
+PUSH_STATUSES = ('RenderStarted', 'RenderCompleted', 'RenderFailed')
+
+class PushListener:
+    """
+    Listens on a local Unix socket for pushes from renderwatch_trigger.py, which Resolve runs when a render starts or ends.
+    Each push is one line of JSON: { "job": JobId, "status": one of PUSH_STATUSES, "error": error message or "" }
+    """
+    def __init__(self, filepath: str, on_push):
+        self.filepath = filepath
+        # Coroutine function, called with (job, status, error)
+        self.on_push = on_push
+        self.server = None
+        self.push_count = 0
+
+    @staticmethod
+    def is_supported() -> bool:
+        return hasattr(asyncio, 'start_unix_server')
+
+    async def start(self):
+        # A socket file left behind by a previous run would stop us binding
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+        self.server = await asyncio.start_unix_server(self._handle, path=self.filepath)
+        os.chmod(self.filepath, 0o600)
+        logger.info(f'Listening for render triggers from Resolve at: {self.filepath}')
+
+    async def _handle(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            push = self.parse(line)
+            if push:
+                self.push_count += 1
+                await self.on_push(*push)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f'Unable to handle a render trigger: {e}')
+            logger.debug(e, exc_info=1)
+        finally:
+            writer.close()
+
+    @staticmethod
+    def parse(line: bytes):
+        """Return (job, status, error) from one line of a push, or None if it isn't valid"""
+        try:
+            data = json.loads(line)
+        except ValueError:
+            logger.warning(f'Ignoring a render trigger that was not valid JSON: {line[:200]!r}')
+            return None
+        if not isinstance(data, dict) or not data.get('job') or data.get('status') not in PUSH_STATUSES:
+            logger.warning(f'Ignoring a render trigger without a job and a known status: {data!r}')
+            return None
+        return str(data['job']), data['status'], str(data.get('error') or '')
+
+    def close(self):
+        if self.server:
+            self.server.close()
+        if os.path.exists(self.filepath):
+            os.remove(self.filepath)
+
+    async def stop(self):
+        server = self.server
+        self.close()
+        if server:
+            await server.wait_closed()
+        self.server = None
@@ -1,34 +1,101 @@
+from functools import lru_cache
 import datetime
 import logging
 import logging.config
 import math
+import os
 
-import dictdiffer
-import humanize
+from .history import JobHistory
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
+# A job in one of these statuses won't change again until the user re-renders or resets it
+TERMINAL_STATUSES = ('Complete', 'Failed', 'Cancelled')
+
+@lru_cache(maxsize=256)
+def _humanize_ms(ms) -> str:
+    """e.g. '1 minute and 4 seconds'. Cached, as every template and every job showing the same amount asks for it again."""
+    import humanize
+    return humanize.precisedelta(datetime.timedelta(milliseconds=ms), suppress=['days'])
+
 class RenderJob:
+    # Fields that message templates in actions.yml can use, e.g. '{name} - {status}'
+    TEMPLATE_FIELDS = (
+        'id',
+        'name',
+        'target_directory',
+        'timeline_name',
+        'status',
+        'completion_percent',
+        'job_frame_count',
+        'job_average_fps',
+        'time_elapsed',
+        'time_remaining',
+        'timestamp_short',
+        'line_average_fps',
+        'line_completion_percent',
+        'line_time_elapsed',
+        'line_time_remaining',
+        'output_filepath',
+        'manifest_filepath',
+    )
+
+    # Saved by the job store, to bring a job back after the daemon restarts
+    STORED_ATTRIBUTES = (
+        'id',
+        'name',
+        'target_directory',
+        'timeline_name',
+        'status',
+        'completion_percent',
+        'progress_initial_update',
+        'job_frame_count',
+        'timestamp_short',
+        'last_touched',
+        'job_dump_raw',
+        'render_status_info',
+        '_completion_percentage',
+        '_time_taken_ms',
+        '_time_remaining_ms',
+        'output_files',
+        'manifest_filepath',
+    )
+
     def __init__(self):
         # Defaults
         self.name = None
-        self.history = []
+        self.history = JobHistory()
         self.target_directory = None
         self.timeline_name = None
         self.status = None
         self.completion_percent = None
         self.progress_initial_update = True
         self.job_frame_count = None
-        self.time_elapsed = None
-        self.time_remaining = None
-
-        self.line_average_fps = ''
-        self.line_completion_percent = ''
-        self.line_time_elapsed = ''
-        self.line_time_remaining = ''
+        self.timestamp_short = None
+        # Raw values behind the display fields, which are only worked out when a template asks for them
+        self._completion_percentage = None
+        self._time_taken_ms = None
+        self._time_remaining_ms = None
+        # Render speed from the last two progress updates: (time collected, CompletionPercentage) and frames/sec
+        self._progress_sample = None
+        self.current_fps = None
+        self.job_dump_raw = None
+        self.render_status_info = None
+        self.render_status_checked = None
+        self.latest_state = None
+        self.fingerprint = None
+        # Error of a failure reported outside the API (render trigger, Resolve's log), while the API still says Rendering
+        self.failure_reported = None
+        # Files this job was seen writing into its target directory, from the daemon's output index
+        self.output_files = []
+        # Set by steps that make files about this job, for later steps to use
+        self.manifest_filepath = None
 
     async def _init(self, job_dump, render_status_info, time_collected, renderwatch=None):
         self.renderwatch = renderwatch
+        if renderwatch:
+            self.history = JobHistory(**renderwatch.history_retention)
         time_collected = datetime.datetime.now()
         self.last_touched = False
 
@@ -36,9 +103,51 @@ class RenderJob:
         await self.update(job_dump, render_status_info, time_collected)
         return self
 
+    def to_record(self) -> dict:
+        """Everything needed to restore this job later, as plain JSON-friendly data"""
+        record = { attribute: getattr(self, attribute) for attribute in self.STORED_ATTRIBUTES }
+        record['history'] = self.history.to_dict()
+        return record
+
+    def report_failure(self, error: str = None):
+        """Treat this job as Failed from its next update, for as long as the API keeps saying Rendering"""
+        self.failure_reported = error or 'Render failed'
+
+    def _update_current_fps(self, completion_percentage, time_collected):
+        """Frames rendered per second since the previous progress update, while the job is rendering"""
+        if self.status != 'Rendering' or completion_percentage is False:
+            self._progress_sample = None
+            self.current_fps = None
+            return
+        if self._progress_sample and self.job_frame_count:
+            time_previous, percentage_previous = self._progress_sample
+            seconds = (time_collected - time_previous).total_seconds()
+            if seconds > 0 and completion_percentage >= percentage_previous:
+                frames = (completion_percentage - percentage_previous) / 100 * self.job_frame_count
+                self.current_fps = round(frames / seconds, 1)
+        self._progress_sample = (time_collected, completion_percentage)
+
+    @classmethod
+    def from_record(cls, record: dict, renderwatch=None):
+        """Restore a job saved with to_record(). Its next update() is compared against the restored state."""
+        job = cls()
+        job.renderwatch = renderwatch
+        for attribute in cls.STORED_ATTRIBUTES:
+            if attribute in record:
+                setattr(job, attribute, record[attribute])
+        retention = renderwatch.history_retention if renderwatch else {}
+        job.history = JobHistory.from_dict(record.get('history') or {}, **retention)
+        job.latest_state = job.history.latest
+        if job.latest_state is not None:
+            job.fingerprint = cls._fingerprint(job.latest_state)
+        return job
+
     async def update(self, job_dump, render_status_info, time_collected):
         # Convert to integer for internal use
         timestamp = int(time_collected.timestamp())
+        # Keep the API's values as they came, so the next poll can tell if anything changed
+        self.job_dump_raw = dict(job_dump)
+        self.render_status_info = render_status_info
         self.timestamp_short = time_collected.strftime('%H:%M:%S')
         # Add some defaults, to make comparing new values easier
         job_dump.update({
@@ -49,40 +158,39 @@ class RenderJob:
         })
         # Combine render_status into the job_dump, since it has unique k/vs
         job_dump.update(render_status_info)
+        if self.failure_reported is not None:
+            if job_dump['JobStatus'] == 'Rendering':
+                # Resolve keeps saying Rendering until its error dialog is dismissed - go by the failure we were told about
+                job_dump['JobStatus'] = 'Failed'
+                job_dump['Error'] = job_dump['Error'] or self.failure_reported
+            else:
+                self.failure_reported = None
+        fingerprint = self._fingerprint(job_dump)
+        if self.latest_state is not None and fingerprint is not None and fingerprint == self.fingerprint:
+            # Familiar job and nothing changed - just mark that we checked it, don't do any further work
+            self.last_touched = timestamp
+            return False
         # Create a new history entry marked by time
         def _create_history_entry(timestamp):
-            obj = {
-                'id': job_dump['JobId'],
-                'time': time_collected,
-                'job': job_dump,
-            }
-            self.history.append( (timestamp, obj ) )
-            # TODO - NEED TO DELETE OLD HISTORY ENTRIES !!!!!!!!!*********
-            return 
+            self.history.append(timestamp, job_dump)
+            self.latest_state = self.history.latest
+            self.fingerprint = fingerprint
         # Set/overwrite attribs with the latest job dump info
         self.name = job_dump['RenderJobName']
         self.target_directory = job_dump['TargetDir']
         self.timeline_name = job_dump['TimelineName']
         self.status = job_dump['JobStatus']
-        # Interpret these values a bit
+        self._update_current_fps(job_dump['CompletionPercentage'], time_collected)
+        # Keep the raw values - display fields are worked out from them on demand
         if job_dump['CompletionPercentage']:
+            self._completion_percentage = job_dump['CompletionPercentage']
             self.completion_percent = str(job_dump['CompletionPercentage']) + '%'
-            if self.completion_percent == 100:
-                self.line_completion_percent = f"\nJob completion was: {self.completion_percent}"
         if job_dump['EstimatedTimeRemainingInMs']:
-            amount = datetime.timedelta(milliseconds=job_dump['EstimatedTimeRemainingInMs'])
-            self.time_remaining = humanize.precisedelta(amount, suppress=['days'])
-        if self.time_remaining and self.completion_percent:
-            self.line_time_remaining = f"\n{self.completion_percent} - Remaining: ~{self.time_remaining}"
+            self._time_remaining_ms = job_dump['EstimatedTimeRemainingInMs']
         if job_dump['TimeTakenToRenderInMs']:
-            amount = datetime.timedelta(milliseconds=job_dump['TimeTakenToRenderInMs'])
-            self.time_elapsed = humanize.precisedelta(amount, suppress=['days'])
-            self.line_time_elapsed = f"\nRender time was: {self.time_elapsed}"
-            # Calculate average FPS for job
-            if 'MarkIn' in job_dump and 'MarkOut' in job_dump:
-                self.job_frame_count = job_dump['MarkOut'] - job_dump['MarkIn'] + 1
-                self.job_average_fps = math.floor(self.job_frame_count / amount.seconds)
-                self.line_average_fps = f'\nRender speed (avg): ~{self.job_average_fps} FPS'
+            self._time_taken_ms = job_dump['TimeTakenToRenderInMs']
+        if 'MarkIn' in job_dump and 'MarkOut' in job_dump:
+            self.job_frame_count = job_dump['MarkOut'] - job_dump['MarkIn'] + 1
 
         # Mark that we checked this
         self.last_touched = timestamp
@@ -92,9 +200,8 @@ class RenderJob:
             return True
         else:
             # Familiar job
-            # So check if the job dump contents has changed in any way
-            latest = max(self.history)
-            latest_job = latest[1]['job']
+            # The fingerprint differed, so confirm what changed field by field
+            latest_job = self.latest_state
             if latest_job == job_dump:
                 # Nothing changed - don't do any further work
                 return False
@@ -102,7 +209,9 @@ class RenderJob:
                 # It did change!
                 # TODO: Use a Try here, to handle any unexpected variances in the dicts
                 # that might come from the API.
-                diff_result = dictdiffer.diff(latest_job, job_dump)
+                import dictdiffer
+                with tracing.TRACER.span('diff'):
+                    diff_result = list(dictdiffer.diff(latest_job, job_dump))
                 # Preprocess the results for convenience
                 diff = { 'add': {}, 'change': {}, 'remove': {} }
                 for d_type, param, values in diff_result:
@@ -124,8 +233,8 @@ class RenderJob:
                     elif old == 'Rendering' and new == 'Complete':
                         self.renderwatch.event_resolve.render_job_completed(job=self)
                         event_fired = True
-                        # For multiple jobs queued, need to catch the next item, so check again 
-                        # await self.renderwatch.follow_up_update_render_jobs()
+                        # For multiple jobs queued, need to catch the next item, so check again soon
+                        self.renderwatch.scheduler.burst()
                     elif old == 'Rendering' and new == 'Cancelled':
                         self.renderwatch.event_resolve.render_job_cancelled(job=self)
                         event_fired = True
@@ -135,6 +244,15 @@ class RenderJob:
                     elif old == 'Rendering' and new == 'Failed':
                         self.renderwatch.event_resolve.render_job_failed(job=self)
                         event_fired = True
+                    elif old == 'Failed' and new in ('Complete', 'Rendering'):
+                        # Also where a failure reported outside the API (render trigger, Resolve's log) turned out wrong
+                        logger.info(f'{self.id[:8]} | was Failed, now {new}')
+                        if new == 'Complete':
+                            self.renderwatch.event_resolve.render_job_completed(job=self)
+                            self.renderwatch.scheduler.burst()
+                        else:
+                            self.renderwatch.event_resolve.render_job_started(job=self)
+                        event_fired = True
                 if not event_fired:
                     # No status change, but just an update to Progress
                     if 'CompletionPercentage' in diff['change']:
@@ -154,9 +272,79 @@ class RenderJob:
                 _create_history_entry(timestamp)
                 return True
 
+    def _humanize_ms(self, ms):
+        if not ms:
+            return None
+        return _humanize_ms(ms)
+
+    @property
+    def time_remaining(self):
+        return self._humanize_ms(self._time_remaining_ms)
+
+    @property
+    def time_elapsed(self):
+        return self._humanize_ms(self._time_taken_ms)
+
+    @property
+    def output_filepath(self):
+        """The file this job rendered. For individual clips, the first one."""
+        if not self.output_files:
+            return None
+        output_filename = (self.job_dump_raw or {}).get('OutputFilename')
+        for filepath in self.output_files:
+            if os.path.basename(filepath) == output_filename:
+                return filepath
+        return self.output_files[0]
+
+    @property
+    def job_average_fps(self):
+        if self._time_taken_ms and self.job_frame_count:
+            return math.floor(self.job_frame_count / max(self._time_taken_ms / 1000, 1))
+        return None
+
+    @property
+    def line_completion_percent(self):
+        if self._completion_percentage:
+            return f"\nJob completion was: {self._completion_percentage}%"
+        return ''
+
+    @property
+    def line_time_remaining(self):
+        if self.time_remaining and self.completion_percent:
+            return f"\n{self.completion_percent} - Remaining: ~{self.time_remaining}"
+        return ''
+
+    @property
+    def line_time_elapsed(self):
+        if self._time_taken_ms:
+            return f"\nRender time was: {self.time_elapsed}"
+        return ''
+
+    @property
+    def line_average_fps(self):
+        if self.job_average_fps is not None:
+            return f'\nRender speed (avg): ~{self.job_average_fps} FPS'
+        return ''
+
+    def get_template_field(self, field_name: str):
+        return getattr(self, field_name)
+
+    @staticmethod
+    def _fingerprint(job_dump: dict):
+        """Cheap hash of the job's fields, to tell if anything changed since the last poll. None if the values are unhashable."""
+        try:
+            return hash(tuple(job_dump.items()))
+        except TypeError:
+            return None
+
     def dump(self):
         # Return the most recent data dump about the job
-        return max(self.history)
+        timestamp = self.history.latest_timestamp
+        return (timestamp, {
+            'id': self.id,
+            'time': datetime.datetime.fromtimestamp(timestamp),
+            'job': self.latest_state,
+        })
 
     def __str__(self):
         return self.name
\ No newline at end of file
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+class PollScheduler:
+    """
+    Decides how long the daemon waits between polls of the Resolve API, and waits without blocking the event loop.
+    - Polls at `poll_time_rendering` while any job is Rendering
+    - Backs off from `poll_time` towards `poll_time_idle_max` while the queue is idle
+    - Polls in a quick burst after a job completes, to catch the next queued job
+    - While Resolve is unavailable, retries from `reconnect_delay_min` doubling up to `reconnect_delay_max`, with jitter
+    """
+    def __init__(
+        self,
+        poll_time: float = 2,
+        poll_time_rendering: float = 1,
+        poll_time_idle_max: float = 10,
+        idle_backoff_factor: float = 1.5,
+        burst_interval: float = 0.25,
+        burst_count: int = 4,
+        reconnect_delay_min: float = 1,
+        reconnect_delay_max: float = 60,
+    ):
+        self.idle_backoff_factor = idle_backoff_factor
+        self.burst_interval = burst_interval
+        self.burst_count = burst_count
+        self._burst_remaining = 0
+        self.configure(
+            poll_time = poll_time,
+            poll_time_rendering = poll_time_rendering,
+            poll_time_idle_max = poll_time_idle_max,
+            reconnect_delay_min = reconnect_delay_min,
+            reconnect_delay_max = reconnect_delay_max,
+        )
+        self._wake = asyncio.Event()
+
+    def configure(
+        self,
+        poll_time: float = 2,
+        poll_time_rendering: float = 1,
+        poll_time_idle_max: float = 10,
+        reconnect_delay_min: float = 1,
+        reconnect_delay_max: float = 60,
+    ):
+        """Set the poll times. Also used when config.yml is reloaded - the backoffs start again from the new times."""
+        self.poll_time = poll_time
+        self.poll_time_rendering = min(poll_time_rendering, poll_time)
+        self.poll_time_idle_max = max(poll_time_idle_max, poll_time)
+        self.interval = poll_time
+        self._idle_interval = poll_time
+        self.reconnect_delay_min = reconnect_delay_min
+        self.reconnect_delay_max = max(reconnect_delay_max, reconnect_delay_min)
+        self._reconnect_delay = reconnect_delay_min
+
+    def burst(self):
+        """Poll again almost immediately, a few times over. Safe to call from inside an event handler."""
+        self._burst_remaining = self.burst_count
+        self._wake.set()
+
+    def wake(self):
+        """Cut the current wait short and poll now."""
+        self._wake.set()
+
+    def next_interval(self, render_jobs) -> float:
+        """Given the jobs from the most recent poll, return the seconds to wait before the next one"""
+        if self._burst_remaining > 0:
+            self._burst_remaining -= 1
+            self.interval = self.burst_interval
+        elif any(job.status == 'Rendering' for job in render_jobs):
+            # Active render - stay responsive and reset the idle backoff
+            self._idle_interval = self.poll_time
+            self.interval = self.poll_time_rendering
+        else:
+            # Idle queue - back off gradually
+            self.interval = self._idle_interval
+            self._idle_interval = min(self._idle_interval * self.idle_backoff_factor, self.poll_time_idle_max)
+        return self.interval
+
+    def next_reconnect_interval(self) -> float:
+        """Seconds to wait before trying to reach Resolve again. Somewhere between half and all of the current delay, which doubles each time."""
+        delay = self._reconnect_delay
+        self._reconnect_delay = min(delay * 2, self.reconnect_delay_max)
+        self.interval = delay / 2 + random.uniform(0, delay / 2)
+        return self.interval
+
+    def reset_reconnect(self):
+        """Connected again - the next outage starts from the shortest delay"""
+        self._reconnect_delay = self.reconnect_delay_min
+
+    async def wait(self, interval: float = None):
+        """Sleep until the next poll is due, or until woken by burst() or wake()"""
+        if interval is None:
+            interval = self.interval
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._wake.clear()
@@ -0,0 +1,242 @@
+"""
+A stand-in for the Resolve scripting API, shaped like pydavinci's Resolve object, that replays a scripted render queue.
+Used for tests and benchmarks on machines without Resolve.
+
+    resolve = SimulatedResolve(job_count=100, fail_every=10)
+    simulate.install(resolve)    # `from pydavinci import davinci; davinci.Resolve()` now returns it
+    ...
+    resolve.tick()               # advance the queue one step, then poll again
+"""
+import sys
+import types
+
+JOB_STATUSES = ('Ready', 'Rendering', 'Complete', 'Failed', 'Cancelled')
+
+class SimulatedJob:
+    def __init__(
+        self,
+        index: int,
+        frame_count: int = 240,
+        fps: float = 24,
+        target_directory: str = '/tmp/renderwatch-simulated',
+        timeline_name: str = 'Timeline 1',
+    ):
+        self.index = index
+        self.fps = fps
+        self.dump = {
+            'JobId': f'{index:08x}-0000-4000-8000-simulated000',
+            'RenderJobName': f'Job {index + 1}',
+            'TargetDir': target_directory,
+            'TimelineName': timeline_name,
+            'OutputFilename': f'Job {index + 1}.mov',
+            'IsExportVideo': True,
+            'IsExportAudio': True,
+            'MarkIn': 86400,
+            'MarkOut': 86400 + frame_count - 1,
+            'FrameRate': str(fps),
+        }
+        self.frame_count = frame_count
+        self.status = { 'JobStatus': 'Ready', 'CompletionPercentage': 0 }
+
+    @property
+    def id(self):
+        return self.dump['JobId']
+
+    def start(self):
+        self.status = { 'JobStatus': 'Rendering', 'CompletionPercentage': 0, 'EstimatedTimeRemainingInMs': self._time_ms(100) }
+
+    def advance(self, percent: int):
+        completion = min(self.status['CompletionPercentage'] + percent, 100)
+        if completion >= 100:
+            self.status = { 'JobStatus': 'Complete', 'CompletionPercentage': 100, 'TimeTakenToRenderInMs': self._time_ms(100) }
+        else:
+            self.status = { 'JobStatus': 'Rendering', 'CompletionPercentage': completion, 'EstimatedTimeRemainingInMs': self._time_ms(100 - completion) }
+
+    def fail(self, error: str = 'Render failed: simulated error'):
+        self.status = { 'JobStatus': 'Failed', 'CompletionPercentage': self.status.get('CompletionPercentage', 0), 'Error': error }
+
+    def cancel(self):
+        self.status = { 'JobStatus': 'Cancelled', 'CompletionPercentage': self.status.get('CompletionPercentage', 0) }
+
+    def complete(self):
+        self.status = { 'JobStatus': 'Complete', 'CompletionPercentage': 100, 'TimeTakenToRenderInMs': self._time_ms(100) }
+
+    def reset(self):
+        self.status = { 'JobStatus': 'Ready', 'CompletionPercentage': 0 }
+
+    def _time_ms(self, percent: int) -> int:
+        return int(self.frame_count * percent / 100 / self.fps * 1000)
+
+class SimulatedProject:
+    """Like pydavinci's Project: its name, its render queue and each job's render status"""
+    def __init__(self, resolve, name: str, jobs: list):
+        self._resolve = resolve
+        self._name = name
+        self.jobs = { job.id: job for job in jobs }
+
+    @property
+    def name(self):
+        self._resolve._count('project.name')
+        return self._name
+
+    @property
+    def render_jobs(self):
+        self._resolve._count('project.render_jobs')
+        return [ dict(job.dump) for job in self.jobs.values() ]
+
+    def render_status(self, jid: str):
+        self._resolve._count('project.render_status')
+        job = self.jobs.get(jid)
+        if job is None:
+            return {}
+        return dict(job.status)
+
+    @property
+    def _obj(self):
+        # pydavinci keeps the scripting API's own object here, for calls it doesn't wrap
+        return self
+
+    def IsRenderingInProgress(self):
+        self._resolve._count('project.IsRenderingInProgress')
+        return any( job.status['JobStatus'] == 'Rendering' for job in self.jobs.values() )
+
+class SimulatedProjectManager:
+    def __init__(self, resolve):
+        self._resolve = resolve
+
+    @property
+    def db(self):
+        self._resolve._count('project_manager.db')
+        return dict(self._resolve._db)
+
+class SimulatedResolve:
+    """
+    A render queue of `job_count` jobs, rendered one at a time as tick() is called.
+    Each tick advances the rendering job by `progress_step` percent.
+    Every `fail_every`th job fails halfway and every `cancel_every`th job is cancelled halfway (0 to never).
+    `completed` jobs start out already Complete.
+    `script` is a list of (tick number, method name, kwargs) to call on this object when that tick is reached,
+    e.g. [ (5, 'switch_project', { 'name': 'Project B' }), (8, 'quit', {}) ].
+    Every read that would be a round trip to Resolve is counted in `call_counts`.
+    """
+    def __init__(
+        self,
+        job_count: int = 10,
+        project_name: str = 'Simulated Project',
+        db_name: str = 'Local Database',
+        progress_step: int = 10,
+        fail_every: int = 0,
+        cancel_every: int = 0,
+        completed: int = 0,
+        frame_count: int = 240,
+        script: list = None,
+    ):
+        self.progress_step = progress_step
+        self.fail_every = fail_every
+        self.cancel_every = cancel_every
+        self.frame_count = frame_count
+        self.script = sorted(script or [], key=lambda entry: entry[0])
+        self.ticks = 0
+        self.call_counts = {}
+        self._obj = object()
+        self._db = { 'DbType': 'Disk', 'DbName': db_name }
+        self._project = None
+        self._next_index = 0
+        self.switch_project(project_name, job_count)
+        for job in list(self._project.jobs.values())[:completed]:
+            job.complete()
+        self._project_manager = SimulatedProjectManager(self)
+
+    def _count(self, call: str):
+        if self._obj is None:
+            raise RuntimeError(f'Resolve is not running: {call}')
+        self.call_counts[call] = self.call_counts.get(call, 0) + 1
+
+    @property
+    def api_calls(self) -> int:
+        return sum(self.call_counts.values())
+
+    def reset_call_counts(self):
+        self.call_counts = {}
+
+    @property
+    def project(self):
+        self._count('project')
+        return self._project
+
+    @property
+    def project_manager(self):
+        self._count('project_manager')
+        return self._project_manager
+
+    # Queue changes
+    def _new_jobs(self, count: int) -> list:
+        jobs = []
+        for _ in range(count):
+            jobs.append(SimulatedJob(self._next_index, frame_count=self.frame_count))
+            self._next_index += 1
+        return jobs
+
+    def add_jobs(self, count: int = 1) -> list:
+        jobs = self._new_jobs(count)
+        for job in jobs:
+            self._project.jobs[job.id] = job
+        return jobs
+
+    def remove_job(self, jid: str):
+        self._project.jobs.pop(jid, None)
+
+    def rendering_job(self):
+        for job in self._project.jobs.values():
+            if job.status['JobStatus'] == 'Rendering':
+                return job
+        return None
+
+    def tick(self):
+        """Advance the render queue by one step, and run anything scripted for this tick"""
+        self.ticks += 1
+        while self.script and self.script[0][0] <= self.ticks:
+            _, method, kwargs = self.script.pop(0)
+            getattr(self, method)(**kwargs)
+        if self._obj is None:
+            return
+        job = self.rendering_job()
+        if job is None:
+            job = next(( j for j in self._project.jobs.values() if j.status['JobStatus'] == 'Ready' ), None)
+            if job:
+                job.start()
+            return
+        number = job.index + 1
+        halfway = job.status['CompletionPercentage'] + self.progress_step >= 50
+        if self.fail_every and number % self.fail_every == 0 and halfway:
+            job.fail()
+        elif self.cancel_every and number % self.cancel_every == 0 and halfway:
+            job.cancel()
+        else:
+            job.advance(self.progress_step)
+
+    # Environment changes
+    def switch_project(self, name: str, job_count: int = None):
+        if job_count is None:
+            job_count = len(self._project.jobs) if self._project else 0
+        self._project = SimulatedProject(self, name, self._new_jobs(job_count))
+
+    def switch_db(self, name: str, db_type: str = 'Disk'):
+        self._db = { 'DbType': db_type, 'DbName': name }
+
+    def quit(self):
+        """Resolve closes - every API call fails until relaunch()"""
+        self._obj = None
+
+    def relaunch(self):
+        self._obj = object()
+
+def install(resolve: SimulatedResolve):
+    """Make `from pydavinci import davinci` give out the simulated Resolve"""
+    davinci = types.ModuleType('pydavinci.davinci')
+    davinci.Resolve = lambda: resolve
+    pydavinci = types.ModuleType('pydavinci')
+    pydavinci.davinci = davinci
+    sys.modules['pydavinci'] = pydavinci
+    sys.modules['pydavinci.davinci'] = davinci
+    return resolve
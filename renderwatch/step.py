@@ -1,6 +1,11 @@
 from .renderjob import RenderJob
-from .exceptions import UserInvalidConfig
+from .exceptions import StepFailed, UserInvalidConfig
+from . import metrics
+from . import tracing
+from .template import compile_template
 
+import asyncio
+import inspect
 import logging
 from functools import partial
 from typing import Any, Callable
@@ -10,7 +15,10 @@ logger = logging.getLogger(__name__)
 class Step(object):
     methods = {}
     required_params = {}
+    template_params = {}
     renderwatch = None
+    # Background work started by steps, kept referenced until it finishes
+    _tasks = set()
 
     def __init__(
         self,
@@ -27,13 +35,13 @@ class Step(object):
         self.trigger = trigger
     
     @classmethod
-    def action(self, action_keyword: str, *args, params: list = []):
+    def action(self, action_keyword: str, *args, params: list = [], templates: list = []):
         def decorator(func):
             instance = partial(
                 func,
                 self,
             )
-            self._register_method(action_keyword, instance, params)
+            self._register_method(action_keyword, instance, params, templates)
             return instance
         return decorator
 
@@ -43,9 +51,18 @@ class Step(object):
         action_keyword: str,
         method: Callable[[str], Any],
         params: list,
+        templates: list = [],
     ):
         self.methods[action_keyword] = method
         self.required_params[action_keyword] = params
+        self.template_params[action_keyword] = templates
+
+    def compile_templates(self, action_keyword: str, params: dict):
+        """Compile the params that are message templates. Raises UserInvalidTemplate if one is malformed or uses an unknown field."""
+        for param in self.template_params.get(action_keyword, []):
+            if params.get(param) is not None:
+                params[param] = compile_template(params[param])
+        return params
 
     @classmethod
     def run(
@@ -54,17 +71,69 @@ class Step(object):
         *args,
         callback_pre: Callable,
         callback_post: Callable,
+        callback_failed: Callable = None,
         **kwargs,
     ):
         callback_pre()
-        result = func(
-            self,
-            *args,
-            **kwargs,
-        )
+        try:
+            with tracing.TRACER.span('step:' + self.__name__):
+                result = func(
+                    self,
+                    *args,
+                    **kwargs,
+                )
+        except Exception as e:
+            self._step_failed(e, callback_failed)
+            return None
+        if inspect.isawaitable(result):
+            # Step does its work asynchronously - finish it in the background so the poll loop isn't held up
+            async def _finish():
+                # Timed as its own trace until the work is done, not as part of the poll that started it
+                with tracing.TRACER.span('step:' + self.__name__):
+                    try:
+                        value = await result
+                    except Exception as e:
+                        self._step_failed(e, callback_failed)
+                        return None
+                metrics.step_runs.inc(step=self.__name__, result='success')
+                callback_post()
+                return value
+            return self.spawn(_finish())
+        metrics.step_runs.inc(step=self.__name__, result='success')
         callback_post()
         return result
 
+    @classmethod
+    def _step_failed(self, e: Exception, callback_failed: Callable = None):
+        """A step failing is logged and counted, but never stops the daemon"""
+        metrics.step_runs.inc(step=self.__name__, result='failure')
+        if isinstance(e, StepFailed):
+            logger.warning(f'{self.__name__} step failed: {e}')
+        else:
+            logger.error(f'{self.__name__} step hit an exception: {e.__class__.__name__}: {e}')
+            logger.debug(e, exc_info=e)
+        if callback_failed:
+            callback_failed()
+
+    @classmethod
+    def spawn(self, coro):
+        """Run a coroutine in the background on the daemon's event loop, or to completion if no loop is running"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(tracing.TRACER.detach(coro))
+        task = loop.create_task(tracing.TRACER.detach(coro))
+        Step._tasks.add(task)
+        task.add_done_callback(Step._task_done)
+        return task
+
+    @staticmethod
+    def _task_done(task):
+        Step._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f'Step hit an exception while running in the background: {task.exception()}')
+            logger.debug(task.exception(), exc_info=task.exception())
+
     def get_method_from_keyword(self, action_keyword: str):
         """Sets the Step's `action` keyword and returns the method connected to it"""
         if action_keyword in self.methods:
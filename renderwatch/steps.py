@@ -1,9 +1,13 @@
 from .telegram import Telegram
 from .functions import Shell, VerifyOutput
+from .checksum import Checksum
+from .transfer import Transfer
 
 from enum import Enum
 
 class Steps(Enum):
     telegram = Telegram
     verify_output = VerifyOutput
+    checksum = Checksum
+    transfer = Transfer
     shell = Shell
\ No newline at end of file
@@ -0,0 +1,72 @@
+import json
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+class JobStore:
+    """
+    Render job state kept in SQLite in the user data dir, so it survives a daemon restart.
+    Jobs are kept per project and database. Changes are queued during a poll and written together in one transaction by flush().
+    """
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.conn = sqlite3.connect(filepath)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS render_jobs (
+                scope TEXT NOT NULL,
+                id TEXT NOT NULL,
+                record TEXT NOT NULL,
+                PRIMARY KEY (scope, id)
+            )
+        ''')
+        self.conn.commit()
+        self._pending_saves = {}
+        self._pending_deletes = set()
+
+    @staticmethod
+    def scope(project_name: str, db) -> str:
+        """Key for one project in one database"""
+        return json.dumps([ project_name, db ], sort_keys=True, default=str)
+
+    def load(self, scope: str) -> list:
+        rows = self.conn.execute('SELECT record FROM render_jobs WHERE scope = ?', (scope,)).fetchall()
+        records = []
+        for (record,) in rows:
+            try:
+                records.append(json.loads(record))
+            except ValueError as e:
+                logger.warning(f'Job store: skipping an unreadable record - {e}')
+        return records
+
+    def save(self, scope: str, job):
+        """Queue a job to be written at the next flush(). Only its latest state is written."""
+        self._pending_deletes.discard((scope, job.id))
+        self._pending_saves[(scope, job.id)] = job
+
+    def delete(self, scope: str, jid: str):
+        self._pending_saves.pop((scope, jid), None)
+        self._pending_deletes.add((scope, jid))
+
+    def flush(self):
+        """Write everything queued since the last flush, in one transaction"""
+        if not self._pending_saves and not self._pending_deletes:
+            return 0
+        saves = [ (scope, jid, json.dumps(job.to_record(), default=str)) for (scope, jid), job in self._pending_saves.items() ]
+        deletes = list(self._pending_deletes)
+        try:
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO render_jobs (scope, id, record) VALUES (?, ?, ?)', saves)
+                self.conn.executemany('DELETE FROM render_jobs WHERE scope = ? AND id = ?', deletes)
+        except sqlite3.Error as e:
+            logger.error(f'Job store: unable to write to {self.filepath} - {e}')
+            return 0
+        self._pending_saves = {}
+        self._pending_deletes = set()
+        return len(saves) + len(deletes)
+
+    def close(self):
+        self.flush()
+        self.conn.close()
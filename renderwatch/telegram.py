@@ -1,25 +1,144 @@
+from renderwatch.cache import ValidationCache
+from renderwatch.exceptions import StepFailed
+from renderwatch.renderjob import TERMINAL_STATUSES
 from renderwatch.step import Step
 
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from os import getenv
-from pprint import pprint
-
-import requests
+import time
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_API_URL = 'https://api.telegram.org'
+
+class TelegramAPI:
+    """
+    Connection to the Telegram Bot API, through a keep-alive connection pool shared by every Telegram step.
+    Calls made with `call_async` run on a small thread pool, so they never block the event loop.
+    """
+    _clients = {}
+
+    def __init__(
+        self,
+        api_url: str = DEFAULT_API_URL,
+        timeout: float = 10,
+        pool_size: int = 4,
+    ):
+        # Deferred - requests is slow to import and only needed once a message is sent
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.requests = requests
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='renderwatch-telegram')
+
+    @classmethod
+    def get(self, api_url: str = DEFAULT_API_URL, timeout: float = 10):
+        """Return the shared client for this API url, creating it on first use"""
+        key = (api_url, timeout)
+        if key not in self._clients:
+            self._clients[key] = self(api_url=api_url, timeout=timeout)
+        return self._clients[key]
+
+    def call(self, token: str, method: str, params: dict = None):
+        """Call a Bot API method and return the decoded `result`, or None if it failed"""
+        url = f"{self.api_url}/bot{token}/{method}"
+        try:
+            request = self.session.post(url, json=params or {}, timeout=self.timeout)
+        except self.requests.RequestException as e:
+            # Connection errors quote the URL, which has the token in it
+            message = str(e).replace(token, '<token>') if token else str(e)
+            logger.error(f"Telegram {method} - request failed: {e.__class__.__name__}: {message}")
+            return None
+        try:
+            response = request.json()
+        except ValueError:
+            response = {}
+        if request.ok and response.get('ok') is True:
+            return response.get('result', True)
+        logger.error(f"Telegram {method} - {request} - {request.text}")
+        return None
+
+    async def call_async(self, token: str, method: str, params: dict = None):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self.call, token, method, params))
+
+class TokenBucket:
+    """Allows `rate` sends per second on average, and up to `capacity` sends in a quick burst"""
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Wait until a send is allowed, then use it up"""
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= 1
+
+class LiveMessage:
+    """A message about one job in one chat, sent once and then edited in place as the job progresses"""
+    def __init__(self, chat_id):
+        self.chat_id = chat_id
+        self.message_id = None
+        self.sent_text = None
+        self.pending_text = None
+        self.sending = False
+        # Resolved once the send in flight has caught up with pending_text
+        self.flushed = None
+        self.finished = False
+
 class Telegram(Step):
+    # Shared by every Telegram step - chat_id: TokenBucket
+    _buckets = {}
+    # (token, chat_id, job id): LiveMessage
+    _live_messages = {}
+
     def __init__(self):
         super(Telegram, self).__init__()
         self.token = None
+        self.api_url = DEFAULT_API_URL
+        self.timeout = 10
+        self.rate_limit_per_minute = 20
+
+    @property
+    def api(self):
+        return TelegramAPI.get(self.api_url, self.timeout)
+
+    def bucket(self, chat_id):
+        """Rate limit for this chat. Telegram allows about 20 messages a minute into a group, with small bursts."""
+        if chat_id not in Telegram._buckets:
+            Telegram._buckets[chat_id] = TokenBucket(rate=self.rate_limit_per_minute / 60, capacity=3)
+        return Telegram._buckets[chat_id]
 
     def __validate__(
         self,
         token_env_var: str = None,
         token_filepath: str = None,
         token_plaintext: str = None,
+        api_url: str = DEFAULT_API_URL,
+        timeout: float = 10,
+        rate_limit_per_minute: int = 20,
         force: bool = False,
     ):
+        self.api_url = api_url or DEFAULT_API_URL
+        self.timeout = timeout or 10
+        self.rate_limit_per_minute = rate_limit_per_minute or 20
         if self.token and not force:
             # Already have a good token
             return True
@@ -43,10 +162,21 @@ class Telegram(Step):
             if token_plaintext:
                 yield ( 'token_plaintext', token_plaintext )
         token = None
+        cache = getattr(self.renderwatch, 'validation_cache', None)
         for token_type, token_value in _search_tokens():
-            if Telegram.check_token_is_valid(token_value):
+            cache_key = ValidationCache.key('telegram', token_value)
+            if cache and cache.is_valid(cache_key):
+                # Skip the network at startup, and confirm it once the daemon is running
+                logger.debug(f"This token ({token_type}) was validated recently, will check it again in the background")
+                self.renderwatch.schedule_revalidation(partial(self.revalidate_token, token_value))
+                token = token_value
+                break
+            if self.check_token_is_valid(token_value):
                 logger.debug(f"This token ({token_type}) is valid")
+                if cache:
+                    cache.store(cache_key)
                 token = token_value
+                break
             else:
                 logger.warning(f"This token ({token_type}) did not give a good response from Telegram API. Trying the next available token instead.")
                 continue
@@ -57,17 +187,23 @@ class Telegram(Step):
             logger.error(f"There were no valid tokens listed in your renderwatch.steps.telegram in config. Either specify token_environment_variable_name, token_filepath or token_plaintext.\nThis Telegram step will not be run.")
             return False
     
-    def check_token_is_valid(token):
-        api_url = f"https://api.telegram.org/bot{token}/getMe"
-        request = requests.get(api_url)
-        if request.status_code == 200:
-            if 'ok' in request.json():
-                if request.json()['ok'] is True:
-                    return True
-        logger.warning(f"check_token_is_valid - False - request {request.text}")
+    def check_token_is_valid(self, token):
+        if self.api.call(token, 'getMe'):
+            return True
+        logger.warning(f"check_token_is_valid - False")
         return False
 
-    @Step.action('send_message', params=['chat_id', 'message'])
+    def revalidate_token(self, token):
+        """Check a token that was accepted from the validation cache, and update the cache"""
+        cache_key = ValidationCache.key('telegram', token)
+        if self.check_token_is_valid(token):
+            self.renderwatch.validation_cache.store(cache_key)
+            return True
+        self.renderwatch.validation_cache.discard(cache_key)
+        logger.error(f"Your Telegram token is no longer valid. Telegram steps will fail until it is fixed in config.yml and renderwatch_daemon is restarted.")
+        return False
+
+    @Step.action('send_message', params=['chat_id', 'message'], templates=['message'])
     def send_message(
         self,
         context,
@@ -81,14 +217,87 @@ class Telegram(Step):
             message,
             kwargs['job'],
         )
-        # Send
-        api_url = f"https://api.telegram.org/bot{context.token}/sendMessage"
-        request = requests.get(
-            api_url,
-            params = {
+        # Send in the background
+        return Telegram._send(context, chat_id, message_formatted)
+
+    @staticmethod
+    async def _send(context, chat_id, text):
+        await context.bucket(chat_id).acquire()
+        result = await context.api.call_async(
+            context.token,
+            'sendMessage',
+            {
                 'chat_id': chat_id,
-                'text': message_formatted,
+                'text': text,
             },
         )
-        if not request.ok:
-            logger.error(f'{request} - {request.text}')
+        if not result:
+            raise StepFailed(f'Telegram message to {chat_id} was not sent')
+        context.renderwatch.event_internal.action_step_telegram_message_sent(data={ 'chat_id': chat_id, 'text': text })
+        return result
+
+    @Step.action('send_progress', params=['chat_id', 'message'], templates=['message'])
+    def send_progress(
+        self,
+        context,
+        *args,
+        chat_id: int,
+        message: str,
+        **kwargs,
+    ):
+        """Send one message per job, then keep editing it as the job progresses"""
+        job = kwargs['job']
+        message_formatted = context.renderwatch.format_message_from_renderjob(
+            message,
+            job,
+        )
+        key = (context.token, chat_id, job.id)
+        live = Telegram._live_messages.get(key)
+        if live is None:
+            live = Telegram._live_messages[key] = LiveMessage(chat_id)
+        # Replace anything not yet sent - only the newest text is worth sending
+        live.pending_text = message_formatted
+        # Once the job has finished, the next render of it gets a new message
+        live.finished = job.status in TERMINAL_STATUSES
+        if live.sending:
+            # Already being sent in the background, which will pick up this text - wait for that
+            return live.flushed
+        live.sending = True
+        try:
+            live.flushed = asyncio.get_running_loop().create_future()
+        except RuntimeError:
+            live.flushed = None
+        return Telegram._flush_live_message(context, key, live)
+
+    @staticmethod
+    async def _flush_live_message(context, key, live):
+        try:
+            while live.pending_text is not None:
+                await context.bucket(live.chat_id).acquire()
+                text, live.pending_text = live.pending_text, None
+                if text == live.sent_text:
+                    # Telegram refuses an edit that changes nothing
+                    continue
+                if live.message_id is None:
+                    result = await context.api.call_async(context.token, 'sendMessage', {
+                        'chat_id': live.chat_id,
+                        'text': text,
+                    })
+                    if result:
+                        live.message_id = result['message_id']
+                else:
+                    result = await context.api.call_async(context.token, 'editMessageText', {
+                        'chat_id': live.chat_id,
+                        'message_id': live.message_id,
+                        'text': text,
+                    })
+                if result:
+                    live.sent_text = text
+                    context.renderwatch.event_internal.action_step_telegram_message_sent(data={ 'chat_id': live.chat_id, 'text': text })
+        finally:
+            live.sending = False
+            if live.flushed is not None and not live.flushed.done():
+                live.flushed.set_result(None)
+            live.flushed = None
+            if live.finished:
+                Telegram._live_messages.pop(key, None)
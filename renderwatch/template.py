@@ -0,0 +1,42 @@
+from .exceptions import UserInvalidTemplate
+from .renderjob import RenderJob
+
+from string import Formatter
+from typing import Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MessageTemplate:
+    """
+    Text with {field} placeholders for a render job, e.g. '{name} - {status}'.
+    Parsed and checked once when actions load, so a misspelt field is reported straight away, not when a render finishes.
+    Only the fields a template uses are looked up on the job when it renders.
+    """
+    def __init__(self, text: str):
+        self.text = text
+        self.fields = set()
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            raise UserInvalidTemplate(f"'{text}' - {e}")
+        for literal_text, field_name, format_spec, conversion in parsed:
+            if field_name is None:
+                continue
+            # Only the job field itself matters, not any attribute or index after it
+            root = field_name.split('.')[0].split('[')[0]
+            if root not in RenderJob.TEMPLATE_FIELDS:
+                raise UserInvalidTemplate(f"'{text}' - did not recognise this field: {{{field_name}}}")
+            self.fields.add(root)
+
+    def render(self, job: RenderJob) -> str:
+        return self.text.format(**{ field: job.get_template_field(field) for field in self.fields })
+
+    def __str__(self):
+        return self.text
+
+def compile_template(value: Union[str, list]):
+    """Compile a step param into a MessageTemplate, or a list of them. Raises UserInvalidTemplate."""
+    if isinstance(value, list):
+        return [ MessageTemplate(str(item)) for item in value ]
+    return MessageTemplate(str(value))
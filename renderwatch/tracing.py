@@ -0,0 +1,108 @@
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter
+import contextvars
+import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed phase, and the phases nested inside it"""
+    __slots__ = ('name', 'time_start', 'duration', 'children', 'started_at')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.time_start = None
+        self.duration = 0.0
+        self.children = []
+        self.started_at = None
+
+    def self_time(self) -> float:
+        return max(self.duration - sum(child.duration for child in self.children), 0.0)
+
+class _SpanContext:
+    __slots__ = ('tracer', 'span', 'parent', 'token')
+
+    def __init__(self, tracer, name: str):
+        self.tracer = tracer
+        self.span = Span(name)
+
+    def __enter__(self):
+        self.parent = self.tracer._current.get()
+        if self.parent is not None:
+            self.parent.children.append(self.span)
+        else:
+            self.span.started_at = datetime.datetime.now()
+        self.token = self.tracer._current.set(self.span)
+        self.span.time_start = perf_counter()
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.duration = perf_counter() - self.span.time_start
+        self.tracer._current.reset(self.token)
+        if self.parent is None:
+            self.tracer.traces.append(self.span)
+        return False
+
+_NULL_SPAN = nullcontext()
+
+class Tracer:
+    """
+    Nested timing spans for the poll loop, kept in a ring buffer of the most recent top-level spans (usually one per poll).
+    Disabled, span() hands back a shared no-op context, so the instrumentation can stay in the hot path.
+    The open span is tracked per task, so background work started with detach() records its own traces.
+    """
+    def __init__(self, enabled: bool = False, max_traces: int = 50):
+        self.enabled = enabled
+        self.traces = deque(maxlen=max_traces)
+        self._current = contextvars.ContextVar('renderwatch_span', default=None)
+
+    def configure(self, enabled: bool, max_traces: int = 50):
+        self.enabled = enabled
+        if max_traces != self.traces.maxlen:
+            self.traces = deque(self.traces, maxlen=max_traces)
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _SpanContext(self, name)
+
+    async def detach(self, coro):
+        """Await a coroutine outside whichever span was open when it was started, e.g. as a background task"""
+        self._current.set(None)
+        return await coro
+
+    def slowest(self, count: int = 10) -> list:
+        return sorted(self.traces, key=lambda span: span.duration, reverse=True)[:count]
+
+    def folded(self, count: int = 10) -> str:
+        """
+        The slowest recent traces in folded stack format - one line per stack, with its self time in microseconds.
+        Readable by flamegraph.pl, speedscope and similar tools.
+        """
+        lines = []
+        def _fold(span, prefix):
+            frames = f'{prefix};{span.name}' if prefix else span.name
+            self_us = round(span.self_time() * 1000000)
+            if self_us:
+                lines.append(f'{frames} {self_us}')
+            for child in span.children:
+                _fold(child, frames)
+        for span in self.slowest(count):
+            # Keep each trace as its own root frame, so they aren't merged together
+            root_name = f'{span.name} {span.started_at:%H:%M:%S.%f} ({span.duration * 1000:.1f}ms)'
+            root = Span(root_name)
+            root.duration = span.duration
+            root.children = span.children
+            _fold(root, '')
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, filepath: str, count: int = 10) -> str:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(self.folded(count))
+        logger.info(f'Wrote the {min(count, len(self.traces))} slowest of {len(self.traces)} recent traces to: {filepath}')
+        return filepath
+
+# Default tracer, used throughout renderwatch
+TRACER = Tracer()
@@ -0,0 +1,250 @@
+from renderwatch import metrics
+from renderwatch.exceptions import StepFailed
+from renderwatch.outputindex import MTIME_SLACK
+from renderwatch.step import Step
+from renderwatch.template import MessageTemplate
+from renderwatch.verify import job_output_files
+
+import asyncio
+import errno
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# A file being copied is written under this name, then renamed once it is complete
+PART_SUFFIX = '.renderwatch-part'
+
+# The end of a partial copy that is compared against the source before resuming it
+RESUME_CHECK_SIZE = 1024 * 1024
+
+# A kernel copy that fails with one of these isn't supported for this pair of files - fall back to the next way
+_UNSUPPORTED_ERRNOS = { errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK, errno.EBADF }
+
+def _copy_file_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    os.lseek(dst_fd, offset, os.SEEK_SET)
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+def _read_write(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    data = os.pread(src_fd, min(count, 8 * 1024 * 1024), offset)
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(dst_fd, view, offset)
+        offset += written
+        view = view[written:]
+    return len(data)
+
+def copy_methods() -> list:
+    """
+    Ways to copy a range of a file, fastest first.
+    copy_file_range and sendfile copy inside the kernel, without the data passing through Python.
+    copy_file_range can also clone blocks on filesystems that support it, or copy server-side on NFS and SMB.
+    """
+    methods = []
+    if hasattr(os, 'copy_file_range'):
+        methods.append(_copy_file_range)
+    # Only Linux can sendfile between two files; elsewhere it needs a socket
+    if sys.platform.startswith('linux') and hasattr(os, 'sendfile'):
+        methods.append(_sendfile)
+    methods.append(_read_write)
+    return methods
+
+def resume_offset(src: str, part: str, size: int) -> int:
+    """Bytes of an earlier partial copy that can be kept, or 0 to start again"""
+    try:
+        part_size = os.stat(part).st_size
+    except OSError:
+        return 0
+    if part_size > size:
+        return 0
+    check_size = min(part_size, RESUME_CHECK_SIZE)
+    with open(src, 'rb') as fsrc, open(part, 'rb') as fpart:
+        fsrc.seek(part_size - check_size)
+        fpart.seek(part_size - check_size)
+        if fsrc.read(check_size) != fpart.read(check_size):
+            return 0
+    return part_size
+
+def is_copied(src: str, dst: str) -> bool:
+    """Whether dst is already a finished copy of src"""
+    try:
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    # copystat() sets the copy's mtime from the source, to whatever precision the destination's filesystem keeps
+    return src_stat.st_size == dst_stat.st_size and abs(src_stat.st_mtime_ns - dst_stat.st_mtime_ns) <= MTIME_SLACK * 1e9
+
+def copy_file(src: str, dst: str, chunk_size: int = 64 * 1024 * 1024, on_progress = None) -> int:
+    """
+    Copy one file, resuming an earlier partial copy of it if there is one. Returns the bytes copied.
+    Copies in chunks of `chunk_size`, calling on_progress(bytes) after each.
+    """
+    if is_copied(src, dst):
+        return 0
+    size = os.stat(src).st_size
+    part = dst + PART_SUFFIX
+    offset = resume_offset(src, part, size)
+    if offset:
+        logger.info(f'transfer: resuming {os.path.basename(dst)} from {offset / 1024 / 1024:.1f} MB')
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    copied = 0
+    methods = copy_methods()
+    with open(src, 'rb') as fsrc, open(part, 'r+b' if offset else 'wb') as fdst:
+        fdst.truncate(offset)
+        src_fd = fsrc.fileno()
+        dst_fd = fdst.fileno()
+        while offset < size:
+            count = min(chunk_size, size - offset)
+            try:
+                written = methods[0](src_fd, dst_fd, offset, count)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS or len(methods) == 1:
+                    raise
+                logger.debug(f'transfer: {methods[0].__name__} is not supported here ({e}), falling back')
+                methods.pop(0)
+                continue
+            if not written:
+                if len(methods) == 1:
+                    raise OSError(errno.EIO, f'Source ended early, at {offset} of {size} bytes', src)
+                # Some filesystems report nothing copied rather than an error
+                methods.pop(0)
+                continue
+            offset += written
+            copied += written
+            if on_progress:
+                on_progress(written)
+    shutil.copystat(src, part)
+    os.replace(part, dst)
+    return copied
+
+class TransferProgress:
+    """Bytes copied so far by one transfer, added to from the copying threads"""
+    def __init__(self, total_bytes: int):
+        self.total_bytes = total_bytes
+        self.copied_bytes = 0
+        self.time_started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, count: int):
+        with self._lock:
+            self.copied_bytes += count
+        metrics.transfer_bytes.inc(count)
+
+    @property
+    def bytes_per_second(self) -> float:
+        elapsed = time.monotonic() - self.time_started
+        return self.copied_bytes / elapsed if elapsed > 0 else 0
+
+class Transfer(Step):
+    """Copy a render's output files to another folder or drive"""
+    # Shared by every transfer step, so the limit on files copied at once applies across all actions
+    _executor = None
+    chunk_size = 64 * 1024 * 1024
+    progress_interval = 5
+
+    def __init__(self):
+        super(Transfer, self).__init__()
+
+    def __validate__(
+        self,
+        max_concurrent: int = 2,
+        chunk_size_mb: int = 64,
+        progress_interval: float = 5,
+        force: bool = False,
+    ):
+        Transfer.chunk_size = max(int(chunk_size_mb or 1), 1) * 1024 * 1024
+        Transfer.progress_interval = progress_interval
+        if Transfer._executor is None or force:
+            Transfer._executor = ThreadPoolExecutor(
+                max_workers = max(int(max_concurrent or 1), 1),
+                thread_name_prefix = 'renderwatch-transfer',
+            )
+        return True
+
+    @Step.action('copy_outputs', params=['destination'], templates=['destination'])
+    def copy_outputs(
+        self,
+        context,
+        *args,
+        destination = None,
+        include_manifest: bool = True,
+        **kwargs,
+    ):
+        job = kwargs.get('job')
+        if job is None:
+            logger.error('copy_outputs(): this step needs a render job - use it with a render_job_* trigger')
+            return
+        if isinstance(destination, MessageTemplate):
+            destination = destination.render(job)
+        destination = os.path.expanduser(str(destination))
+        return Transfer._transfer(context, job, destination, include_manifest)
+
+    @staticmethod
+    def _plan(job, destination: str, include_manifest: bool):
+        """The files to copy, source -> destination path, and their total size. Reads the disk, so run it in an executor."""
+        filepaths = job_output_files(job)
+        if not filepaths:
+            return {}, 0
+        if include_manifest and job.manifest_filepath and os.path.isfile(job.manifest_filepath):
+            filepaths.append(job.manifest_filepath)
+        # Keep each file where it was under the target directory, e.g. clips in subfolders
+        copies = {}
+        for filepath in filepaths:
+            relative_path = os.path.relpath(filepath, job.target_directory)
+            if relative_path.startswith(os.pardir + os.sep):
+                relative_path = os.path.basename(filepath)
+            copies[filepath] = os.path.join(destination, relative_path)
+        return copies, sum( os.path.getsize(filepath) for filepath in copies )
+
+    @staticmethod
+    async def _transfer(context, job, destination: str, include_manifest: bool):
+        loop = asyncio.get_running_loop()
+        copies, total_bytes = await loop.run_in_executor(None, Transfer._plan, job, destination, include_manifest)
+        if not copies:
+            raise StepFailed(f'No output files were found to transfer for {job.name}')
+        progress = TransferProgress(total_bytes)
+        reporter = None
+        if Transfer.progress_interval:
+            reporter = asyncio.ensure_future(Transfer._report_progress(context, job, progress))
+        try:
+            results = await asyncio.gather(*[
+                loop.run_in_executor(Transfer._executor, copy_file, src, dst, Transfer.chunk_size, progress.add)
+                for src, dst in copies.items()
+            ], return_exceptions=True)
+        finally:
+            if reporter:
+                reporter.cancel()
+        duration = time.monotonic() - progress.time_started
+        errors = [ f'{os.path.basename(src)}: {result}' for src, result in zip(copies, results) if isinstance(result, Exception) ]
+        context.renderwatch.event_internal.action_step_transfer_finished(job=job, data={
+            'destination': destination,
+            'files': list(copies.values()),
+            'bytes': progress.copied_bytes,
+            'bytes_per_second': progress.bytes_per_second,
+            'duration': duration,
+            'errors': errors,
+        })
+        if errors:
+            raise StepFailed(f'Transfer of {job.name} to {destination} did not finish, run it again to resume - ' + '; '.join(errors))
+        logger.info(f'transfer: {job.id[:8]} | {len(copies)} files, {progress.copied_bytes / 1024 / 1024:.1f} MB copied in {duration:.2f}s ({progress.bytes_per_second / 1024 / 1024:.1f} MB/s) to {destination}')
+        return list(copies.values())
+
+    @staticmethod
+    async def _report_progress(context, job, progress: TransferProgress):
+        while True:
+            await asyncio.sleep(Transfer.progress_interval)
+            logger.info(f'transfer: {job.id[:8]} | {progress.copied_bytes / 1024 / 1024:.1f} of {progress.total_bytes / 1024 / 1024:.1f} MB, {progress.bytes_per_second / 1024 / 1024:.1f} MB/s')
+            context.renderwatch.event_internal.action_step_transfer_progress(job=job, data={
+                'bytes': progress.copied_bytes,
+                'total_bytes': progress.total_bytes,
+                'bytes_per_second': progress.bytes_per_second,
+            })
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Files that ffprobe can count frames in. Image sequences aren't verified.
+VIDEO_EXTENSIONS = ('.mov', '.mp4', '.m4v', '.mxf', '.avi', '.mkv', '.webm', '.ts', '.mts')
+
+# Resolve names a job that renders individual clips after its first clip, then this
+MULTIPLE_CLIPS_SUFFIX = ' and more'
+
+def find_output_files(job, since: float = None) -> list:
+    """
+    The video files a render job wrote into its target directory.
+    A single-file render is its OutputFilename, plus any additional outputs beside it with the same name.
+    For individual clips, it is every video file under the target directory modified since `since`.
+    """
+    target_directory = job.target_directory
+    if not target_directory or not os.path.isdir(target_directory):
+        return []
+    output_filename = (job.job_dump_raw or {}).get('OutputFilename')
+    if output_filename and not output_filename.endswith(MULTIPLE_CLIPS_SUFFIX):
+        stem = os.path.splitext(output_filename)[0]
+        with os.scandir(target_directory) as entries:
+            return sorted(
+                entry.path for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[0] == stem and entry.name.lower().endswith(VIDEO_EXTENSIONS)
+            )
+    filepaths = []
+    for dirpath, _, filenames in os.walk(target_directory):
+        for filename in filenames:
+            if not filename.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            filepath = os.path.join(dirpath, filename)
+            if since is None or os.stat(filepath).st_mtime >= since:
+                filepaths.append(filepath)
+    return sorted(filepaths)
+
+def is_single_output(job) -> bool:
+    output_filename = (job.job_dump_raw or {}).get('OutputFilename') or ''
+    return bool(output_filename) and not output_filename.endswith(MULTIPLE_CLIPS_SUFFIX)
+
+def job_output_files(job) -> list:
+    """
+    The files a finished render job wrote.
+    From the output index, if the daemon saw it render. Otherwise found in its target directory - for individual clips,
+    every video file written during its render.
+    """
+    if job.output_files:
+        return [ filepath for filepath in job.output_files if os.path.isfile(filepath) ]
+    since = None
+    if not is_single_output(job):
+        # Allow for its render time, and a margin
+        since = time.time() - (job._time_taken_ms or 0) / 1000 - 60
+    return find_output_files(job, since=since)
+
+class ProbeResult:
+    __slots__ = ('filepath', 'frames', 'error')
+
+    def __init__(self, filepath: str, frames: int = None, error: str = None):
+        self.filepath = filepath
+        self.frames = frames
+        self.error = error
+
+    def __repr__(self):
+        return f'ProbeResult({self.filepath!r}, frames={self.frames}, error={self.error!r})'
+
+class VerifyResult:
+    def __init__(self, expected_frames: int, results: list, single_output: bool):
+        self.expected_frames = expected_frames
+        self.results = results
+        self.single_output = single_output
+
+    @property
+    def problems(self) -> list:
+        """Files that couldn't be probed, or whose frame count is wrong. Empty if the render verified OK."""
+        problems = []
+        if not self.results:
+            return [ 'No output files were found' ]
+        for result in self.results:
+            name = os.path.basename(result.filepath)
+            if result.error:
+                problems.append(f'{name}: {result.error}')
+            elif not result.frames:
+                problems.append(f'{name}: has no video frames')
+            elif self.single_output and self.expected_frames and result.frames != self.expected_frames:
+                problems.append(f'{name}: {result.frames} frames, expected {self.expected_frames}')
+        return problems
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+class OutputVerifier:
+    """
+    Checks the frame counts of a render's output files with ffprobe.
+    Files are probed in parallel, at most `max_concurrent` ffprobe processes at a time.
+    Results are cached by (path, size, mtime), so checking an unchanged file again doesn't run ffprobe.
+    """
+    def __init__(
+        self,
+        ffprobe_path: str = 'ffprobe',
+        max_concurrent: int = 4,
+        timeout: float = 60,
+        cache_size: int = 4096,
+    ):
+        self.ffprobe_path = ffprobe_path
+        self.max_concurrent = max(int(max_concurrent or 1), 1)
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self._semaphore = None
+
+    @staticmethod
+    def _cache_key(filepath: str):
+        stat = os.stat(filepath)
+        return (filepath, stat.st_size, stat.st_mtime_ns)
+
+    async def probe(self, filepath: str) -> ProbeResult:
+        try:
+            key = self._cache_key(filepath)
+        except OSError as e:
+            return ProbeResult(filepath, error=f'Unable to read file - {e}')
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            result = await self._run_ffprobe(filepath)
+        # Only remember answers from ffprobe, not failures to run it
+        if result.frames is not None or result.error == 'No video stream':
+            self.cache[key] = result
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return result
+
+    async def _run_ffprobe(self, filepath: str) -> ProbeResult:
+        args = [
+            self.ffprobe_path,
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=nb_frames,r_frame_rate,duration',
+            '-of', 'json',
+            filepath,
+        ]
+        try:
+            proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            return ProbeResult(filepath, error=f'Unable to run ffprobe - {e}')
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return ProbeResult(filepath, error=f'ffprobe did not finish within {self.timeout}s')
+        if proc.returncode != 0:
+            return ProbeResult(filepath, error=stderr.decode(errors='replace').strip() or f'ffprobe exited with code {proc.returncode}')
+        try:
+            streams = json.loads(stdout).get('streams') or []
+        except ValueError:
+            return ProbeResult(filepath, error='ffprobe output was unreadable')
+        if not streams:
+            return ProbeResult(filepath, error='No video stream')
+        return ProbeResult(filepath, frames=self._frame_count(streams[0]))
+
+    @staticmethod
+    def _frame_count(stream: dict):
+        """From the container's frame count, or if it doesn't record one, from duration and frame rate"""
+        nb_frames = stream.get('nb_frames')
+        if nb_frames and str(nb_frames).isdigit():
+            return int(nb_frames)
+        try:
+            numerator, denominator = stream['r_frame_rate'].split('/')
+            return round(float(stream['duration']) * int(numerator) / int(denominator))
+        except (KeyError, ValueError, ZeroDivisionError):
+            return None
+
+    async def verify(self, job, filepaths: list = None) -> VerifyResult:
+        """Probe every output file of a job at once, and compare them against the job's frame count"""
+        if filepaths is None:
+            filepaths = [ filepath for filepath in job_output_files(job) if filepath.lower().endswith(VIDEO_EXTENSIONS) ]
+        results = await asyncio.gather(*[ self.probe(filepath) for filepath in filepaths ])
+        return VerifyResult(job.job_frame_count, list(results), is_single_output(job))
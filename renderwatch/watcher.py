@@ -0,0 +1,31 @@
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+class FileWatcher:
+    """
+    Notices when any of a set of files is modified, by comparing their size and modification time.
+    Cheap enough to check every few seconds - one stat() per file.
+    """
+    def __init__(self, filepaths: list):
+        self.filepaths = list(filepaths)
+        self.signatures = { filepath: self._signature(filepath) for filepath in self.filepaths }
+
+    @staticmethod
+    def _signature(filepath: str):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def changed(self) -> list:
+        """Return the files that changed since the last check"""
+        changed = []
+        for filepath in self.filepaths:
+            signature = self._signature(filepath)
+            if signature != self.signatures[filepath]:
+                self.signatures[filepath] = signature
+                changed.append(filepath)
+        return changed
@@ -1,21 +1,37 @@
 from renderwatch.actions import UserAction
+from renderwatch.cache import ActionsCache, ValidationCache
+from renderwatch.connection import ResolveConnection
 from renderwatch.event import InternalEvents, ResolveEvents, UserEvents
-from renderwatch.exceptions import UserInvalidAction, UserInvalidStep
-from renderwatch.renderjob import RenderJob
+from renderwatch.exceptions import ResolveConnectionLost, UserInvalidAction, UserInvalidStep, UserInvalidTemplate
+from renderwatch.logtail import DEFAULT_FAILURE_PATTERNS, LogFailureWatcher, LogTailer, default_resolve_log_filepath
+from renderwatch import metrics
+from renderwatch import tracing
+from renderwatch.outputindex import OutputIndex
+from renderwatch.push import PushListener
+from renderwatch.renderjob import RenderJob, TERMINAL_STATUSES
+from renderwatch.scheduler import PollScheduler
+from renderwatch.steps import Steps
+from renderwatch.store import JobStore
+from renderwatch.template import MessageTemplate
+from renderwatch.watcher import FileWatcher
 
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from os import makedirs, path
-from pydavinci import davinci
+from typing import Union
 import asyncio
 import datetime
-import importlib_metadata
+import hashlib
+import json
 import locale
 import logging
 import logging.config
 import platformdirs
 import shutil
+import signal
 import sys
+import threading
 import time
-import yamale
 import yaml
 
 logger = logging.getLogger('renderwatch.daemon')
@@ -30,11 +46,14 @@ class RenderWatch:
         self.filepath_actions_schema = path.join(self.app_dirpath, 'renderwatch/actions.schema.yml')
         self.filepath_template_config = path.join(self.app_dirpath, 'config.templates/config.template.yml')
         self.filepath_template_actions = path.join(self.app_dirpath, 'config.templates/actions.template.yml')
+        self.filepath_template_trigger = path.join(self.app_dirpath, 'config.templates/renderwatch_trigger.template.py')
         # In System OS Application Support Directory/renderwatch
         self.dirpath_user_config_dir = platformdirs.user_data_dir(appname='renderwatch', ensure_exists=True)
         self.dirpath_user_config_log_dir = platformdirs.user_data_dir(appname='renderwatch/logs', ensure_exists=True)
         self.filepath_user_config = path.join(self.dirpath_user_config_dir, 'config.yml')
         self.filepath_user_actions = path.join(self.dirpath_user_config_dir, 'actions.yml')
+        self.filepath_user_trigger = path.join(self.dirpath_user_config_dir, 'renderwatch_trigger.py')
+        self.filepath_push_socket = path.join(self.dirpath_user_config_dir, 'renderwatch.sock')
         # Import logging config
         with open(self.filepath_config_logging, 'r', encoding='utf-8') as f:
             log_config_yaml = yaml.safe_load(f)
@@ -62,7 +81,14 @@ class RenderWatch:
         self.event_user = UserEvents()
 
         self.resolve = False
+        # Kept across polls - reconnects only after a call fails
+        self.connection = ResolveConnection(self._connect_resolve)
+        # Connection state as of the last poll (None until the first), and when it was lost
+        self.api_connected = None
+        self.api_ever_connected = False
+        self.api_lost_at = None
         self.current_project = { }
+        self.current_project_name = None
         self.current_db = False
 
         self.render_jobs = {}
@@ -73,12 +99,145 @@ class RenderWatch:
             config = yaml.safe_load(f)
         self.config = config
 
+        # Render triggers pushed from Resolve - with them, an idle queue needs polling much less often
+        daemon_config = self.config.get('renderwatch_daemon') or {}
+        self.push_listener = None
+        if daemon_config.get('push_socket', False):
+            if PushListener.is_supported():
+                self.push_listener = PushListener(self.filepath_push_socket, self.handle_push)
+            else:
+                logger.warning('push_socket is not supported on this system - Unix sockets are unavailable. Polling only.')
+        # Optionally watch Resolve's own log, which reports failed renders before its API does
+        self.log_failure_watcher = None
+        self.log_watch_interval = daemon_config.get('log_watch_interval', 1)
+        if daemon_config.get('log_watch', False):
+            log_filepath = path.expanduser(daemon_config.get('log_watch_filepath') or default_resolve_log_filepath())
+            self.log_failure_watcher = LogFailureWatcher(
+                LogTailer(log_filepath),
+                patterns = list(DEFAULT_FAILURE_PATTERNS) + list(daemon_config.get('log_watch_patterns') or []),
+            )
+            logger.debug(f"Watching Resolve's log for failed renders: {log_filepath}")
+        # Which files each job writes, found by watching the target directories of rendering jobs
+        self.output_index = None
+        if daemon_config.get('output_index', True):
+            self.output_index = OutputIndex()
+        # Poll timing
+        self.scheduler = PollScheduler(**self._scheduler_settings(daemon_config))
+        # Render status lookups - run concurrently, and skip jobs that are finished and unchanged
+        self.render_status_recheck_time = daemon_config.get('API_terminal_job_recheck_time', 30)
+        self._render_status_executor = ThreadPoolExecutor(
+            max_workers = daemon_config.get('API_max_concurrent_calls', 4),
+            thread_name_prefix = 'renderwatch-api',
+        )
+        self.poll_stats = {}
+        # Polls and pushes take turns updating jobs
+        self._poll_lock = asyncio.Lock()
+        # How much history each render job keeps
+        self.history_retention = {
+            'max_entries': daemon_config.get('history_max_entries', 100),
+            'max_age': daemon_config.get('history_max_age', 86400),
+        }
+
+        # Optionally keep job state on disk, to carry on where we left off after a restart
+        self.job_store = None
+        if daemon_config.get('job_store', False):
+            self.job_store = JobStore(path.join(self.dirpath_user_config_dir, 'jobs.sqlite3'))
+
+        # Step credentials that validated OK recently
+        self.validation_cache = ValidationCache(
+            path.join(self.dirpath_user_config_dir, 'validation_cache.json'),
+            ttl = daemon_config.get('validation_cache_ttl', 86400),
+        )
+        self._pending_revalidations = []
+        # Set once the daemon is running, after which queued checks are started as soon as they're added
+        self._revalidation_loop = None
+        self._revalidation_lock = threading.Lock()
+        self._revalidation_tasks = set()
+
         # Parse actions
+        self.actions_cache = ActionsCache(
+            path.join(self.dirpath_user_config_dir, 'actions.cache.json'),
+            [ self.filepath_user_actions, self.filepath_user_config, self.filepath_actions_schema ],
+        )
         self.actions = []
         self._validated_user_steps = {}
+        # Step types that failed validation during a reload, so actions skip them without validating again
+        self._invalid_user_steps = set()
         self._validate_user_actions()
 
-    def _validate_user_actions(self):
+        # Metrics - served over HTTP only if a port is set
+        self.metrics_server = None
+        if daemon_config.get('metrics_port'):
+            self.metrics_server = metrics.MetricsServer(
+                host = daemon_config.get('metrics_host', '127.0.0.1'),
+                port = daemon_config['metrics_port'],
+            )
+        metrics.REGISTRY.add_collector(self._collect_metrics)
+        # Timing spans for each poll, dumped on SIGUSR1
+        tracing.TRACER.configure(
+            enabled = daemon_config.get('tracing', False),
+            max_traces = daemon_config.get('tracing_max_polls', 50),
+        )
+
+    # renderwatch_daemon settings that a reload of config.yml applies straight away. The rest need a restart.
+    RELOADABLE_DAEMON_SETTINGS = (
+        'API_poll_time',
+        'API_poll_time_rendering',
+        'API_poll_time_idle_max',
+        'push_poll_time_idle_max',
+        'API_reconnect_delay_min',
+        'API_reconnect_delay_max',
+        'API_terminal_job_recheck_time',
+        'history_max_entries',
+        'history_max_age',
+        'tracing',
+        'tracing_max_polls',
+    )
+
+    def _scheduler_settings(self, daemon_config: dict) -> dict:
+        if self.push_listener:
+            poll_time_idle_max = daemon_config.get('push_poll_time_idle_max', 30)
+        else:
+            poll_time_idle_max = daemon_config.get('API_poll_time_idle_max', 10)
+        return {
+            'poll_time': daemon_config.get('API_poll_time', 2),
+            'poll_time_rendering': daemon_config.get('API_poll_time_rendering', 1),
+            'poll_time_idle_max': poll_time_idle_max,
+            'reconnect_delay_min': daemon_config.get('API_reconnect_delay_min', 1),
+            'reconnect_delay_max': daemon_config.get('API_reconnect_delay_max', 60),
+        }
+
+    def _apply_daemon_config(self, daemon_config_old: dict, daemon_config: dict):
+        """Apply changed renderwatch_daemon settings from a reloaded config.yml, where that can be done while running"""
+        self.scheduler.configure(**self._scheduler_settings(daemon_config))
+        self.render_status_recheck_time = daemon_config.get('API_terminal_job_recheck_time', 30)
+        # For jobs created from now on
+        self.history_retention = {
+            'max_entries': daemon_config.get('history_max_entries', 100),
+            'max_age': daemon_config.get('history_max_age', 86400),
+        }
+        tracing.TRACER.configure(
+            enabled = daemon_config.get('tracing', False),
+            max_traces = daemon_config.get('tracing_max_polls', 50),
+        )
+        needs_restart = sorted(
+            key for key in set(daemon_config_old) | set(daemon_config)
+            if daemon_config_old.get(key) != daemon_config.get(key) and key not in self.RELOADABLE_DAEMON_SETTINGS
+        )
+        if needs_restart:
+            logger.warning(f"Reload: these renderwatch_daemon settings changed, and take effect once renderwatch_daemon is restarted: {', '.join(needs_restart)}")
+
+    def _load_action_definitions(self):
+        """
+        Return the user's actions as a list of plain definitions, validated against the schema.
+        Served from the actions cache when actions.yml, config.yml and the schema are all unchanged.
+        """
+        source_hash = self.actions_cache.source_hash()
+        actions = self.actions_cache.load(source_hash)
+        if actions is not None:
+            logger.debug('Actions unchanged since last validated, loaded from cache: %s', self.actions_cache.filepath)
+            return actions
+        import yamale
         actions_schema = yamale.make_schema(self.filepath_actions_schema)
         actions_raw_text = open(self.filepath_user_actions, 'r', encoding='utf-8').read()
         actions_raw = yamale.make_data(content=actions_raw_text)
@@ -101,84 +260,310 @@ class RenderWatch:
         if not actions:
             logger.error('Actions block was unreadable: %s', actions_raw)
             return False
+        # Normalise - the schema allows a single trigger to be given as a string
+        for definition in actions:
+            if isinstance(definition['triggered_by'], str):
+                definition['triggered_by'] = [ definition['triggered_by'] ]
+        self.actions_cache.save(source_hash, actions)
+        return actions
+
+    def _action_key(self, definition: dict) -> str:
+        """Identity of an action when reloading: its definition, plus the config of each step type it uses"""
+        step_types = sorted({ step_type for step in definition.get('steps') or [] for step_type in step })
+        steps_config = (self.config.get('renderwatch') or {}).get('steps') or {}
+        payload = {
+            'definition': definition,
+            'config': { step_type: steps_config.get(step_type) for step_type in step_types },
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _create_user_action(self, index: int, definition: dict):
+        key = self._action_key(definition)
+        # UserAction consumes its settings, so give it a copy
+        definition = deepcopy(definition)
+        try:
+            action = UserAction(
+                renderwatch = self,
+                index = index + 1, # order it appeared in user's actions.yml
+                enabled = definition['enabled'],
+                name = definition['name'],
+                steps = definition['steps'],
+                triggers = definition['triggered_by']
+            )
+        except UserInvalidAction:
+            logger.error(f"This action was invalid: index {index}: {definition['name']}")
+            return None
+        action.key = key
+        return action
+
+    def _validate_user_actions(self):
+        actions = self._load_action_definitions()
+        if not actions:
+            return False
         # Finish by creating new Action objects
         count_successful_user_actions = 0
         for index, definition in enumerate(actions):
-            try:
-                action = UserAction(
-                    renderwatch = self,
-                    index = index + 1, # order it appeared in user's actions.yml
-                    enabled = definition['enabled'],
-                    name = definition['name'],
-                    steps = definition['steps'],
-                    triggers = definition['triggered_by']
-                )
+            action = self._create_user_action(index, definition)
+            if action:
                 self.actions.append(action)
                 count_successful_user_actions += 1
-            except UserInvalidAction:
-                logger.error(f"This action was invalid: index {index}: {definition['name']}")
         logger.debug(f"Parsed {count_successful_user_actions} user actions successfully.")
         if count_successful_user_actions == 0:
             logger.warning(f"No valid user actions specified. Edit actions.yml and ensure everything is specified correctly. Refer to log above to identify errors.")
             raise SystemExit
 
+    def reload_user_actions(self, changed_filepaths: list):
+        """
+        Apply changes to actions.yml or config.yml while running.
+        Only actions whose definition (or step config) changed are detached and created again.
+        Everything else, including render job state, is left as it is.
+        """
+        reload = self._prepare_reload(changed_filepaths)
+        if reload is None:
+            return False
+        return self._apply_reload(reload)
+
+    async def reload_user_config(self, changed_filepaths: list):
+        """reload_user_actions() without holding up the event loop, or a poll that is under way"""
+        loop = asyncio.get_running_loop()
+        reload = await loop.run_in_executor(None, self._prepare_reload, changed_filepaths)
+        if reload is None:
+            return False
+        # Swap the actions over between polls
+        async with self._poll_lock:
+            reloaded = self._apply_reload(reload)
+        return reloaded
+
+    def _prepare_reload(self, changed_filepaths: list):
+        """
+        Read the changed files, and validate the step types whose config changed.
+        Validating a step can block - e.g. Telegram checks its token online - so this can run off the event loop.
+        """
+        time_start = time.perf_counter()
+        config = self.config
+        if self.filepath_user_config in changed_filepaths:
+            try:
+                with open(self.filepath_user_config, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f)
+            except Exception as e:
+                logger.error(f'Reload: config.yml could not be read, keeping the current config. {e}')
+                return None
+        definitions = self._load_action_definitions()
+        if not definitions:
+            logger.error('Reload: actions.yml is not valid, keeping the current actions.')
+            return None
+        # Step types whose config changed need validating again
+        steps_config_old = (self.config.get('renderwatch') or {}).get('steps') or {}
+        steps_config_new = (config.get('renderwatch') or {}).get('steps') or {}
+        changed_step_types = {
+            step_type for step_type in set(steps_config_old) | set(steps_config_new)
+            if steps_config_old.get(step_type) != steps_config_new.get(step_type)
+        }
+        step_types = {
+            step_type
+            for definition in definitions if definition.get('enabled')
+            for step in definition.get('steps') or [] for step_type in step
+            if step_type in Steps.__members__
+        }
+        validated = {}
+        invalid = set()
+        for step_type in step_types:
+            if step_type in self._validated_user_steps and step_type not in changed_step_types:
+                continue
+            step_instance = Steps[step_type].value()
+            step_instance.renderwatch = self
+            if step_instance.__validate__(**(steps_config_new.get(step_type) or {})):
+                validated[step_type] = step_instance
+            else:
+                invalid.add(step_type)
+        return {
+            'time_start': time_start,
+            'config': config,
+            'definitions': definitions,
+            'changed_step_types': changed_step_types,
+            'validated': validated,
+            'invalid': invalid,
+        }
+
+    def _apply_reload(self, reload: dict):
+        """Swap in the actions from _prepare_reload(). Doesn't block - their steps are already validated."""
+        if reload['config'] is not self.config:
+            self._apply_daemon_config(self.config.get('renderwatch_daemon') or {}, reload['config'].get('renderwatch_daemon') or {})
+            self.config = reload['config']
+        for step_type in reload['changed_step_types']:
+            self._validated_user_steps.pop(step_type, None)
+        self._validated_user_steps.update(reload['validated'])
+        self._invalid_user_steps = reload['invalid']
+        current = {}
+        for action in self.actions:
+            current.setdefault(action.key, []).append(action)
+        actions = []
+        count_kept = 0
+        count_added = 0
+        try:
+            for index, definition in enumerate(reload['definitions']):
+                key = self._action_key(definition)
+                if current.get(key):
+                    # Unchanged - keep it and its handlers
+                    action = current[key].pop(0)
+                    action.index = index + 1
+                    actions.append(action)
+                    count_kept += 1
+                else:
+                    action = self._create_user_action(index, definition)
+                    if action:
+                        actions.append(action)
+                        count_added += 1
+        finally:
+            self._invalid_user_steps = set()
+        removed = [ action for remaining in current.values() for action in remaining ]
+        for action in removed:
+            action.detach()
+        self.actions = actions
+        logger.info(f"Reloaded actions in {(time.perf_counter() - reload['time_start']) * 1000:.1f}ms: {count_kept} unchanged, {count_added} added or changed, {len(removed)} removed.")
+        return True
+
+    async def watch_user_config(self, interval: float):
+        """Reload actions whenever actions.yml or config.yml is saved"""
+        watcher = FileWatcher([ self.filepath_user_actions, self.filepath_user_config ])
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                changed = watcher.changed()
+                if changed:
+                    logger.debug(f'Config files changed: {changed}')
+                    await self.reload_user_config(changed)
+            except Exception as e:
+                # Keep watching - the next save may fix it
+                logger.error(f'Reload: hit an exception, keeping the current actions. {e.__class__.__name__}: {e}')
+                logger.debug(e, exc_info=1)
+
+    def schedule_revalidation(self, func):
+        """
+        Queue a check of a step's cached validation, to run once the daemon has started.
+        Safe to call from any thread - reloads validate steps in an executor.
+        """
+        with self._revalidation_lock:
+            self._pending_revalidations.append(func)
+            loop = self._revalidation_loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._start_revalidation)
+
+    def _start_revalidation(self):
+        # Keep a reference until it's done, or the task can be garbage collected part way through
+        task = asyncio.ensure_future(self.revalidate_steps())
+        self._revalidation_tasks.add(task)
+        task.add_done_callback(self._revalidation_tasks.discard)
+
+    async def revalidate_steps(self):
+        """Run queued validation checks in the background, off the event loop. Checks queued from now on start by themselves."""
+        loop = asyncio.get_running_loop()
+        with self._revalidation_lock:
+            self._revalidation_loop = loop
+            pending, self._pending_revalidations = self._pending_revalidations, []
+        if not pending:
+            return
+        await asyncio.gather(*[ loop.run_in_executor(None, func) for func in pending ])
+        logger.debug(f'Revalidated {len(pending)} cached step credentials.')
+
     async def _connect_resolve(self):
         try:
-            davinci
-        except:
+            from pydavinci import davinci
+        except ImportError:
             logger.critical("Error: pydavinci wasn't available. Is it installed correctly via pip?")
-            return False
-        Resolve = davinci.Resolve()
+            raise SystemExit
+        with metrics.api_call_duration.time(call='connect'), tracing.TRACER.span('connect'):
+            Resolve = davinci.Resolve()
         if Resolve._obj is None:
-            logger.error("Resolve API is not available. Ensure Resolve is launched.")
+            # Reported once per outage by _api_connection_changed()
+            logger.debug("Resolve API is not available.")
             return False
-        else:
-            if Resolve._obj is None:
-                logger.error("Resolve API is not available, Resolve is not running anymore.")
-                return False
-            else:
-                return Resolve
+        return Resolve
 
     async def _get_resolve(self):
-        Resolve = await self._connect_resolve()
-        if not Resolve:
+        if not await self.connection.refresh():
             # No valid Resolve object
+            self.resolve = False
+            self._api_connection_changed(False)
             return False
+        self._api_connection_changed(True)
+        project = self.connection.project
+        db = self.connection.db
         # Identify project or database change - start by assuming no change
         self.project_was_changed = False
         self.db_was_changed = False
-        data = { 'project': Resolve.project.name }
-        if self.current_project:
-            if Resolve.project.name != self.current_project.name:
+        data = { 'project': self.connection.project_name }
+        if self.current_project_name is not None:
+            if self.connection.project_name != self.current_project_name:
                 # Project has changed - only coming from name.
                 self.project_was_changed = True
-                self.event_resolve.project_change(Resolve.project, data=data)
-                self.current_project = Resolve.project
+                self.current_project_name = self.connection.project_name
+                self.current_project = project
+                self.event_resolve.project_change(project, data=data)
                 await self.clear_render_jobs()
         else:
             # First time load of a project
-            self.current_project = Resolve.project
-            self.project_was_changed = False
-            self.event_resolve.project_onload(Resolve.project, data=data)
-        data = Resolve.project_manager.db
+            self.current_project_name = self.connection.project_name
+            self.current_project = project
+            self.event_resolve.project_onload(project, data=data)
         if self.current_db:
-            if Resolve.project_manager.db != self.current_db:
+            if db != self.current_db:
                 # Database has changed
                 self.db_was_changed = True
-                self.event_resolve.db_change(Resolve, data=data)
-                self.current_db = Resolve.project_manager.db
+                self.current_db = db
+                self.event_resolve.db_change(self.connection.resolve, data=db)
                 await self.clear_render_jobs()
         else:
             # First time load of a db
-            self.current_db = Resolve.project_manager.db
-            self.event_resolve.db_onload(Resolve, data=data)
-            self.db_was_changed = False
+            self.current_db = db
+            self.event_resolve.db_onload(self.connection.resolve, data=db)
         # Different jobs behaviour if there was a change
         if self.project_was_changed or self.db_was_changed:
             self.render_jobs_first_run = True
-        # Save the rest of the call
-        self.resolve = Resolve
+        self.resolve = self.connection.resolve
         return True
+
+    def _api_connection_changed(self, connected: bool):
+        """Fire the connection events when Resolve becomes reachable or unreachable"""
+        if connected == self.api_connected:
+            return
+        self.api_connected = connected
+        if connected:
+            self.scheduler.reset_reconnect()
+            if not self.api_ever_connected:
+                self.api_ever_connected = True
+                self.event_resolve.api_conn_initial_success()
+            else:
+                # Known project, db and jobs carry on as before - no onload events again
+                outage = (datetime.datetime.now() - self.api_lost_at).total_seconds()
+                logger.info(f'Reconnected to Resolve after {outage:.0f}s.')
+                self.event_resolve.api_conn_restored(data={ 'outage_seconds': outage })
+        else:
+            self.api_lost_at = datetime.datetime.now()
+            logger.warning('Resolve API is not available - waiting for Resolve to be launched, then reconnecting.')
+            if self.api_ever_connected:
+                self.event_resolve.api_conn_lost()
+
+    def _job_store_scope(self):
+        return JobStore.scope(self.current_project_name, self.current_db)
+
+    def _restore_render_jobs(self):
+        """
+        Bring back jobs saved by the job store for the current project.
+        They are then reconciled by the poll like any known job - changes made while the daemon was down fire their events,
+        and jobs no longer in the queue are removed.
+        """
+        records = self.job_store.load(self._job_store_scope())
+        for record in records:
+            try:
+                job = RenderJob.from_record(record, renderwatch=self)
+            except Exception as e:
+                logger.warning(f'Job store: unable to restore a job, skipping it - {e}')
+                logger.debug(e, exc_info=1)
+                continue
+            self.render_jobs[job.id] = job
+        if records:
+            logger.info(f'Restored {len(self.render_jobs)} render jobs from the job store.')
     
     async def _clear_old_jobs(self, timestamp):
         # Locate deleted jobs. They would have an older API last touched timestamp, than our current time.
@@ -188,6 +573,8 @@ class RenderWatch:
                 self.event_resolve.render_job_removed(job=job)
                 # Mark for deletion
                 delete_these_jobs.append(jid)
+                if self.job_store:
+                    self.job_store.delete(self._job_store_scope(), jid)
         # Apply deletion from our records
         for job in delete_these_jobs:
             self.render_jobs.pop(job)
@@ -200,71 +587,312 @@ class RenderWatch:
     async def clear_render_jobs(self):
         self.render_jobs = {}
 
+    def _plan_render_status_fetches(self, project, job_dumps: dict, time_collected: datetime.datetime):
+        """
+        Decide which jobs need their render status fetched from the API this poll.
+        A job that is in a terminal status (Complete, Failed, Cancelled) and whose job dump is unchanged
+        keeps its last known render status, until it is due for a recheck.
+        A job that is only Failed by a reported failure is still rendering as far as the API knows, so it is always fetched.
+        """
+        fetch = []
+        unchanged = []
+        for jid, job_dump in job_dumps.items():
+            job = self.render_jobs.get(jid)
+            if job and job.status in TERMINAL_STATUSES and job.failure_reported is None and job.job_dump_raw == job_dump:
+                if job.render_status_checked and (time_collected - job.render_status_checked).total_seconds() < self.render_status_recheck_time:
+                    unchanged.append(jid)
+                    continue
+            fetch.append(jid)
+        # Rendering a finished job again (e.g. to retry a failed render) doesn't change its job dump.
+        # If Resolve is rendering and none of the jobs we know of are, it's one of these.
+        if unchanged and not any( job.status == 'Rendering' for job in self.render_jobs.values() ):
+            if self._rendering_in_progress(project):
+                fetch.extend(unchanged)
+        return fetch
+
+    def _rendering_in_progress(self, project) -> bool:
+        """One API call for the whole queue. Assumes it is rendering if this version of the API can't say."""
+        is_rendering = getattr(getattr(project, '_obj', None), 'IsRenderingInProgress', None)
+        if is_rendering is None:
+            return True
+        return bool(self.connection.call('project.IsRenderingInProgress', is_rendering))
+
+    async def _fetch_render_statuses(self, project, jids: list):
+        """Fetch render status for each JobId concurrently, off the event loop"""
+        loop = asyncio.get_running_loop()
+        futures = [ loop.run_in_executor(self._render_status_executor, self.connection.call, 'render_status', project.render_status, jid) for jid in jids ]
+        results = await asyncio.gather(*futures)
+        return dict(zip(jids, results))
+
     async def update_render_jobs(self):
+        async with self._poll_lock:
+            with metrics.poll_duration.time(), tracing.TRACER.span('poll'):
+                await self._update_render_jobs()
+
+    async def _update_render_jobs(self):
+        try:
+            await self._poll_render_jobs()
+        except ResolveConnectionLost as e:
+            # Skip the rest of this poll - the next one reconnects
+            logger.warning(f'update_render_jobs(): {e}. Skipping this poll.')
+
+    async def _poll_render_jobs(self):
         # Query the API
-        await self._get_resolve()
+        with tracing.TRACER.span('get_resolve'):
+            await self._get_resolve()
         if not self.resolve:
-            logger.error('update_render_jobs(): No connection to Resolve available - quitting self. Launch Resolve and run again.')
-            raise SystemExit
+            # Try again once the scheduler's reconnect delay is up
+            return
         # Mark the jobs with time that this call was made
         time_collected = datetime.datetime.now()
         timestamp = int(time_collected.timestamp())
+        if self.render_jobs_first_run and self.job_store:
+            self._restore_render_jobs()
+        project = self.connection.project
+        # Store them by ID
+        with tracing.TRACER.span('render_jobs'):
+            render_jobs = self.connection.call('render_jobs', lambda: project.render_jobs)
+            job_dumps = { job_dump['JobId']: job_dump for job_dump in render_jobs if 'JobId' in job_dump }
+        # Lookup render status, only for the jobs that could have changed
+        fetch_jids = self._plan_render_status_fetches(project, job_dumps, time_collected)
+        with tracing.TRACER.span('render_status'):
+            render_statuses = await self._fetch_render_statuses(project, fetch_jids)
+        if self.output_index:
+            with tracing.TRACER.span('output_index'):
+                await self._update_output_index(job_dumps, render_statuses)
+        self.poll_stats = {
+            'api_calls': self.connection.call_count,
+            'by_call': dict(self.connection.calls),
+            'render_status_skipped': len(job_dumps) - len(fetch_jids),
+        }
+        logger.debug('update_render_jobs(): API calls this poll: %s', self.poll_stats)
         # Save the jobs as an ongoing database
-        for job_dump in self.resolve.project.render_jobs:
-            if not 'JobId' in job_dump:
-                continue
-            # Store them by ID
-            jid = job_dump['JobId']
-            # Lookup render status
-            render_status_info = self.resolve.project.render_status(jid)
+        with tracing.TRACER.span('update_jobs'):
+            await self._apply_render_job_updates(job_dumps, render_statuses, time_collected)
+        # End of our first run
+        self.render_jobs_first_run = False
+        # Run clear jobs
+        if not self.render_jobs_first_run:
+            with tracing.TRACER.span('clear_old_jobs'):
+                await self._clear_old_jobs(timestamp)
+        # Write this poll's changes in one go
+        if self.job_store:
+            with tracing.TRACER.span('job_store_flush'):
+                self.job_store.flush()
+
+    async def _apply_render_job_updates(self, job_dumps: dict, render_statuses: dict, time_collected: datetime.datetime):
+        for jid, job_dump in job_dumps.items():
+            if jid in render_statuses:
+                render_status_info = render_statuses[jid]
+            else:
+                # Terminal and unchanged - reuse what we already know
+                render_status_info = self.render_jobs[jid].render_status_info
             # Create a new instance so we can track history of job status by time
             if jid in self.render_jobs:
                 # Already a job under this ID - update its history
-                await self.render_jobs[jid].update(job_dump, render_status_info, time_collected)
+                changed = await self.render_jobs[jid].update(job_dump, render_status_info, time_collected)
+                if changed and self.job_store:
+                    self.job_store.save(self._job_store_scope(), self.render_jobs[jid])
             else:
                 # Save the job
                 await self.create_render_job(jid, job_dump, render_status_info, time_collected)
                 this_job = self.render_jobs[jid]
+                if self.output_index:
+                    this_job.output_files = self.output_index.files(jid)
                 if self.render_jobs_first_run:
                     self.event_resolve.render_job_onload(job=this_job)
                 else:
                     self.event_resolve.render_job_new(job=this_job)
-        # End of our first run
-        self.render_jobs_first_run = False
-        # Run clear jobs
-        if not self.render_jobs_first_run:
-            await self._clear_old_jobs(timestamp)
+                if self.job_store:
+                    self.job_store.save(self._job_store_scope(), this_job)
+            if jid in render_statuses:
+                self.render_jobs[jid].render_status_checked = time_collected
+
+    async def _update_output_index(self, job_dumps: dict, render_statuses: dict):
+        """Find the files written since the last update, and give them to the jobs that wrote them, before their events fire"""
+        targets = { jid: (job_dump.get('TargetDir'), job_dump.get('OutputFilename')) for jid, job_dump in job_dumps.items() }
+        rendering = set()
+        for jid in job_dumps:
+            render_status_info = render_statuses.get(jid) or (self.render_jobs[jid].render_status_info if jid in self.render_jobs else None) or {}
+            if render_status_info.get('JobStatus') == 'Rendering':
+                rendering.add(jid)
+        loop = asyncio.get_running_loop()
+        changed = await loop.run_in_executor(None, self.output_index.update, targets, rendering)
+        for jid in changed:
+            if jid in self.render_jobs:
+                self.render_jobs[jid].output_files = self.output_index.files(jid)
+
+    async def watch_resolve_log(self, interval: float):
+        """Report a failed render as soon as Resolve writes it to its log, instead of once its error dialog is dismissed"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Reading the log is file I/O, so off the event loop
+                lines = await loop.run_in_executor(None, self.log_failure_watcher.failures)
+                for line in lines:
+                    await self._report_log_failure(line.strip())
+            except Exception as e:
+                # Keep watching - the log may be readable again, or Resolve back, by the next check
+                logger.error(f"Resolve's log: hit an exception while checking it for failed renders. {e.__class__.__name__}: {e}")
+                logger.debug(e, exc_info=1)
+
+    async def _report_log_failure(self, line: str):
+        rendering = [ job for job in self.render_jobs.values() if job.status == 'Rendering' ]
+        if len(rendering) > 1:
+            # More than one job rendering - only go ahead if the line names one of them
+            rendering = [ job for job in rendering if job.id in line or (job.name and job.name in line) ]
+        if len(rendering) != 1:
+            logger.debug(f"Resolve's log reported a failure, but not for one known rendering job: {line}")
+            return
+        job = rendering[0]
+        logger.info(f"Resolve's log reported a failed render - {job.id[:8]} | {line}")
+        await self.handle_push(job.id, 'RenderFailed', line)
+
+    def write_trigger_script(self):
+        """Write renderwatch_trigger.py for Resolve, pointing at our socket. Rewritten only if it differs."""
+        with open(self.filepath_template_trigger, 'r', encoding='utf-8') as f:
+            script = f.read().replace('SOCKET_FILEPATH = None', f'SOCKET_FILEPATH = {self.filepath_push_socket!r}', 1)
+        try:
+            with open(self.filepath_user_trigger, 'r', encoding='utf-8') as f:
+                if f.read() == script:
+                    return
+        except FileNotFoundError:
+            pass
+        with open(self.filepath_user_trigger, 'w', encoding='utf-8') as f:
+            f.write(script)
+        logger.info(f"Wrote Resolve's render trigger script to: {self.filepath_user_trigger} - copy it into Resolve's Scripts/Deliver folder and choose it under Render Settings > Trigger script at Start and End.")
+
+    async def handle_push(self, jid: str, status: str, error: str):
+        """A render trigger from Resolve: refresh just that job now, instead of waiting for the next poll"""
+        logger.debug(f'Render trigger: {jid[:8]} | {status} {error}')
+        job = self.render_jobs.get(jid)
+        if job is None or not self.connection.connected:
+            # Not a job we know yet, or no connection - a full poll picks it up
+            self.scheduler.wake()
+            return
+        async with self._poll_lock:
+            with tracing.TRACER.span('push'):
+                try:
+                    await self._refresh_render_job(job, status, error)
+                except ResolveConnectionLost as e:
+                    logger.warning(f'handle_push(): {e}')
+                    self.scheduler.wake()
+                    return
+        if status != 'RenderStarted':
+            # Catch the next job in the queue starting
+            self.scheduler.burst()
+
+    async def _refresh_render_job(self, job: RenderJob, push_status: str, error: str):
+        time_collected = datetime.datetime.now()
+        if push_status == 'RenderStarted':
+            job.failure_reported = None
+        elif push_status == 'RenderFailed':
+            job.report_failure(error)
+        project = self.connection.project
+        loop = asyncio.get_running_loop()
+        render_status_info = await loop.run_in_executor(self._render_status_executor, self.connection.call, 'render_status', project.render_status, job.id)
+        if self.output_index and push_status != 'RenderStarted':
+            # Its last files were written since the last poll
+            job_dumps = { jid: known_job.job_dump_raw for jid, known_job in self.render_jobs.items() if known_job.job_dump_raw }
+            await self._update_output_index(job_dumps, { job.id: render_status_info })
+        changed = await job.update(dict(job.job_dump_raw), render_status_info, time_collected)
+        job.render_status_checked = time_collected
+        if changed and self.job_store:
+            self.job_store.save(self._job_store_scope(), job)
+            self.job_store.flush()
 
     async def follow_up_update_render_jobs(self):
-        time.sleep(0.5)
+        await asyncio.sleep(0.5)
         await self.update_render_jobs()
 
+    def shutdown(self):
+        if self.job_store:
+            self.job_store.close()
+        if self.push_listener:
+            self.push_listener.close()
+        self.log_event_stats()
+
+    def _collect_metrics(self):
+        for slot in self.event_resolve:
+            metrics.events_fired.set_total(slot.fire_count, event=slot.__name__)
+        metrics.jobs_by_status.clear()
+        metrics.render_fps.clear()
+        status_counts = {}
+        for job in self.render_jobs.values():
+            status_counts[job.status] = status_counts.get(job.status, 0) + 1
+            if job.status == 'Rendering' and job.current_fps is not None:
+                metrics.render_fps.set(job.current_fps, job_id=job.id, job_name=job.name)
+        for status, count in status_counts.items():
+            metrics.jobs_by_status.set(count, status=status)
+
+    def dump_traces(self, count: int = 10):
+        """Write the slowest recent polls to the logs folder, as folded stacks for a flame graph"""
+        if not tracing.TRACER.enabled:
+            logger.warning('Tracing is off - set tracing: true under renderwatch_daemon in config.yml to record polls.')
+            return None
+        filepath = path.join(self.dirpath_user_config_log_dir, f'trace-{datetime.datetime.now():%Y%m%d-%H%M%S}.folded')
+        return tracing.TRACER.dump(filepath, count)
+
+    def log_event_stats(self):
+        for group in (self.event_resolve, self.event_internal, self.event_user):
+            for event_name, (fire_count, handler_time) in group.stats().items():
+                logger.debug(f'{group.group_name}.{event_name}: fired {fire_count} times, {handler_time * 1000:.1f}ms in handlers')
+
     def format_message_from_renderjob(
         self,
-        text_to_format: str,
+        text_to_format: Union[str, MessageTemplate],
         job: RenderJob,
     ):
         output = False
         try:
-            output = text_to_format.format(**job.__dict__)
-        except KeyError as e:
-            logger.error(f"format_message(): did not recognise this param: {e}. Check your actions.yml")
+            if not isinstance(text_to_format, MessageTemplate):
+                text_to_format = MessageTemplate(text_to_format)
+            output = text_to_format.render(job)
+        except UserInvalidTemplate as e:
+            logger.error(f"format_message(): {e}. Check your actions.yml")
         return output
 
 # Daemon
 async def main():
-    print(f"renderwatch_daemon - v{importlib_metadata.version('renderwatch')}")
+    from importlib.metadata import version
+    print(f"renderwatch_daemon - v{version('renderwatch')}")
     print('Python:', sys.version, locale.getlocale())
+    time_start = time.perf_counter()
     renderwatch = RenderWatch()
+    logger.debug(f'Startup took {(time.perf_counter() - time_start) * 1000:.0f}ms')
     run = True
+    revalidation = None
+    watch_interval = (renderwatch.config.get('renderwatch_daemon') or {}).get('config_watch_interval', 2)
+    if watch_interval:
+        watch_config = asyncio.create_task(renderwatch.watch_user_config(watch_interval))
+    if renderwatch.metrics_server:
+        await renderwatch.metrics_server.start()
+    if renderwatch.log_failure_watcher:
+        log_watch = asyncio.create_task(renderwatch.watch_resolve_log(renderwatch.log_watch_interval))
+    if renderwatch.push_listener:
+        renderwatch.write_trigger_script()
+        await renderwatch.push_listener.start()
+    if hasattr(signal, 'SIGUSR1'):
+        # kill -USR1 <pid> writes the slowest recent polls to the logs folder
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, renderwatch.dump_traces)
     logger.debug('Connecting to Resolve for first time...')
     try:
         while run:
             await renderwatch.update_render_jobs()
-            time.sleep(renderwatch.config['renderwatch_daemon']['API_poll_time'])
+            if revalidation is None:
+                logger.debug(f'First poll completed {(time.perf_counter() - time_start) * 1000:.0f}ms after start')
+                revalidation = asyncio.create_task(renderwatch.revalidate_steps())
+            if renderwatch.api_connected:
+                interval = renderwatch.scheduler.next_interval(renderwatch.render_jobs.values())
+            else:
+                interval = renderwatch.scheduler.next_reconnect_interval()
+            await renderwatch.scheduler.wait(interval)
     except SystemExit:
+        renderwatch.shutdown()
         sys.exit(0)
     except KeyboardInterrupt:
+        renderwatch.shutdown()
         sys.exit(0)
     except Exception as e:
         logger.debug(e, exc_info=1)
@@ -272,4 +900,3 @@ async def main():
 
 if __name__ == "__main__":
     asyncio.run(main())
-            
\ No newline at end of file
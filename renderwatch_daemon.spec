@@ -12,6 +12,7 @@ a = Analysis(
         ('renderwatch/actions.schema.yml', 'renderwatch'),
         ('config.templates/config.template.yml', 'config.templates'),
         ('config.templates/actions.template.yml', 'config.templates'),
+        ('config.templates/renderwatch_trigger.template.py', 'config.templates'),
         ('lib/yamale/VERSION', 'yamale'),
     ],
     hiddenimports=[],
@@ -0,0 +1,142 @@
+"""
+Poll benchmark for renderwatch_daemon: latency, CPU time and memory of RenderWatch.update_render_jobs() against a
+simulated Resolve render queue, at a range of queue sizes.
+
+Each size runs in a new Python process, with a throwaway user data dir. The queue is made of mostly finished jobs,
+with one job rendering and some failing or being cancelled along the way, so polls see a realistic mix of changes.
+
+    python scripts_internal/bench_poll.py --jobs 10 100 1000 10000 --polls 50
+
+Logging is turned off while polling, unless --log is given.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_DIRPATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ACTIONS = """actions:
+  - name: Benchmark
+    enabled: true
+    triggered_by:
+      - render_job_completed
+      - render_job_failed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: 'true'
+"""
+
+CHILD = """
+import asyncio, gc, json, logging, resource, statistics, sys, time, tracemalloc
+sys.path.insert(0, %(repo)r)
+from renderwatch import simulate
+import renderwatch_daemon
+
+job_count, polls, keep_logs = %(job_count)d, %(polls)d, %(log)r
+resolve = simulate.install(simulate.SimulatedResolve(
+    job_count = job_count,
+    completed = max(job_count - 5, 0),
+    progress_step = 5,
+    fail_every = 3,
+    cancel_every = 4,
+))
+
+def rss_kb():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss // 1024 if sys.platform == 'darwin' else maxrss
+
+async def main():
+    renderwatch = renderwatch_daemon.RenderWatch()
+    if not keep_logs:
+        logging.disable(logging.CRITICAL)
+    rss_start = rss_kb()
+    tracemalloc.start()
+    time_start = time.perf_counter()
+    await renderwatch.update_render_jobs()
+    first_poll_ms = (time.perf_counter() - time_start) * 1000
+    _, first_poll_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gc.collect()
+    latencies, cpu = [], []
+    for _ in range(polls):
+        resolve.tick()
+        time_start, cpu_start = time.perf_counter(), time.process_time()
+        await renderwatch.update_render_jobs()
+        latencies.append((time.perf_counter() - time_start) * 1000)
+        cpu.append((time.process_time() - cpu_start) * 1000)
+    # Let steps started by the last polls finish
+    await asyncio.sleep(0.1)
+    latencies.sort()
+    print(json.dumps({
+        'jobs': job_count,
+        'first_poll_ms': first_poll_ms,
+        'first_poll_alloc_mb': first_poll_peak / 1024 / 1024,
+        'poll_median_ms': statistics.median(latencies),
+        'poll_p95_ms': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+        'poll_max_ms': latencies[-1],
+        'cpu_median_ms': statistics.median(cpu),
+        'rss_mb': rss_kb() / 1024,
+        'rss_growth_mb': (rss_kb() - rss_start) / 1024,
+        'api_calls_per_poll': resolve.api_calls / (polls + 1),
+    }))
+asyncio.run(main())
+"""
+
+COLUMNS = (
+    ('jobs', 'jobs', '{:>8}'),
+    ('first_poll_ms', 'first poll ms', '{:>14.1f}'),
+    ('poll_median_ms', 'median ms', '{:>10.2f}'),
+    ('poll_p95_ms', 'p95 ms', '{:>10.2f}'),
+    ('poll_max_ms', 'max ms', '{:>10.2f}'),
+    ('cpu_median_ms', 'cpu ms', '{:>10.2f}'),
+    ('rss_mb', 'rss MB', '{:>9.1f}'),
+    ('first_poll_alloc_mb', 'alloc MB', '{:>9.1f}'),
+    ('api_calls_per_poll', 'API calls', '{:>10.1f}'),
+)
+
+def prepare_user_dir():
+    dirpath = tempfile.mkdtemp(prefix='renderwatch-bench-')
+    config_dirpath = os.path.join(dirpath, 'renderwatch')
+    os.makedirs(config_dirpath)
+    shutil.copy(os.path.join(REPO_DIRPATH, 'config.templates/config.template.yml'), os.path.join(config_dirpath, 'config.yml'))
+    with open(os.path.join(config_dirpath, 'actions.yml'), 'w', encoding='utf-8') as f:
+        f.write(ACTIONS)
+    return dirpath
+
+def run_once(user_dirpath, job_count, polls, log):
+    env = dict(os.environ, XDG_DATA_HOME=user_dirpath)
+    child = CHILD % { 'repo': REPO_DIRPATH, 'job_count': job_count, 'polls': polls, 'log': log }
+    proc = subprocess.run([ sys.executable, '-c', child ], env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[10, 100, 1000, 10000], help='Queue sizes to run')
+    parser.add_argument('--polls', type=int, default=50, help='Polls to time at each size, after the first')
+    parser.add_argument('--log', action='store_true', help='Keep logging on while polling')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    if not args.json:
+        print(''.join( fmt.replace('.1f', '').replace('.2f', '').format(title) for _, title, fmt in COLUMNS ))
+    for job_count in args.jobs:
+        user_dirpath = prepare_user_dir()
+        try:
+            result = run_once(user_dirpath, job_count, args.polls, args.log)
+        finally:
+            shutil.rmtree(user_dirpath, ignore_errors=True)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(''.join( fmt.format(result[key]) for key, _, fmt in COLUMNS ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Cold-start benchmark for renderwatch_daemon: time from a fresh interpreter to the first completed poll.
+
+Each run is a new Python process with a new, empty user data dir - a first start, with nothing cached yet.
+It then starts again with the same dir, as after a restart, once the actions cache and the like have been written.
+Resolve is replaced by a tiny stand-in, so this measures renderwatch's own startup cost only.
+
+    python scripts_internal/bench_startup.py --runs 10 --budget-ms 400
+
+Exits with code 1 if the median time to first poll, on a first start, is over budget.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_DIRPATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+ACTIONS = """actions:
+  - name: Benchmark
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: echo {name}
+          format_job_tokens: true
+"""
+
+# Modules that shouldn't be needed just to reach the first poll
+DEFERRED_MODULES = ('requests', 'humanize', 'dictdiffer', 'pydavinci')
+
+CHILD = """
+import time
+time_start = time.perf_counter()
+import asyncio, json, os, sys
+sys.path.insert(0, %(repo)r)
+# Keep to the throwaway user data dir. Patched rather than set through XDG_DATA_HOME, which only Linux reads.
+import platformdirs
+def user_data_dir(appname=None, *args, ensure_exists=False, **kwargs):
+    dirpath = os.path.join(%(user_dirpath)r, appname or '')
+    if ensure_exists:
+        os.makedirs(dirpath, exist_ok=True)
+    return dirpath
+platformdirs.user_data_dir = user_data_dir
+import renderwatch_daemon
+time_imported = time.perf_counter()
+
+class StandInProject:
+    name = 'Benchmark'
+    render_jobs = [ { 'JobId': 'job1', 'RenderJobName': 'Job 1', 'TargetDir': '/tmp', 'TimelineName': 'Timeline 1' } ]
+    def render_status(self, jid):
+        return { 'JobStatus': 'Complete', 'CompletionPercentage': 100 }
+
+class StandInResolve:
+    project = StandInProject()
+    class project_manager:
+        db = { 'DbType': 'Disk', 'DbName': 'Local Database' }
+
+async def _connect_resolve(self):
+    return StandInResolve()
+renderwatch_daemon.RenderWatch._connect_resolve = _connect_resolve
+
+async def main():
+    renderwatch = renderwatch_daemon.RenderWatch()
+    time_init = time.perf_counter()
+    await renderwatch.update_render_jobs()
+    time_first_poll = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (time_imported - time_start) * 1000,
+        'init_ms': (time_init - time_imported) * 1000,
+        'first_poll_ms': (time_first_poll - time_start) * 1000,
+        'deferred_modules_loaded': [ m for m in %(deferred)r if m in sys.modules ],
+    }))
+asyncio.run(main())
+"""
+
+def prepare_user_dir():
+    dirpath = tempfile.mkdtemp(prefix='renderwatch-bench-')
+    config_dirpath = os.path.join(dirpath, 'renderwatch')
+    os.makedirs(config_dirpath)
+    shutil.copy(os.path.join(REPO_DIRPATH, 'config.templates/config.template.yml'), os.path.join(config_dirpath, 'config.yml'))
+    with open(os.path.join(config_dirpath, 'actions.yml'), 'w', encoding='utf-8') as f:
+        f.write(ACTIONS)
+    return dirpath
+
+def run_once(user_dirpath):
+    child = CHILD % { 'repo': REPO_DIRPATH, 'deferred': DEFERRED_MODULES, 'user_dirpath': user_dirpath }
+    proc = subprocess.run([ sys.executable, '-c', child ], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=None, help='Fail if median time to first poll is over this')
+    args = parser.parse_args()
+
+    first_starts = []
+    restarts = []
+    for _ in range(args.runs):
+        user_dirpath = prepare_user_dir()
+        try:
+            first_starts.append(run_once(user_dirpath))
+            restarts.append(run_once(user_dirpath))
+        finally:
+            shutil.rmtree(user_dirpath, ignore_errors=True)
+
+    for title, results in (('first start', first_starts), ('restart', restarts)):
+        print(f'{title}:')
+        for key in ('import_ms', 'init_ms', 'first_poll_ms'):
+            values = [ r[key] for r in results ]
+            print(f'  {key:<16} median {statistics.median(values):8.1f}   min {min(values):8.1f}   max {max(values):8.1f}')
+    loaded = sorted({ m for r in first_starts + restarts for m in r['deferred_modules_loaded'] })
+    print(f'deferred modules loaded before first poll: {loaded or "none"}')
+
+    median_first_poll = statistics.median([ r['first_poll_ms'] for r in first_starts ])
+    if args.budget_ms is not None and median_first_poll > args.budget_ms:
+        print(f'Over budget: {median_first_poll:.1f}ms > {args.budget_ms:.1f}ms')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import shutil
+
+import platformdirs
+import pytest
+import yaml
+
+REPO_DIRPATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Scripts run by hand, not tests
+collect_ignore = [ 'test01.py', 'test02_ffmpeg.py' ]
+
+@pytest.fixture
+def user_data_dir(tmp_path, monkeypatch):
+    """
+    Where RenderWatch keeps its config, in a temporary folder.
+    Patched at platformdirs rather than through XDG_DATA_HOME, which is only read on Linux.
+    """
+    dirpath = tmp_path / 'user_data'
+
+    def _user_data_dir(appname=None, *args, ensure_exists=False, **kwargs):
+        path = os.path.join(dirpath, appname or '')
+        if ensure_exists:
+            os.makedirs(path, exist_ok=True)
+        return path
+    monkeypatch.setattr(platformdirs, 'user_data_dir', _user_data_dir)
+    return dirpath
+
+@pytest.fixture
+def make_renderwatch(user_data_dir):
+    """
+    Returns a function that starts a RenderWatch with the config template and the given actions.yml.
+    Settings in `daemon_config` replace the template's under renderwatch_daemon.
+    """
+    def _make_renderwatch(actions: str = 'actions: []\n', daemon_config: dict = None):
+        config_dirpath = user_data_dir / 'renderwatch'
+        config_dirpath.mkdir(parents=True, exist_ok=True)
+        shutil.copy(os.path.join(REPO_DIRPATH, 'config.templates/config.template.yml'), config_dirpath / 'config.yml')
+        if daemon_config:
+            with open(config_dirpath / 'config.yml', encoding='utf-8') as f:
+                config = yaml.safe_load(f)
+            config['renderwatch_daemon'].update(daemon_config)
+            with open(config_dirpath / 'config.yml', 'w', encoding='utf-8') as f:
+                yaml.safe_dump(config, f)
+        (config_dirpath / 'actions.yml').write_text(actions, encoding='utf-8')
+        import renderwatch_daemon
+        return renderwatch_daemon.RenderWatch()
+    return _make_renderwatch
+
+@pytest.fixture
+def record_events():
+    """Returns a function that records (event name, job name) each time one of the named Resolve events fires"""
+    def _record_events(renderwatch, *event_names):
+        fired = []
+        for event_name in event_names:
+            getattr(renderwatch.event_resolve, event_name).__iadd__(
+                lambda *args, event_name=event_name, **kwargs: fired.append( (event_name, kwargs['job'].name) )
+            )
+        return fired
+    return _record_events
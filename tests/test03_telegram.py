@@ -0,0 +1,124 @@
+import asyncio
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from renderwatch.event import InternalEvents
+from renderwatch.step import Step
+from renderwatch.telegram import Telegram, TelegramAPI
+
+GOOD_TOKEN = '123:good'
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like the Telegram Bot API, for a single good token"""
+    protocol_version = 'HTTP/1.1'
+    received = []
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        params = json.loads(self.rfile.read(length) or b'{}')
+        token, method = self.path.split('/')[1][3:], self.path.split('/')[2]
+        StandInHandler.received.append((method, params, self.client_address))
+        if token == GOOD_TOKEN:
+            body = { 'ok': True, 'result': { 'method': method, 'message_id': 42 } }
+            self.send_response(200)
+        else:
+            body = { 'ok': False, 'description': 'Unauthorized' }
+            self.send_response(401)
+        payload = json.dumps(body).encode('utf-8')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def start_stand_in():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def test_validate_token():
+    server, url = start_stand_in()
+    try:
+        step = Telegram()
+        assert step.__validate__(token_plaintext=GOOD_TOKEN, api_url=url)
+        assert Telegram().__validate__(token_plaintext='456:bad', api_url=url) is False
+    finally:
+        server.shutdown()
+
+def test_send_reuses_connection():
+    server, url = start_stand_in()
+    StandInHandler.received = []
+    try:
+        api = TelegramAPI.get(url, timeout=5)
+        async def send_all():
+            return await asyncio.gather(*[ api.call_async(GOOD_TOKEN, 'sendMessage', { 'chat_id': 1, 'text': str(i) }) for i in range(3) ])
+        asyncio.run(send_all())
+        asyncio.run(send_all())
+        assert len(StandInHandler.received) == 6
+        # Keep-alive: fewer client connections than requests
+        assert len({ client for _, _, client in StandInHandler.received }) <= 3
+    finally:
+        server.shutdown()
+
+def test_unreachable_times_out():
+    api = TelegramAPI.get('http://127.0.0.1:9', timeout=1)
+    errors = []
+    handler = logging.Handler()
+    handler.emit = lambda record: errors.append(record.getMessage())
+    logging.getLogger('renderwatch.telegram').addHandler(handler)
+    try:
+        assert api.call(GOOD_TOKEN, 'getMe') is None
+    finally:
+        logging.getLogger('renderwatch.telegram').removeHandler(handler)
+    # The error is logged, without the token from the URL
+    assert any( 'getMe - request failed' in error for error in errors )
+    assert not any( GOOD_TOKEN in error for error in errors )
+
+class StandInRenderWatch:
+    event_internal = InternalEvents()
+
+    def format_message_from_renderjob(self, text, job):
+        return text.format(**job.__dict__)
+
+class StandInJob:
+    def __init__(self, status, completion_percent):
+        self.id = 'job1'
+        self.status = status
+        self.completion_percent = completion_percent
+
+def test_send_progress_edits_one_message():
+    server, url = start_stand_in()
+    StandInHandler.received = []
+    try:
+        step = Telegram()
+        assert step.__validate__(token_plaintext=GOOD_TOKEN, api_url=url, rate_limit_per_minute=600)
+        step.renderwatch = StandInRenderWatch()
+        StandInHandler.received = []
+        async def progress():
+            for percent in range(0, 100, 10):
+                result = step.send_progress(step, chat_id=1, message='{status} {completion_percent}%', job=StandInJob('Rendering', percent))
+                if asyncio.iscoroutine(result):
+                    Step.spawn(result)
+                await asyncio.sleep(0.01)
+            result = step.send_progress(step, chat_id=1, message='{status}', job=StandInJob('Complete', 100))
+            if asyncio.iscoroutine(result):
+                result = Step.spawn(result)
+            # Even when it joins a send already in flight, the last update can be waited on until it's sent
+            await result
+            assert StandInHandler.received[-1][1]['text'] == 'Complete'
+            while Step._tasks:
+                await asyncio.sleep(0.05)
+        asyncio.run(progress())
+        methods = [ method for method, _, _ in StandInHandler.received ]
+        assert methods[0] == 'sendMessage'
+        assert set(methods[1:]) == { 'editMessageText' }
+        # Stale updates were combined rather than each sent
+        assert len(methods) < 11
+        assert StandInHandler.received[-1][1]['text'] == 'Complete'
+        assert not Telegram._live_messages
+    finally:
+        server.shutdown()
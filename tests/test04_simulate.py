@@ -0,0 +1,50 @@
+import asyncio
+
+from renderwatch import simulate
+
+ACTIONS = """actions:
+  - name: Nothing
+    enabled: false
+    triggered_by:
+      - render_job_completed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: 'true'
+"""
+
+def test_simulated_queue_lifecycle(make_renderwatch, record_events):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=3, progress_step=50, fail_every=2))
+    renderwatch = make_renderwatch(ACTIONS)
+    fired = record_events(renderwatch, 'render_job_onload', 'render_job_started', 'render_job_completed', 'render_job_failed')
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        for _ in range(10):
+            resolve.tick()
+            await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert fired[:3] == [ ('render_job_onload', 'Job 1'), ('render_job_onload', 'Job 2'), ('render_job_onload', 'Job 3') ]
+    assert ('render_job_completed', 'Job 1') in fired
+    assert ('render_job_failed', 'Job 2') in fired
+    assert ('render_job_completed', 'Job 3') in fired
+    assert { job.status for job in renderwatch.render_jobs.values() } == { 'Complete', 'Failed' }
+
+def test_simulated_project_switch(make_renderwatch, record_events):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=2, script=[ (2, 'switch_project', { 'name': 'Project B', 'job_count': 1 }) ]))
+    renderwatch = make_renderwatch(ACTIONS)
+    fired = record_events(renderwatch, 'render_job_onload')
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    # Jobs of the new project are loaded, not new
+    assert fired == [ ('render_job_onload', 'Job 1'), ('render_job_onload', 'Job 2'), ('render_job_onload', 'Job 3') ]
+    assert renderwatch.current_project_name == 'Project B'
+    assert [ job.name for job in renderwatch.render_jobs.values() ] == [ 'Job 3' ]
@@ -0,0 +1,140 @@
+import asyncio
+import os
+
+from renderwatch.logtail import LogFailureWatcher, LogTailer
+
+def _append(filepath, text):
+    with open(filepath, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+def test_tail_reads_only_new_complete_lines(tmp_path):
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, 'old line 1\nold line 2\n')
+    tailer = LogTailer(filepath)
+    assert tailer.read_lines() == []
+    _append(filepath, 'new line 1\nnew li')
+    assert tailer.read_lines() == [ 'new line 1' ]
+    _append(filepath, 'ne 2\n')
+    assert tailer.read_lines() == [ 'new line 2' ]
+    assert tailer.offset == os.path.getsize(filepath)
+
+def test_tail_follows_rotation_and_truncation(tmp_path):
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, 'start\n')
+    tailer = LogTailer(filepath)
+    _append(filepath, 'last line of old file\n')
+    os.rename(filepath, filepath + '.1')
+    _append(filepath, 'first line of new file\n')
+    assert tailer.read_lines() == [ 'last line of old file', 'first line of new file' ]
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write('after truncate\n')
+    assert tailer.read_lines() == [ 'after truncate' ]
+
+def test_tail_waits_for_missing_log(tmp_path):
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    tailer = LogTailer(filepath)
+    assert tailer.read_lines() == []
+    _append(filepath, 'created\n')
+    assert tailer.read_lines() == [ 'created' ]
+
+def test_failure_lines_are_matched(tmp_path):
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, '')
+    watcher = LogFailureWatcher(LogTailer(filepath), patterns=[ r'failed to write', r'custom error \d+' ])
+    _append(filepath, '\n'.join([
+        '2024-01-19 10:00:00 | Render | Rendering frame 120',
+        '2024-01-19 10:00:01 | IO | Failed to write frame 121 to /Volumes/Out/Job 1.mov',
+        '2024-01-19 10:00:02 | Render | CUSTOM ERROR 42',
+    ]) + '\n')
+    assert watcher.failures() == [
+        '2024-01-19 10:00:01 | IO | Failed to write frame 121 to /Volumes/Out/Job 1.mov',
+        '2024-01-19 10:00:02 | Render | CUSTOM ERROR 42',
+    ]
+
+def test_log_failure_fails_the_rendering_job(tmp_path, make_renderwatch, record_events):
+    from renderwatch import simulate
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=2))
+    renderwatch = make_renderwatch()
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, '')
+    renderwatch.log_failure_watcher = LogFailureWatcher(LogTailer(filepath))
+    fired = record_events(renderwatch, 'render_job_failed')
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        watch = asyncio.create_task(renderwatch.watch_resolve_log(0.05))
+        _append(filepath, 'Render Job has failed: Disk is full\n')
+        await asyncio.sleep(0.3)
+        watch.cancel()
+        # Resolve's API still says Rendering - the job stays Failed
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert fired == [ ('render_job_failed', 'Job 1') ]
+    assert [ job.status for job in renderwatch.render_jobs.values() ] == [ 'Failed', 'Ready' ]
+
+def test_log_watch_survives_errors(tmp_path, make_renderwatch, record_events):
+    from renderwatch import simulate
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1))
+    renderwatch = make_renderwatch()
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, '')
+    tailer = LogTailer(filepath)
+    read_lines = tailer.read_lines
+    errors = [ OSError('Input/output error') ]
+    def _read_lines():
+        if errors:
+            raise errors.pop()
+        return read_lines()
+    tailer.read_lines = _read_lines
+    renderwatch.log_failure_watcher = LogFailureWatcher(tailer)
+    fired = record_events(renderwatch, 'render_job_failed')
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        watch = asyncio.create_task(renderwatch.watch_resolve_log(0.05))
+        await asyncio.sleep(0.1)
+        # The failed read is logged, and the watch carries on
+        assert not errors and not watch.done()
+        _append(filepath, 'Render Job has failed: Disk is full\n')
+        await asyncio.sleep(0.2)
+        watch.cancel()
+    asyncio.run(run())
+
+    assert fired == [ ('render_job_failed', 'Job 1') ]
+
+def test_log_failure_then_complete(make_renderwatch, record_events):
+    # A failure in the log, for a render that Resolve then completes - the completion still fires
+    from renderwatch import simulate
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, progress_step=50))
+    renderwatch = make_renderwatch()
+    fired = record_events(renderwatch, 'render_job_started', 'render_job_failed', 'render_job_completed')
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        await renderwatch._report_log_failure('Render job has failed: Media offline')
+        for _ in range(2):
+            resolve.tick()
+            await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert fired == [ ('render_job_started', 'Job 1'), ('render_job_failed', 'Job 1'), ('render_job_completed', 'Job 1') ]
+    assert [ job.status for job in renderwatch.render_jobs.values() ] == [ 'Complete' ]
+
+def test_default_patterns_skip_general_errors(tmp_path):
+    filepath = str(tmp_path / 'davinci_resolve.log')
+    _append(filepath, '')
+    watcher = LogFailureWatcher(LogTailer(filepath))
+    _append(filepath, '\n'.join([
+        'IO | Failed to open /Volumes/Media/A001.mov',
+        'IO | I/O error reading cache',
+        'Render | Render job has failed: Job 1',
+    ]) + '\n')
+    assert watcher.failures() == [ 'Render | Render job has failed: Job 1' ]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import stat
+import sys
+
+from renderwatch.renderjob import RenderJob
+from renderwatch.verify import OutputVerifier, find_output_files
+
+# Answers like ffprobe, with the frame count written inside each stand-in media file. Logs each call.
+STAND_IN_FFPROBE = """#!{python}
+import json, sys
+filepath = sys.argv[-1]
+with open({calls!r}, 'a') as f:
+    f.write(filepath + '\\n')
+content = open(filepath).read()
+if content == 'broken':
+    sys.stderr.write('Invalid data found when processing input')
+    sys.exit(1)
+print(json.dumps({{ 'streams': [ {{ 'nb_frames': content, 'r_frame_rate': '24/1' }} ] }}))
+"""
+
+def _ffprobe(tmp_path):
+    calls_filepath = str(tmp_path / 'calls.txt')
+    ffprobe_path = tmp_path / 'ffprobe'
+    ffprobe_path.write_text(STAND_IN_FFPROBE.format(python=sys.executable, calls=calls_filepath))
+    ffprobe_path.chmod(ffprobe_path.stat().st_mode | stat.S_IEXEC)
+    return str(ffprobe_path), calls_filepath
+
+def _job(target_directory, output_filename, frame_count=240):
+    job = RenderJob()
+    job.id = 'job1'
+    job.name = 'Job 1'
+    job.target_directory = str(target_directory)
+    job.job_dump_raw = { 'OutputFilename': output_filename }
+    job.job_frame_count = frame_count
+    return job
+
+def test_single_output_and_additional_outputs(tmp_path):
+    ffprobe_path, calls_filepath = _ffprobe(tmp_path)
+    out = tmp_path / 'out'
+    out.mkdir()
+    (out / 'Job 1.mov').write_text('240')
+    (out / 'Job 1.mp4').write_text('239')
+    (out / 'Job 1.wav').write_text('0')
+    (out / 'Other.mov').write_text('240')
+    job = _job(out, 'Job 1.mov')
+    assert [ os.path.basename(f) for f in find_output_files(job) ] == [ 'Job 1.mov', 'Job 1.mp4' ]
+
+    verifier = OutputVerifier(ffprobe_path, max_concurrent=2)
+    result = asyncio.run(verifier.verify(job))
+    assert not result.ok
+    assert result.problems == [ 'Job 1.mp4: 239 frames, expected 240' ]
+
+    # Unchanged files come from the cache, a changed one is probed again
+    (out / 'Job 1.mp4').write_text('0240')
+    result = asyncio.run(verifier.verify(job))
+    assert result.ok
+    calls = open(calls_filepath).read().splitlines()
+    assert sorted( os.path.basename(c) for c in calls ) == [ 'Job 1.mov', 'Job 1.mp4', 'Job 1.mp4' ]
+
+def test_individual_clips(tmp_path):
+    ffprobe_path, _ = _ffprobe(tmp_path)
+    out = tmp_path / 'out'
+    (out / 'A001').mkdir(parents=True)
+    (out / 'A001' / 'Clip 1.mov').write_text('100')
+    (out / 'A001' / 'Clip 2.mov').write_text('broken')
+    (out / 'Clip 3.mov').write_text('50')
+    job = _job(out, 'Clip 1.mov and more')
+    result = asyncio.run(OutputVerifier(ffprobe_path).verify(job))
+    # Clips are each checked to be readable, not against the job's frame count
+    assert [ os.path.basename(r.filepath) for r in result.results ] == [ 'Clip 1.mov', 'Clip 2.mov', 'Clip 3.mov' ]
+    assert result.problems == [ 'Clip 2.mov: Invalid data found when processing input' ]
+
+def test_no_output_files(tmp_path):
+    job = _job(tmp_path, 'Missing.mov')
+    result = asyncio.run(OutputVerifier('ffprobe').verify(job))
+    assert result.problems == [ 'No output files were found' ]
+
+def test_settings_changed_on_reload(tmp_path):
+    from renderwatch.functions import VerifyOutput
+    ffprobe_path, _ = _ffprobe(tmp_path)
+    VerifyOutput.verifier = None
+    VerifyOutput().__validate__(ffprobe_path=ffprobe_path, max_concurrent=4, timeout=60)
+    verifier = VerifyOutput.verifier
+    VerifyOutput().__validate__(ffprobe_path=ffprobe_path, max_concurrent=4, timeout=60)
+    assert VerifyOutput.verifier is verifier
+    VerifyOutput().__validate__(ffprobe_path=ffprobe_path, max_concurrent=2, timeout=30)
+    assert (VerifyOutput.verifier.max_concurrent, VerifyOutput.verifier.timeout) == (2, 30)
+    # Same ffprobe - earlier results are kept
+    assert VerifyOutput.verifier.cache is verifier.cache
@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import os
+
+from renderwatch import simulate
+from renderwatch.checksum import hash_file, save_manifest
+from renderwatch.step import Step
+
+ACTIONS = """actions:
+  - name: Checksum then record the manifest
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - checksum:
+          action: write_manifest
+          algorithm: sha256
+      - shell:
+          action: run_cmd
+          cmd: 'cp {{manifest_filepath}} {copy_filepath}'
+          run_in_visible_window: false
+          on_exit_close_window: false
+"""
+
+def test_hash_file_and_manifest(tmp_path):
+    data = os.urandom(300000)
+    (tmp_path / 'A.mov').write_bytes(data)
+    (tmp_path / 'B.mov').write_bytes(b'')
+    # A buffer smaller than the file, so it's read in several pieces
+    assert hash_file(str(tmp_path / 'A.mov'), 'md5', buffer_size=65536) == (hashlib.md5(data).hexdigest(), len(data))
+    assert hash_file(str(tmp_path / 'B.mov'), 'sha1') == (hashlib.sha1(b'').hexdigest(), 0)
+
+    manifest_filepath = str(tmp_path / 'Job.md5')
+    save_manifest(manifest_filepath, { str(tmp_path / 'B.mov'): 'bb', str(tmp_path / 'A.mov'): 'aa' })
+    assert open(manifest_filepath).read() == 'aa  A.mov\nbb  B.mov\n'
+    assert not os.path.exists(manifest_filepath + '.tmp')
+
+def test_manifest_for_later_steps(tmp_path, make_renderwatch):
+    out = tmp_path / 'out'
+    out.mkdir()
+    (out / 'Job 1.mov').write_bytes(b'rendered')
+    copy_filepath = tmp_path / 'copy.sha256'
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, progress_step=100))
+    for job in resolve._project.jobs.values():
+        job.dump['TargetDir'] = str(out)
+
+    renderwatch = make_renderwatch(ACTIONS.format(copy_filepath=copy_filepath))
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        for _ in range(2):
+            resolve.tick()
+            await renderwatch.update_render_jobs()
+        while Step._tasks:
+            await asyncio.gather(*Step._tasks)
+    asyncio.run(run())
+
+    # The shell step only ran once the manifest it uses was written
+    manifest = f'{hashlib.sha256(b"rendered").hexdigest()}  Job 1.mov\n'
+    assert (out / 'Job 1.sha256').read_text() == manifest
+    assert copy_filepath.read_text() == manifest
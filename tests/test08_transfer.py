@@ -0,0 +1,100 @@
+import asyncio
+import errno
+import os
+
+from renderwatch import simulate
+from renderwatch import transfer
+from renderwatch.step import Step
+
+ACTIONS = """actions:
+  - name: Send to the server
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - transfer:
+          action: copy_outputs
+          destination: '{destination}/{{timeline_name}}'
+"""
+
+def test_copy_file_resumes(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 5)
+    src = tmp_path / 'Job 1.mov'
+    src.write_bytes(data)
+    dst = tmp_path / 'dest' / 'Job 1.mov'
+    dst.parent.mkdir()
+    # An earlier copy stopped partway through
+    (tmp_path / 'dest' / ('Job 1.mov' + transfer.PART_SUFFIX)).write_bytes(data[:2 * 1024 * 1024])
+
+    progress = []
+    copied = transfer.copy_file(str(src), str(dst), chunk_size=512 * 1024, on_progress=progress.append)
+    assert copied == sum(progress) == len(data) - 2 * 1024 * 1024
+    assert dst.read_bytes() == data
+    assert not os.path.exists(str(dst) + transfer.PART_SUFFIX)
+    # Already copied - nothing to do
+    assert transfer.copy_file(str(src), str(dst)) == 0
+
+    # A partial copy that doesn't match the source is started again
+    (tmp_path / 'dest' / ('Job 1.mov' + transfer.PART_SUFFIX)).write_bytes(b'x' * 1000)
+    os.remove(dst)
+    assert transfer.copy_file(str(src), str(dst)) == len(data)
+    assert dst.read_bytes() == data
+
+def test_is_copied(tmp_path):
+    src = tmp_path / 'A.mov'
+    dst = tmp_path / 'B.mov'
+    src.write_bytes(b'rendered')
+    dst.write_bytes(b'rendered')
+    os.utime(src, ns=(0, 1_700_000_000_999_000_000))
+    # Rounded up to the next second by the destination's filesystem
+    os.utime(dst, ns=(0, 1_700_000_001_000_000_000))
+    assert transfer.is_copied(str(src), str(dst))
+    # An older copy, of an earlier render the same size
+    os.utime(dst, ns=(0, 1_699_999_000_000_000_000))
+    assert not transfer.is_copied(str(src), str(dst))
+
+def test_copy_file_falls_back(tmp_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+    monkeypatch.setattr(transfer, 'copy_methods', lambda: [ unsupported, transfer._read_write ])
+    src = tmp_path / 'A.mov'
+    src.write_bytes(b'rendered' * 1000)
+    assert transfer.copy_file(str(src), str(tmp_path / 'B.mov')) == 8000
+    assert (tmp_path / 'B.mov').read_bytes() == src.read_bytes()
+
+def _run_completed_job(tmp_path, make_renderwatch, destination):
+    out = tmp_path / 'out'
+    (out / 'A001').mkdir(parents=True)
+    (out / 'A001' / 'Clip 1.mov').write_bytes(b'clip 1')
+    (out / 'Clip 2.mov').write_bytes(b'clip 2')
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, progress_step=100))
+    for job in resolve._project.jobs.values():
+        job.dump['TargetDir'] = str(out)
+        job.dump['OutputFilename'] = 'Clip 1.mov and more'
+
+    renderwatch = make_renderwatch(ACTIONS.format(destination=destination))
+    fired = []
+    for signature in list(renderwatch.event_user.__events__):
+        getattr(renderwatch.event_user, signature).__iadd__(lambda *args, signature=signature, **kwargs: fired.append(signature.rsplit('.', 1)[-1]))
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        for _ in range(2):
+            resolve.tick()
+            await renderwatch.update_render_jobs()
+        while Step._tasks:
+            await asyncio.gather(*Step._tasks)
+    asyncio.run(run())
+    return fired
+
+def test_transfer_step(tmp_path, make_renderwatch):
+    fired = _run_completed_job(tmp_path, make_renderwatch, tmp_path / 'server')
+    assert fired == [ 'pre', 'post' ]
+    assert (tmp_path / 'server' / 'Timeline 1' / 'A001' / 'Clip 1.mov').read_bytes() == b'clip 1'
+    assert (tmp_path / 'server' / 'Timeline 1' / 'Clip 2.mov').read_bytes() == b'clip 2'
+
+def test_transfer_step_failed(tmp_path, make_renderwatch):
+    # The destination's parent is a file, so no folder can be made there
+    (tmp_path / 'server').write_text('')
+    fired = _run_completed_job(tmp_path, make_renderwatch, tmp_path / 'server')
+    assert fired == [ 'pre', 'failed' ]
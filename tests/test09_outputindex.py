@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+
+from renderwatch import simulate
+from renderwatch.outputindex import OutputIndex
+
+def _old(filepath):
+    # Written long before the render
+    old = time.time() - 3600
+    os.utime(filepath, (old, old))
+
+def test_single_output(tmp_path):
+    (tmp_path / 'Other.mov').write_text('')
+    (tmp_path / 'Job 1.mov').write_text('previous render')
+    _old(tmp_path / 'Other.mov')
+    _old(tmp_path / 'Job 1.mov')
+    index = OutputIndex()
+    targets = { 'job1': (str(tmp_path), 'Job 1.mov') }
+    assert index.update(targets, set()) == set()
+    # Started - rendering over the previous render in place, and an additional output beside it
+    (tmp_path / 'Job 1.mov').write_text('render')
+    (tmp_path / 'Job 1.wav').write_text('render')
+    (tmp_path / 'Job 1.md5').write_text('')
+    assert index.update(targets, { 'job1' }) == { 'job1' }
+    assert index.update(targets, set()) == set()
+    assert index.files('job1') == [ str(tmp_path / 'Job 1.mov'), str(tmp_path / 'Job 1.wav') ]
+
+def test_individual_clips(tmp_path):
+    for i in range(1000):
+        (tmp_path / f'Old {i}.mov').write_text('')
+        _old(tmp_path / f'Old {i}.mov')
+    index = OutputIndex()
+    targets = { 'job1': (str(tmp_path), 'Clip 1.mov and more'), 'job2': (str(tmp_path), 'Clip 9.mov and more') }
+    index.update(targets, set())
+    index.update(targets, { 'job1' })
+    (tmp_path / 'Clip 1.mov').write_text('')
+    (tmp_path / 'A001').mkdir()
+    (tmp_path / 'A001' / 'Clip 2.mov').write_text('')
+    assert index.update(targets, { 'job1' }) == { 'job1' }
+    # Finished, and the next job hasn't started yet
+    (tmp_path / 'Clip 3.mov').write_text('')
+    index.update(targets, set())
+    assert index.files('job1') == [ str(tmp_path / 'A001' / 'Clip 2.mov'), str(tmp_path / 'Clip 1.mov'), str(tmp_path / 'Clip 3.mov') ]
+    assert index.files('job2') == []
+
+    # A file that is deleted is dropped
+    os.remove(tmp_path / 'Clip 3.mov')
+    index.update(targets, { 'job2' })
+    assert str(tmp_path / 'Clip 3.mov') not in index.files('job1')
+
+def test_clips_already_rendering(tmp_path):
+    # Seen for the first time part way through - older clips can't be told apart from its own
+    (tmp_path / 'Clip 1.mov').write_text('')
+    index = OutputIndex()
+    targets = { 'job1': (str(tmp_path), 'Clip 1.mov and more') }
+    index.update(targets, { 'job1' })
+    (tmp_path / 'Clip 2.mov').write_text('')
+    index.update(targets, { 'job1' })
+    assert index.files('job1') == []
+
+def test_output_files_on_render_jobs(tmp_path, make_renderwatch):
+    out = tmp_path / 'out'
+    out.mkdir()
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, progress_step=50))
+    for job in resolve._project.jobs.values():
+        job.dump['TargetDir'] = str(out)
+    renderwatch = make_renderwatch()
+    completed = []
+    renderwatch.event_resolve.render_job_completed += lambda job: completed.append(job.output_filepath)
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        (out / 'Job 1.mov').write_text('render')
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+        resolve.tick()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert completed == [ str(out / 'Job 1.mov') ]
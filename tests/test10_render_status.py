@@ -0,0 +1,38 @@
+import asyncio
+
+from renderwatch import simulate
+
+def test_finished_jobs_not_fetched(make_renderwatch):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=3, completed=3))
+    renderwatch = make_renderwatch()
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.reset_call_counts()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    # Nothing is rendering, so the finished jobs keep their last known status
+    assert resolve.call_counts.get('project.render_status', 0) == 0
+    assert resolve.call_counts['project.IsRenderingInProgress'] == 1
+    assert renderwatch.poll_stats['render_status_skipped'] == 3
+
+def test_rerender_finished_job(make_renderwatch, record_events):
+    # Rendering a finished job again, as to retry it, leaves its job dump as it was
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, completed=1))
+    renderwatch = make_renderwatch()
+    fired = record_events(renderwatch, 'render_job_started', 'render_job_progress', 'render_job_completed')
+    job = next(iter(resolve._project.jobs.values()))
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        await renderwatch.update_render_jobs()
+        job.start()
+        await renderwatch.update_render_jobs()
+        job.advance(50)
+        await renderwatch.update_render_jobs()
+        job.complete()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert fired == [ ('render_job_started', 'Job 1'), ('render_job_progress', 'Job 1'), ('render_job_completed', 'Job 1') ]
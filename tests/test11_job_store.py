@@ -0,0 +1,55 @@
+import asyncio
+
+from renderwatch import simulate
+from renderwatch.history import JobHistory
+from renderwatch.renderjob import RenderJob
+from renderwatch.store import JobStore
+
+def test_history_round_trip():
+    history = JobHistory(max_entries=10)
+    history.append(100, { 'JobStatus': 'Rendering', 'CompletionPercentage': 10, 'EstimatedTimeRemainingInMs': 9000 })
+    history.append(110, { 'JobStatus': 'Complete', 'CompletionPercentage': 100, 'TimeTakenToRenderInMs': 10000 })
+    restored = JobHistory.from_dict(history.to_dict())
+    assert restored.latest == history.latest
+    assert restored.latest_timestamp == 110
+    assert len(restored) == len(history)
+
+def test_store_writes_on_flush(tmp_path):
+    job = RenderJob()
+    job.id = 'job1'
+    job.name = 'Job 1'
+    job.status = 'Rendering'
+    job.last_touched = 100
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    scope = JobStore.scope('Project', { 'DbName': 'Local Database' })
+    store.save(scope, job)
+    assert store.load(scope) == []
+    assert store.flush() == 1
+    assert [ record['id'] for record in store.load(scope) ] == [ 'job1' ]
+    # Kept per project
+    assert store.load(JobStore.scope('Other project', { 'DbName': 'Local Database' })) == []
+    store.delete(scope, 'job1')
+    store.close()
+    assert JobStore(str(tmp_path / 'jobs.sqlite3')).load(scope) == []
+
+def test_completed_while_stopped(make_renderwatch, record_events):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=1, progress_step=50))
+    renderwatch = make_renderwatch(daemon_config={ 'job_store': True })
+
+    async def run(renderwatch, polls):
+        for _ in range(polls):
+            await renderwatch.update_render_jobs()
+    resolve.tick()
+    asyncio.run(run(renderwatch, 1))
+    renderwatch.shutdown()
+
+    # Finishes while the daemon is stopped
+    resolve.tick()
+    resolve.tick()
+    assert resolve.rendering_job() is None
+    renderwatch = make_renderwatch(daemon_config={ 'job_store': True })
+    fired = record_events(renderwatch, 'render_job_onload', 'render_job_new', 'render_job_completed')
+    asyncio.run(run(renderwatch, 2))
+    renderwatch.shutdown()
+
+    assert fired == [ ('render_job_completed', 'Job 1') ]
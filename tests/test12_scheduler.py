@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+
+from renderwatch.scheduler import PollScheduler
+
+def _jobs(*statuses):
+    return [ SimpleNamespace(status=status) for status in statuses ]
+
+def test_idle_backs_off():
+    scheduler = PollScheduler(poll_time=2, poll_time_rendering=1, poll_time_idle_max=5, idle_backoff_factor=2)
+    idle = _jobs('Complete', 'Ready')
+    assert [ scheduler.next_interval(idle) for _ in range(4) ] == [ 2, 4, 5, 5 ]
+
+def test_rendering_resets_backoff():
+    scheduler = PollScheduler(poll_time=2, poll_time_rendering=1, poll_time_idle_max=10, idle_backoff_factor=2)
+    for _ in range(3):
+        scheduler.next_interval(_jobs('Ready'))
+    assert scheduler.next_interval(_jobs('Rendering', 'Ready')) == 1
+    # Idle again - starts from poll_time
+    assert scheduler.next_interval(_jobs('Complete', 'Ready')) == 2
+
+def test_burst_after_completion():
+    scheduler = PollScheduler(poll_time=2, burst_interval=0.25, burst_count=2)
+    scheduler.burst()
+    idle = _jobs('Complete')
+    assert [ scheduler.next_interval(idle) for _ in range(3) ] == [ 0.25, 0.25, 2 ]
+
+def test_burst_cuts_wait_short():
+    async def run():
+        scheduler = PollScheduler()
+        asyncio.get_running_loop().call_later(0.05, scheduler.burst)
+        started = asyncio.get_running_loop().time()
+        await scheduler.wait(10)
+        return asyncio.get_running_loop().time() - started
+    assert asyncio.run(run()) < 1
@@ -0,0 +1,32 @@
+from renderwatch.history import JobHistory
+
+def _rendering(percent, **extra):
+    return dict({ 'JobStatus': 'Rendering', 'CompletionPercentage': percent, 'RenderJobName': 'Job 1' }, **extra)
+
+def test_only_changes_are_kept():
+    history = JobHistory()
+    assert history.append(100, _rendering(10, EstimatedTimeRemainingInMs=9000)) is None
+    assert history.append(101, _rendering(20)) == { 'CompletionPercentage': 20 }
+    timestamp, changed, removed = history.deltas[-1]
+    assert (timestamp, changed, removed) == (101, { 'CompletionPercentage': 20 }, ('EstimatedTimeRemainingInMs',))
+
+def test_trimmed_by_count():
+    history = JobHistory(max_entries=3)
+    for i in range(10):
+        history.append(100 + i, _rendering(i * 10))
+    assert len(history) == 3
+    assert [ timestamp for timestamp, _ in history ] == [ 107, 108, 109 ]
+    # The base, with the deltas after it, still gives every retained state
+    assert [ state['CompletionPercentage'] for _, state in history ] == [ 70, 80, 90 ]
+    assert history.latest == _rendering(90)
+
+def test_trimmed_by_age():
+    history = JobHistory(max_entries=100, max_age=60)
+    history.append(0, _rendering(0, EstimatedTimeRemainingInMs=9000))
+    history.append(30, _rendering(50))
+    history.append(100, { 'JobStatus': 'Complete', 'CompletionPercentage': 100, 'RenderJobName': 'Job 1' })
+    # The entry at 30 is over a minute older than the newest, so it's folded into the base
+    assert [ timestamp for timestamp, _ in history ] == [ 30, 100 ]
+    assert list(history)[0][1] == _rendering(50)
+    assert history.latest['JobStatus'] == 'Complete'
+    assert 'EstimatedTimeRemainingInMs' not in history.latest
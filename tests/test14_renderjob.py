@@ -0,0 +1,45 @@
+import asyncio
+import datetime
+
+from renderwatch import simulate
+from renderwatch.renderjob import RenderJob
+
+def _job_dump():
+    return dict(simulate.SimulatedJob(0).dump)
+
+def _rendering(percent):
+    return { 'JobStatus': 'Rendering', 'CompletionPercentage': percent, 'EstimatedTimeRemainingInMs': 5000 }
+
+def test_unchanged_job_short_circuits():
+    job = RenderJob()
+    asyncio.run(job._init(_job_dump(), _rendering(10), datetime.datetime.now()))
+    fingerprint = job.fingerprint
+
+    def _not_expected(*args):
+        raise AssertionError('update() went past the fingerprint check')
+    job._update_current_fps = _not_expected
+    time_collected = datetime.datetime.now() + datetime.timedelta(seconds=5)
+    assert asyncio.run(job.update(_job_dump(), _rendering(10), time_collected)) is False
+    assert job.fingerprint == fingerprint
+    assert job.last_touched == int(time_collected.timestamp())
+    assert len(job.history) == 1
+
+def test_fingerprint_follows_changes():
+    job_dump = dict(_job_dump(), **_rendering(10))
+    assert RenderJob._fingerprint(dict(job_dump)) == RenderJob._fingerprint(job_dump)
+    assert RenderJob._fingerprint(dict(job_dump, CompletionPercentage=11)) != RenderJob._fingerprint(job_dump)
+    # Unhashable values can't be fingerprinted - update() compares them field by field instead
+    assert RenderJob._fingerprint(dict(job_dump, Extra=[ 1 ])) is None
+
+def test_times_humanized_once():
+    from renderwatch.renderjob import _humanize_ms
+    _humanize_ms.cache_clear()
+    job = RenderJob()
+    job._time_remaining_ms = 64000
+    job._time_taken_ms = 90000
+    for _ in range(3):
+        assert job.time_remaining == '1 minute and 4 seconds'
+        assert job.time_elapsed == '1 minute and 30 seconds'
+    assert _humanize_ms.cache_info().misses == 2
+    job._time_remaining_ms = None
+    assert job.time_remaining is None
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+
+from renderwatch import simulate
+from renderwatch.cache import ActionsCache, ValidationCache
+
+def test_validation_cache(tmp_path):
+    filepath = str(tmp_path / 'validation_cache.json')
+    cache = ValidationCache(filepath, ttl=60)
+    key = ValidationCache.key('telegram', '123:secret')
+    assert not cache.is_valid(key)
+    cache.store(key)
+    # Kept across restarts, without the credential itself
+    assert ValidationCache(filepath, ttl=60).is_valid(key)
+    assert '123:secret' not in open(filepath).read()
+    # Expired
+    cache.entries[key] = time.time() - 61
+    assert not cache.is_valid(key)
+    cache.discard(key)
+    assert not ValidationCache(filepath).is_valid(key)
+
+def test_validation_cache_unreadable(tmp_path):
+    (tmp_path / 'validation_cache.json').write_text('{ not json')
+    cache = ValidationCache(str(tmp_path / 'validation_cache.json'))
+    assert cache.entries == {}
+
+def test_actions_cache(tmp_path):
+    actions_filepath = tmp_path / 'actions.yml'
+    schema_filepath = tmp_path / 'actions.schema.yml'
+    actions_filepath.write_text('actions: []\n')
+    schema_filepath.write_text('type: map\n')
+    cache = ActionsCache(str(tmp_path / 'actions.cache.json'), [ str(actions_filepath), str(schema_filepath) ])
+    source_hash = cache.source_hash()
+    assert cache.load(source_hash) is None
+    cache.save(source_hash, [ { 'name': 'Notify' } ])
+    assert cache.load(cache.source_hash()) == [ { 'name': 'Notify' } ]
+
+    # Any file it depends on changing makes it a miss
+    actions_filepath.write_text('actions: [ ]\n')
+    assert cache.load(cache.source_hash()) is None
+    actions_filepath.write_text('actions: []\n')
+    assert cache.load(cache.source_hash()) == [ { 'name': 'Notify' } ]
+    schema_filepath.write_text('type: seq\n')
+    assert cache.load(cache.source_hash()) is None
+
+    # As does a cache written by another version
+    with open(tmp_path / 'actions.cache.json', 'w') as f:
+        json.dump({ 'source_hash': source_hash, 'actions': [] }, f)
+    ActionsCache.version += 1
+    try:
+        schema_filepath.write_text('type: map\n')
+        assert cache.load(cache.source_hash()) is None
+    finally:
+        ActionsCache.version -= 1
+
+def test_revalidation_after_startup(make_renderwatch):
+    simulate.install(simulate.SimulatedResolve(job_count=1))
+    renderwatch = make_renderwatch()
+    checked = []
+
+    async def run():
+        await renderwatch.revalidate_steps()
+        # Queued later, from another thread - as when a reload validates its steps
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, renderwatch.schedule_revalidation, lambda: checked.append('telegram'))
+        while not checked or renderwatch._revalidation_tasks:
+            await asyncio.sleep(0.01)
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert checked == [ 'telegram' ]
@@ -0,0 +1,30 @@
+from renderwatch.event import InternalEvents, ResolveEvents
+
+def test_dispatch_in_order():
+    events = ResolveEvents()
+    order = []
+    first = lambda **kwargs: order.append('first')
+    second = lambda **kwargs: order.append('second')
+    events.render_job_completed += first
+    events.render_job_completed += second
+    events.render_job_completed()
+    assert order == [ 'first', 'second' ]
+    # Handlers changed since the last fire - the compiled handlers are rebuilt
+    events.render_job_completed -= first
+    events.render_job_completed += first
+    events.render_job_completed()
+    assert order == [ 'first', 'second', 'second', 'first' ]
+    assert events.dispatch_table() == { 'render_job_completed': (second, first) }
+
+def test_stats():
+    events = InternalEvents()
+    events.action_step_fired += lambda **kwargs: None
+    events.action_step_fired()
+    events.action_step_fired()
+    # Fired with no handlers - counted all the same
+    events.action_step_shell_cmd_finished(data={})
+    stats = events.stats()
+    assert set(stats) == { 'action_step_fired', 'action_step_shell_cmd_finished' }
+    assert stats['action_step_fired'][0] == 2
+    assert stats['action_step_fired'][1] >= 0
+    assert stats['action_step_shell_cmd_finished'] == (1, 0.0)
@@ -0,0 +1,46 @@
+import pytest
+
+from renderwatch.exceptions import UserInvalidTemplate
+from renderwatch.renderjob import RenderJob
+from renderwatch.template import MessageTemplate, compile_template
+
+ACTIONS = """actions:
+  - name: Copy to the server
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - checksum:
+          action: write_manifest
+          manifest_filepath: '/tmp/{timeline_name}.md5'
+      - transfer:
+          action: copy_outputs
+          destination: '/Volumes/Server/{timeline_nme}'
+"""
+
+def test_only_used_fields_are_looked_up():
+    template = MessageTemplate('{name} - {status}: {completion_percent}')
+    assert template.fields == { 'name', 'status', 'completion_percent' }
+    job = RenderJob()
+    job.name = 'Job 1'
+    job.status = 'Rendering'
+    job.completion_percent = '50%'
+    looked_up = []
+    get_template_field = job.get_template_field
+    job.get_template_field = lambda field: looked_up.append(field) or get_template_field(field)
+    assert template.render(job) == 'Job 1 - Rendering: 50%'
+    assert sorted(looked_up) == [ 'completion_percent', 'name', 'status' ]
+
+def test_unknown_field_rejected():
+    with pytest.raises(UserInvalidTemplate, match='timeline_nme'):
+        MessageTemplate('{timeline_nme} done')
+    with pytest.raises(UserInvalidTemplate):
+        compile_template([ '{name}', '{name' ])
+    # Attributes and indexes after a known field are fine
+    assert MessageTemplate('{name.upper} {output_filepath[0]}').fields == { 'name', 'output_filepath' }
+
+def test_unknown_field_rejected_when_actions_load(make_renderwatch):
+    renderwatch = make_renderwatch(ACTIONS)
+    action = renderwatch.actions[0]
+    # The checksum step is kept, the transfer step with the misspelt field is skipped
+    assert [ step_type for step_type, by_trigger in action.steps.items() if by_trigger ] == [ 'checksum' ]
@@ -0,0 +1,65 @@
+import asyncio
+import urllib.error
+import urllib.request
+
+from renderwatch.metrics import Counter, Gauge, Histogram, MetricsServer, Registry
+
+def _registry():
+    registry = Registry()
+    counter = registry.register(Counter('renderwatch_test_total', 'A counter', labelnames=('event',)))
+    gauge = registry.register(Gauge('renderwatch_test_jobs', 'A gauge', labelnames=('status',)))
+    histogram = registry.register(Histogram('renderwatch_test_seconds', 'A histogram', buckets=(0.1, 1)))
+    counter.inc(event='render_job_completed')
+    counter.inc(2, event='render_job_completed')
+    gauge.set(3, status='Say "Ready"\n')
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    return registry
+
+def test_text_format():
+    assert _registry().render() == '\n'.join([
+        '# HELP renderwatch_test_total A counter',
+        '# TYPE renderwatch_test_total counter',
+        'renderwatch_test_total{event="render_job_completed"} 3',
+        '# HELP renderwatch_test_jobs A gauge',
+        '# TYPE renderwatch_test_jobs gauge',
+        'renderwatch_test_jobs{status="Say \\"Ready\\"\\n"} 3',
+        '# HELP renderwatch_test_seconds A histogram',
+        '# TYPE renderwatch_test_seconds histogram',
+        'renderwatch_test_seconds_bucket{le="0.1"} 1',
+        'renderwatch_test_seconds_bucket{le="1"} 2',
+        'renderwatch_test_seconds_bucket{le="+Inf"} 2',
+        'renderwatch_test_seconds_sum 0.55',
+        'renderwatch_test_seconds_count 2',
+    ]) + '\n'
+
+def test_collector_failure_still_renders():
+    registry = _registry()
+    registry.add_collector(lambda: 1 / 0)
+    assert 'renderwatch_test_total' in registry.render()
+
+def test_server():
+    def get(url):
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                return response.status, response.headers['Content-Type'], response.read().decode('utf-8')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers['Content-Type'], e.read().decode('utf-8')
+
+    async def run():
+        server = MetricsServer(_registry(), port=0)
+        await server.start()
+        port = server.server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        try:
+            return (
+                await loop.run_in_executor(None, get, f'http://127.0.0.1:{port}/metrics'),
+                await loop.run_in_executor(None, get, f'http://127.0.0.1:{port}/'),
+            )
+        finally:
+            await server.stop()
+    (status, content_type, body), (missing_status, _, _) = asyncio.run(run())
+    assert status == 200
+    assert content_type.startswith('text/plain; version=0.0.4')
+    assert 'renderwatch_test_total{event="render_job_completed"} 3' in body
+    assert missing_status == 404
@@ -0,0 +1,69 @@
+import datetime
+
+from renderwatch.tracing import Tracer
+
+def _poll(tracer, duration, render_status, update_jobs):
+    with tracer.span('poll') as poll:
+        with tracer.span('render_status') as span:
+            pass
+        span.duration = render_status
+        with tracer.span('update_jobs') as span:
+            with tracer.span('diff') as diff:
+                pass
+            diff.duration = update_jobs / 2
+        span.duration = update_jobs
+    poll.duration = duration
+    poll.started_at = datetime.datetime(2024, 1, 19, 10, 0, 0)
+    return poll
+
+def test_disabled_records_nothing():
+    tracer = Tracer()
+    with tracer.span('poll'):
+        pass
+    assert len(tracer.traces) == 0
+
+def test_folded_stacks(tmp_path):
+    tracer = Tracer(enabled=True, max_traces=2)
+    _poll(tracer, 0.004, 0.001, 0.002)
+    _poll(tracer, 0.010, 0.006, 0.002)
+    _poll(tracer, 0.001, 0.0005, 0.0002)
+    # Only the most recent polls are kept
+    assert [ span.duration for span in tracer.traces ] == [ 0.010, 0.001 ]
+    # Slowest first, each stack with its self time in microseconds
+    assert tracer.folded(count=1) == '\n'.join([
+        'poll 10:00:00.000000 (10.0ms) 2000',
+        'poll 10:00:00.000000 (10.0ms);render_status 6000',
+        'poll 10:00:00.000000 (10.0ms);update_jobs 1000',
+        'poll 10:00:00.000000 (10.0ms);update_jobs;diff 1000',
+    ]) + '\n'
+    filepath = tracer.dump(str(tmp_path / 'traces.folded'), count=2)
+    lines = open(filepath).read().splitlines()
+    assert len(lines) == 8
+    assert lines[-1] == 'poll 10:00:00.000000 (1.0ms);update_jobs;diff 100'
+
+def test_async_step_traced_until_done(monkeypatch):
+    import asyncio
+    from renderwatch import tracing
+    from renderwatch.step import Step
+    tracer = Tracer(enabled=True)
+    monkeypatch.setattr(tracing, 'TRACER', tracer)
+    class Sleepy(Step):
+        pass
+    def _step(step):
+        async def _work():
+            with tracer.span('work'):
+                await asyncio.sleep(0.05)
+        return _work()
+    async def _poll_then_wait():
+        with tracer.span('poll'):
+            task = Sleepy.run(_step, callback_pre=lambda: None, callback_post=lambda: None)
+        await task
+    asyncio.run(_poll_then_wait())
+    poll, step = tracer.traces
+    # The poll only holds the step's synchronous start, the rest is its own trace
+    assert poll.name == 'poll'
+    assert [ span.name for span in poll.children ] == [ 'step:Sleepy' ]
+    assert poll.children[0].duration < 0.05
+    assert step.name == 'step:Sleepy'
+    assert step.duration >= 0.05
+    assert [ span.name for span in step.children ] == [ 'work' ]
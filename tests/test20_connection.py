@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from renderwatch import simulate
+from renderwatch.connection import ResolveConnection
+from renderwatch.exceptions import ResolveConnectionLost
+
+def _connection(resolve):
+    connects = []
+    async def connect():
+        connects.append(resolve)
+        return resolve if resolve._obj is not None else False
+    return ResolveConnection(connect), connects
+
+def test_handle_kept_and_calls_counted():
+    resolve = simulate.SimulatedResolve(job_count=2)
+    connection, connects = _connection(resolve)
+
+    async def run():
+        assert await connection.refresh()
+        assert connection.calls == { 'connect': 1, 'project_manager': 1, 'project': 1, 'project.name': 1, 'project_manager.db': 1 }
+        for _ in range(3):
+            assert await connection.refresh()
+            connection.call('render_jobs', lambda: connection.project.render_jobs)
+    asyncio.run(run())
+
+    # Connected once, then each poll reads the project, its name and the database once each
+    assert len(connects) == 1
+    assert connection.calls == { 'project': 1, 'project.name': 1, 'project_manager.db': 1, 'render_jobs': 1 }
+    assert connection.call_count == 4
+    assert connection.project_name == 'Simulated Project'
+
+def test_failed_call_drops_handle():
+    resolve = simulate.SimulatedResolve(job_count=2)
+    connection, connects = _connection(resolve)
+
+    async def run():
+        assert await connection.refresh()
+        resolve.quit()
+        with pytest.raises(ResolveConnectionLost):
+            connection.call('render_jobs', lambda: connection.project.render_jobs)
+        assert not connection.connected
+        assert connection.project is None
+        # Still gone - no handle
+        assert not await connection.refresh()
+        resolve.relaunch()
+        assert await connection.refresh()
+    asyncio.run(run())
+    assert len(connects) == 3
+
+def test_stale_handle_reconnects_once():
+    resolve = simulate.SimulatedResolve(job_count=2)
+    connection, connects = _connection(resolve)
+
+    async def run():
+        assert await connection.refresh()
+        # Resolve restarted between polls - the kept handle fails, and a new one is made in the same refresh
+        stale = simulate.SimulatedResolve(job_count=0)
+        stale.quit()
+        connection.resolve = stale
+        return await connection.refresh()
+    assert asyncio.run(run())
+    assert len(connects) == 2
@@ -0,0 +1,25 @@
+import asyncio
+import sys
+from types import SimpleNamespace
+
+from renderwatch import simulate
+from renderwatch.functions import Shell
+
+def test_shell_long_output_line(make_renderwatch):
+    simulate.install(simulate.SimulatedResolve(job_count=1))
+    renderwatch = make_renderwatch()
+    finished = []
+    renderwatch.event_internal.action_step_shell_cmd_finished += lambda data: finished.append(data)
+    # Progress output: one line far longer than a StreamReader's line limit, redrawn with carriage returns
+    cmd = [ sys.executable, '-c', "import sys; sys.stdout.write('#' * 200000 + '\\r' + '50%\\r' * 1000 + 'done\\n')" ]
+    assert asyncio.run(Shell._run_process(SimpleNamespace(renderwatch=renderwatch), cmd, timeout=30)) == 0
+    assert finished[0]['returncode'] == 0 and not finished[0]['timed_out']
+
+def test_limit_changed_on_reload():
+    Shell().__validate__(max_concurrent=2)
+    semaphore = Shell._semaphore
+    Shell().__validate__(max_concurrent=2)
+    assert Shell._semaphore is semaphore
+    Shell().__validate__(max_concurrent=3)
+    assert Shell._semaphore is not semaphore
+    assert Shell._max_concurrent == 3
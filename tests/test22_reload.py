@@ -0,0 +1,93 @@
+import asyncio
+import logging
+
+import yaml
+
+from renderwatch import simulate
+
+ACTIONS = """actions:
+  - name: Nothing
+    enabled: false
+    triggered_by:
+      - render_job_completed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: 'true'
+"""
+
+def test_reload_applies_poll_times(make_renderwatch):
+    simulate.install(simulate.SimulatedResolve(job_count=1))
+    renderwatch = make_renderwatch(ACTIONS)
+    with open(renderwatch.filepath_user_config, encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['renderwatch_daemon']['API_poll_time'] = 5
+    config['renderwatch_daemon']['metrics_port'] = 9999
+    with open(renderwatch.filepath_user_config, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f)
+    with open(renderwatch.filepath_user_actions, 'w', encoding='utf-8') as f:
+        f.write(ACTIONS.replace('enabled: false', 'enabled: true'))
+
+    warnings = []
+    handler = logging.Handler()
+    handler.emit = lambda record: warnings.append(record.getMessage())
+    logging.getLogger('renderwatch.daemon').addHandler(handler)
+    try:
+        assert asyncio.run(renderwatch.reload_user_config([ renderwatch.filepath_user_config, renderwatch.filepath_user_actions ]))
+    finally:
+        logging.getLogger('renderwatch.daemon').removeHandler(handler)
+    assert renderwatch.scheduler.poll_time == 5
+    assert renderwatch.actions[0].enabled
+    assert any( 'take effect once renderwatch_daemon is restarted: metrics_port' in warning for warning in warnings )
+
+THREE_ACTIONS = """actions:
+  - name: Log it
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: 'true'
+  - name: Log it again
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - shell:
+          action: run_cmd
+          cmd: 'echo {cmd}'
+  - name: Write a manifest
+    enabled: true
+    triggered_by:
+      - render_job_completed
+    steps:
+      - checksum:
+          action: write_manifest
+          manifest_filepath: '{manifest_filepath}'
+"""
+
+def test_reload_rebinds_only_what_changed(make_renderwatch):
+    simulate.install(simulate.SimulatedResolve(job_count=1))
+    renderwatch = make_renderwatch(THREE_ACTIONS.format(cmd='one', manifest_filepath='/tmp/{timeline_name}.md5'))
+    slot = renderwatch.event_resolve.render_job_completed
+    kept, changed, invalid = renderwatch.actions
+    kept_handlers = list(kept.handlers)
+    old_handlers = changed.handlers + invalid.handlers
+
+    # Change one action's step, and break another's only step
+    with open(renderwatch.filepath_user_actions, 'w', encoding='utf-8') as f:
+        f.write(THREE_ACTIONS.format(cmd='two', manifest_filepath='/tmp/{timeline_nme}.md5'))
+    assert asyncio.run(renderwatch.reload_user_config([ renderwatch.filepath_user_actions ]))
+
+    assert len(renderwatch.actions) == 2
+    # The unchanged action is the same object, still bound to its event
+    assert renderwatch.actions[0] is kept
+    assert kept.handlers == kept_handlers
+    assert all( callback in slot.targets for _, callback in kept_handlers )
+    # The changed one was rebuilt, and the invalid one dropped - neither's old handlers are left behind
+    assert renderwatch.actions[1] is not changed
+    assert renderwatch.actions[1].name == 'Log it again'
+    assert all( callback in slot.targets for _, callback in renderwatch.actions[1].handlers )
+    assert not any( callback in slot.targets for _, callback in old_handlers )
+    assert len(slot.targets) == 2
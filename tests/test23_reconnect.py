@@ -0,0 +1,33 @@
+import asyncio
+
+from renderwatch import simulate
+from renderwatch.scheduler import PollScheduler
+
+def test_simulated_resolve_restart(make_renderwatch):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=2))
+    renderwatch = make_renderwatch()
+    fired = []
+    for event_name in ('api_conn_initial_success', 'api_conn_lost', 'api_conn_restored', 'project_onload', 'db_onload', 'render_job_onload'):
+        getattr(renderwatch.event_resolve, event_name).__iadd__(lambda *args, event_name=event_name, **kwargs: fired.append(event_name))
+
+    async def run():
+        await renderwatch.update_render_jobs()
+        resolve.quit()
+        await renderwatch.update_render_jobs()
+        await renderwatch.update_render_jobs()
+        resolve.relaunch()
+        await renderwatch.update_render_jobs()
+    asyncio.run(run())
+
+    assert fired == [ 'api_conn_initial_success', 'project_onload', 'db_onload', 'render_job_onload', 'render_job_onload', 'api_conn_lost', 'api_conn_restored' ]
+    assert renderwatch.api_connected
+    assert len(renderwatch.render_jobs) == 2
+
+
+def test_reconnect_backoff():
+    scheduler = PollScheduler(reconnect_delay_min=1, reconnect_delay_max=8)
+    intervals = [ scheduler.next_reconnect_interval() for _ in range(6) ]
+    for interval, delay in zip(intervals, (1, 2, 4, 8, 8, 8)):
+        assert delay / 2 <= interval <= delay
+    scheduler.reset_reconnect()
+    assert scheduler.next_reconnect_interval() <= 1
@@ -0,0 +1,43 @@
+import asyncio
+import json
+import os
+import socket
+
+from renderwatch import simulate
+from renderwatch.push import PushListener
+
+def test_push_refreshes_one_job(tmp_path, make_renderwatch, record_events):
+    resolve = simulate.install(simulate.SimulatedResolve(job_count=3))
+    renderwatch = make_renderwatch()
+    listener = PushListener(str(tmp_path / 'renderwatch.sock'), renderwatch.handle_push)
+    fired = record_events(renderwatch, 'render_job_started', 'render_job_failed')
+
+    def trigger(payload):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(listener.filepath)
+            s.sendall(json.dumps(payload).encode('utf-8') + b'\n')
+
+    async def run():
+        await listener.start()
+        await renderwatch.update_render_jobs()
+        job = next(iter(resolve._project.jobs.values()))
+        job.start()
+        resolve.reset_call_counts()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, trigger, { 'job': job.id, 'status': 'RenderStarted', 'error': '' })
+        await asyncio.sleep(0.1)
+        # Resolve still says Rendering while its error dialog is up
+        job.advance(30)
+        await loop.run_in_executor(None, trigger, { 'job': job.id, 'status': 'RenderFailed', 'error': 'Disk full' })
+        await asyncio.sleep(0.1)
+        # Only that job's status was fetched
+        assert resolve.call_counts == { 'project.render_status': 2 }
+        await renderwatch.update_render_jobs()
+        await listener.stop()
+        return job.id
+    jid = asyncio.run(run())
+
+    assert fired == [ ('render_job_started', 'Job 1'), ('render_job_failed', 'Job 1') ]
+    assert renderwatch.render_jobs[jid].status == 'Failed'
+    assert renderwatch.render_jobs[jid].latest_state['Error'] == 'Disk full'
+    assert not os.path.exists(str(tmp_path / 'renderwatch.sock'))